@@ -0,0 +1,114 @@
+import os
+import sqlite3
+from publist_cache import cache_dir
+from profiling import profile_stage
+
+# Local full text index of the titles and abstracts of the harvested papers (SQLite FTS5).
+# A paper is downloaded once and then stays in the index: selecting the papers on a topic is an
+# indexed query, so trying another keyword list does not rescan the abstracts nor query ADS.
+# The trigram tokenizer is used so that a keyword matches as in the python selection
+# (is_paper_on_topic in several_authors_paper_list.py): case insensitive substring of the title or
+# abstract, 'exoplanet' finds 'exoplanets' and 'protoplanet' finds 'protoplanetary'.
+# It needs SQLite >= 3.34 (python >= 3.10 on most systems).
+
+ABSTRACT_INDEX_FILE = 'abstract_index.sqlite'
+
+
+def open_abstract_index(path=None):
+    """Open the abstract index, created if needed
+
+    Parameters
+    ----------
+    path: string or `None`, sqlite file. Default is abstract_index.sqlite in the cache directory
+        (see publist_cache.cache_dir)
+
+    Returns
+    ------------
+    connection: sqlite3.Connection
+    """
+    if path is None:
+        path = os.path.join(cache_dir(), ABSTRACT_INDEX_FILE)
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS abstracts "
+                       "USING fts5(bibcode UNINDEXED, title, abstract, tokenize='trigram')")
+    return connection
+
+
+def indexed_bibcodes(connection):
+    """Bibcodes of the papers already in the index
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection, see open_abstract_index
+
+    Returns
+    ------------
+    set of string
+    """
+    return {bibcode for (bibcode, ) in connection.execute("SELECT bibcode FROM abstracts")}
+
+
+def index_papers(connection, papers):
+    """Add the titles and abstracts of papers to the index. Papers already indexed are skipped.
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection, see open_abstract_index
+    papers: iterable of ads publication objects, with their bibcode, title and abstract
+
+    Returns
+    ------------
+    number_added: int
+    """
+    already_indexed = indexed_bibcodes(connection)
+
+    def rows():
+        # generator: the papers can be streamed, they are not all kept in memory
+        for paper in papers:
+            if paper.bibcode in already_indexed:
+                continue
+            already_indexed.add(paper.bibcode)
+            # _raw: a paper without title or abstract in ADS must not trigger a lazy load
+            title = paper._raw.get('title')
+            yield paper.bibcode, ' '.join(title) if title is not None else '', paper._raw.get('abstract') or ''
+
+    with connection:
+        cursor = connection.executemany("INSERT INTO abstracts (bibcode, title, abstract) VALUES (?, ?, ?)", rows())
+    return max(cursor.rowcount, 0)
+
+
+def topic_match_query(keywords):
+    """FTS5 query of the papers with one of the keywords in their title or abstract
+
+    Parameters
+    ----------
+    keywords: list of string, at least 3 characters each (trigrams)
+
+    Returns
+    ------------
+    query: string, e.g. '"exoplanet" OR "debris disk"'
+    """
+    for keyword in keywords:
+        if len(keyword) < 3:
+            raise ValueError("keywords of the abstract index must have at least 3 characters: '" + keyword + "'")
+    return ' OR '.join('"' + keyword.replace('"', '""') + '"' for keyword in keywords)
+
+
+def papers_on_topic(connection, keywords):
+    """Bibcodes of the indexed papers with one of the keywords (case insensitive) in their title or abstract
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection, see open_abstract_index
+    keywords: list of string
+
+    Returns
+    ------------
+    set of string
+    """
+    with profile_stage('abstract_index_query'):
+        return {
+            bibcode
+            for (bibcode, ) in connection.execute("SELECT bibcode FROM abstracts WHERE abstracts MATCH ?",
+                                                  (topic_match_query(keywords), ))
+        }
@@ -0,0 +1,263 @@
+import time
+import asyncio
+import httpx
+import ads
+from create_publist import ads_query_filters, PAPER_FIELDS
+from ads_scheduler import ADS_SEARCH_URL, SCHEDULER, SCHEDULER_STATS, check_budget, update_rate_limits, backoff_time
+from profiling import profile_stage, record_ads_response
+from lazy_loads import link_papers
+
+# asyncio equivalents of query_papers, query_papers_with_abstract and the bibcode lookup.
+# All the requests share one httpx.AsyncClient (pooled keep-alive connections) and the
+# budget, quota and 429 backoff of ads_scheduler, so many queries can be in flight at once
+# without one thread per request. Papers are returned as ads.search.Article objects,
+# like the synchronous functions.
+
+ADS_MAX_ROWS_PER_PAGE = 2000
+
+
+def ads_async_client(max_connections=10):
+    """Create the http client shared by all the async queries. Use it as an async context manager:
+        async with ads_async_client() as client:
+            papers = await async_query_papers(client, 'Mayor, Michel')
+
+    Parameters
+    ----------
+    max_connections: int, maximum number of simultaneous connections to ADS
+
+    Returns
+    ------------
+    client: httpx.AsyncClient
+    """
+    return httpx.AsyncClient(headers={
+        "Authorization": "Bearer {}".format(ads.config.token),
+        "User-Agent": "ads-api-client/{}".format(ads.__version__),
+    },
+                             limits=httpx.Limits(max_connections=max_connections,
+                                                 max_keepalive_connections=max_connections),
+                             timeout=httpx.Timeout(60.))
+
+
+async def async_ads_request(client, url, params):
+    """GET request to ADS, paced, counted and retried like the requests of the synchronous ScheduledSession
+
+    Parameters
+    ----------
+    client: httpx.AsyncClient, see ads_async_client
+    url: string
+    params: dict, parameters of the request
+
+    Returns
+    ------------
+    json answer of ADS
+    """
+    for attempt in range(SCHEDULER["max_retries"] + 1):
+        check_budget(url)
+
+        # book the next free slot: requests start at least min_interval apart but can overlap
+        now = time.time()
+        slot = max(now, SCHEDULER_STATS["last_request"] + SCHEDULER["min_interval"])
+        SCHEDULER_STATS["last_request"] = slot
+        SCHEDULER_STATS["requests"] += 1
+        await asyncio.sleep(slot - now)
+
+        response = await client.get(url, params=params)
+        record_ads_response(response)
+        update_rate_limits(url, response.headers)
+
+        if response.status_code != 429:
+            break
+
+        SCHEDULER_STATS["throttled"] += 1
+        if attempt == SCHEDULER["max_retries"]:
+            # no retry left: no wait before giving up
+            break
+        wait = backoff_time(response.headers, attempt)
+        if wait > SCHEDULER["max_wait"]:
+            break
+        await asyncio.sleep(wait)
+
+    if response.status_code != 200:
+        raise ads.exceptions.APIResponseError(response.text)
+    return response.json()
+
+
+async def async_search(client, q, fq=None, fl=PAPER_FIELDS, sort='pubdate desc', rows=1000):
+    """Run an ADS search, with pagination
+
+    Parameters
+    ----------
+    client: httpx.AsyncClient, see ads_async_client
+    q: string, query
+    fq: string or None, filter query
+    fl: list of string, fields returned by ADS
+    sort: string, sorting of the results
+    rows: int, maximum number of publications to extract
+
+    Returns
+    ------------
+    list of ads publication objects
+    """
+    fields = ['id'] + [field for field in fl if field != 'id']
+    params = {'q': q, 'fl': ','.join(fields), 'sort': sort}
+    if fq is not None and fq != '':
+        params['fq'] = fq
+
+    papers = list()
+    while len(papers) < rows:
+        params['start'] = len(papers)
+        params['rows'] = min(rows - len(papers), ADS_MAX_ROWS_PER_PAGE)
+        answer = await async_ads_request(client, ADS_SEARCH_URL, params)
+        docs = answer['response']['docs']
+        for doc in docs:
+            # as ads.search.SolrResponse: a field requested but missing in ADS is None, not lazily loaded
+            for field in fields:
+                doc.setdefault(field, None)
+            papers.append(ads.search.Article(**doc))
+        if len(docs) == 0 or len(papers) >= answer['response']['numFound']:
+            break
+    return link_papers(papers)
+
+
+def author_query(author, q):
+    """query string used by ads.SearchQuery(author=author, q=q)
+    """
+    return ('author:"{0}" '.format(author) + q).strip()
+
+
+async def async_query_papers(client, author, refereed=None, years=None, rows=1000, exclusions=None):
+    """async equivalent of create_publist.query_papers
+
+    Parameters
+    ----------
+    client: httpx.AsyncClient, see ads_async_client
+    author: str, author name
+    refereed: boolean or `None`, see query_papers
+    years: tuple, list, or `None`, range of years to query or `None`
+    rows: int, maximum number of publications to extract
+    exclusions: dict or `None`, records that ADS does not return, see create_publist.ads_exclusion_filter
+
+    Returns
+    ------------
+    list of ads publication objects
+    """
+    q, fq = ads_query_filters(refereed=refereed, years=years, exclusions=exclusions)
+    with profile_stage('async_query_papers'):
+        return await async_search(client, author_query(author, q), fq=fq, fl=PAPER_FIELDS, rows=rows)
+
+
+async def async_query_papers_with_abstract(client,
+                                           author,
+                                           refereed=None,
+                                           years=None,
+                                           rows=1000,
+                                           dico_keyz='title',
+                                           keywords=None):
+    """async equivalent of several_authors_paper_list.query_papers_with_abstract
+
+    Parameters
+    ----------
+    client: httpx.AsyncClient, see ads_async_client
+    author: str, author name
+    refereed: boolean or `None`, see query_papers
+    years: tuple, list, or `None`, range of years to query or `None`
+    rows: int, maximum number of publications to extract
+    dico_keyz: list of string, fields returned by ADS
+    keywords: list of string or `None`, only the papers on this topic, see create_publist.ads_topic_query
+
+    Returns
+    ------------
+    list of ads publication objects
+    """
+    if isinstance(dico_keyz, str):
+        dico_keyz = [dico_keyz]
+    q, fq = ads_query_filters(refereed=refereed, years=years, keywords=keywords)
+    with profile_stage('async_query_papers'):
+        return await async_search(client, author_query(author, q), fq=fq, fl=dico_keyz, rows=rows)
+
+
+async def async_query_bibcode(client, bibcode, dico_keyz=PAPER_FIELDS):
+    """async equivalent of ads.SearchQuery(bibcode=bibcode, fl=dico_keyz)
+
+    Parameters
+    ----------
+    client: httpx.AsyncClient, see ads_async_client
+    bibcode: string
+    dico_keyz: list of string, fields returned by ADS
+
+    Returns
+    ------------
+    list of ads publication objects
+    """
+    return await async_search(client, 'bibcode:"{0}"'.format(bibcode), fl=dico_keyz, sort='date desc', rows=1)
+
+
+async def async_harvest_authors(author_list,
+                                refereed=None,
+                                years=None,
+                                dico_keyz='title',
+                                keywords=None,
+                                max_connections=10,
+                                author_done=None):
+    """Query the papers of all the authors of a list concurrently, with one client (pooled keep-alive
+        connections) for the whole list and at most max_connections authors queried at once
+
+    Parameters
+    ----------
+    author_list: list of string, authors names
+    refereed: boolean or `None`, see query_papers
+    years: tuple, list, or `None`, range of years to query or `None`
+    dico_keyz: list of string, fields returned by ADS
+    keywords: list of string or `None`, only the papers on this topic, see create_publist.ads_topic_query
+    max_connections: int, maximum number of authors queried at once
+    author_done: function or `None`, called with (author name, papers or exception) as soon as the query of an
+        author completes, e.g. to checkpoint it
+
+    Returns
+    ------------
+    dict, author name -> list of ads publication objects, or the exception raised by its query
+    """
+    semaphore = asyncio.Semaphore(max_connections)
+
+    async with ads_async_client(max_connections=max_connections) as client:
+
+        async def harvest_author(author_name):
+            async with semaphore:
+                try:
+                    papers = await async_query_papers_with_abstract(client,
+                                                                    author_name,
+                                                                    refereed=refereed,
+                                                                    years=years,
+                                                                    dico_keyz=dico_keyz,
+                                                                    keywords=keywords)
+                except Exception as error:
+                    papers = error
+            if author_done is not None:
+                author_done(author_name, papers)
+            return author_name, papers
+
+        return dict(await asyncio.gather(*[harvest_author(author_name) for author_name in author_list]))
+
+
+def harvest_authors_concurrently(author_list,
+                                 refereed=None,
+                                 years=None,
+                                 dico_keyz='title',
+                                 keywords=None,
+                                 max_connections=10,
+                                 author_done=None):
+    """Synchronous entry point of async_harvest_authors, usable from the scripts: one event loop for the
+        whole list
+
+    Returns
+    ------------
+    dict, author name -> list of ads publication objects, or the exception raised by its query
+    """
+    return asyncio.run(
+        async_harvest_authors(author_list,
+                              refereed=refereed,
+                              years=years,
+                              dico_keyz=dico_keyz,
+                              keywords=keywords,
+                              max_connections=max_connections,
+                              author_done=author_done))
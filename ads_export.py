@@ -0,0 +1,156 @@
+import json
+from ads_scheduler import ADS_EXPORT_URL, ads_session
+from profiling import profile_stage
+
+# Bulk export of a list of bibcodes by the ADS export service (BibTeX, AASTeX...): the whole list is
+# formatted by ADS in one request (up to EXPORT_CHUNK_SIZE bibcodes), with the journal formatting of ADS,
+# instead of building each line locally. The BibTeX keys are the bibcodes.
+# ADS BibTeX uses the AAS journal macros (\apj, \aap, ...), they are defined in the biblatex document
+# (see biblatex_document) so that the .bib file can be used as is.
+
+# export format of the ADS api -> extension of the saved file
+EXPORT_FORMATS = {
+    'bibtex': '.bib',
+    'bibtexabs': '.bib',
+    'aastex': '_aastex.tex',
+    'icarus': '_icarus.tex',
+    'mnras': '_mnras.tex',
+    'soph': '_soph.tex',
+    'ris': '.ris',
+}
+
+EXPORT_CHUNK_SIZE = 2000  # maximum number of bibcodes per request to the export service
+
+# AAS journal macros used in the ADS BibTeX records
+JOURNAL_MACROS = {
+    'aj': 'AJ',
+    'actaa': 'Acta Astron.',
+    'araa': 'ARA\\&A',
+    'apj': 'ApJ',
+    'apjl': 'ApJL',
+    'apjs': 'ApJS',
+    'ao': 'Appl.~Opt.',
+    'apss': 'Ap\\&SS',
+    'aap': 'A\\&A',
+    'aapr': 'A\\&A~Rev.',
+    'aaps': 'A\\&AS',
+    'baas': 'BAAS',
+    'caa': 'Chinese Astron. Astrophys.',
+    'icarus': 'Icarus',
+    'jcap': 'J. Cosmology Astropart. Phys.',
+    'jrasc': 'JRASC',
+    'memras': 'MmRAS',
+    'mnras': 'MNRAS',
+    'na': 'New A',
+    'nar': 'New A Rev.',
+    'nat': 'Nature',
+    'pasa': 'PASA',
+    'pasp': 'PASP',
+    'pasj': 'PASJ',
+    'planss': 'Planet.~Space~Sci.',
+    'procspie': 'Proc.~SPIE',
+    'psj': 'PSJ',
+    'qjras': 'QJRAS',
+    'rnaas': 'Res. Notes AAS',
+    'sci': 'Science',
+    'solphys': 'Sol.~Phys.',
+    'ssr': 'Space~Sci.~Rev.',
+    'zap': 'ZAp',
+}
+
+
+def export_bibcodes(bibcodes, export_format='bibtex', sort='date desc', max_authors=None):
+    """Format a list of papers with the ADS export service, one request per EXPORT_CHUNK_SIZE bibcodes
+
+    Parameters
+    ----------
+    bibcodes: list of string, each bibcode is exported once
+    export_format: string, format of the ADS export service (see EXPORT_FORMATS)
+    sort: string, order of the records, e.g. 'date desc' or 'first_author asc'
+    max_authors: int or `None`, for BibTeX, number of authors kept in the records. None for the ADS default
+
+    Returns
+    ------------
+    export: string, the formatted records
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise Exception("Unknown export format '{0}', available formats are {1}".format(
+            export_format, list(EXPORT_FORMATS.keys())))
+
+    bibcodes = list(dict.fromkeys(bibcodes))
+    exports = list()
+    with profile_stage('ads_export'):
+        for start in range(0, len(bibcodes), EXPORT_CHUNK_SIZE):
+            payload = {'bibcode': bibcodes[start:start + EXPORT_CHUNK_SIZE], 'sort': sort}
+            if max_authors is not None and export_format.startswith('bibtex'):
+                payload['maxauthor'] = max_authors
+            response = ads_session().post(ADS_EXPORT_URL + '/' + export_format, data=json.dumps(payload))
+            if response.status_code != 200:
+                raise Exception("ADS export query failed: " + response.text)
+            exports.append(response.json()['export'])
+    return '\n'.join(exports)
+
+
+def write_export(output_prefix, bibcodes, export_format='bibtex', sort='date desc', max_authors=None):
+    """Export a list of papers (see export_bibcodes) and save it in output_prefix + extension of the format
+
+    Parameters
+    ----------
+    output_prefix: string, path of the file without extension
+    bibcodes: list of string
+    export_format, sort, max_authors: see export_bibcodes
+
+    Returns
+    ------------
+    filename: string
+    """
+    filename = output_prefix + EXPORT_FORMATS[export_format]
+    export = export_bibcodes(bibcodes, export_format=export_format, sort=sort, max_authors=max_authors)
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(export)
+    return filename
+
+
+def biblatex_document(bib_file,
+                      title,
+                      section_titles,
+                      refereed_bibcodes=(),
+                      geom_string='\\documentclass[10pt]{article}\n',
+                      Number_authors_displayed=3):
+    """Latex document printing a .bib file exported from ADS with biblatex (compile with pdflatex, biber, pdflatex).
+        The papers are printed in three sections: refereed papers, conference proceedings and other papers.
+
+    Parameters
+    ----------
+    bib_file: string, name of the .bib file, relative to the latex file
+    title: string, title of the document
+    section_titles: dict with keys 'ref', 'nonref' and 'other', titles of the sections
+    refereed_bibcodes: list of string, bibcodes of the refereed papers (ADS exports all journal papers as @ARTICLE)
+    geom_string: string, documentclass and geometry of the document
+    Number_authors_displayed: int, number of authors printed by paper (then et al.)
+
+    Returns
+    ------------
+    latex string
+    """
+    return (geom_string + '\\usepackage[utf8]{inputenc}\n' +
+            ('\\usepackage[backend=biber, style=numeric, sorting=ydnt, defernumbers=true, '
+             'maxbibnames={0}, minbibnames={0}]{{biblatex}}\n').format(Number_authors_displayed) +
+            '\\usepackage[usenames, dvipsnames]{xcolor}\n'
+            '\\usepackage[colorlinks = true,urlcolor = BrickRed, breaklinks = true]{hyperref}\n' +
+            ''.join('\\providecommand{{\\{0}}}{{{1}}}\n'.format(macro, journal)
+                    for macro, journal in JOURNAL_MACROS.items()) +
+            '\\addbibresource{' + bib_file + '}\n'
+            '\\DeclareBibliographyCategory{refereed}\n' +
+            ''.join('\\addtocategory{{refereed}}{{{0}}}\n'.format(bibcode) for bibcode in refereed_bibcodes) +
+            '\n\\begin{document}\n\n'
+            '\\begin{center}\\begin{Large}\n'
+            '\\textbf{' + title + '}\n'
+            '\\end{Large}\\end{center}\n\n'
+            '\\nocite{*}\n'
+            '\\printbibliography[category=refereed, title={' + section_titles['ref'] + '}, resetnumbers=true]\n'
+            '\\printbibliography[notcategory=refereed, type=inproceedings, title={' + section_titles['nonref'] +
+            '}, resetnumbers=true]\n'
+            '\\printbibliography[notcategory=refereed, nottype=inproceedings, title={' + section_titles['other'] +
+            '}, resetnumbers=true]\n\n'
+            '\\end{document}\n')
@@ -0,0 +1,210 @@
+import time
+import requests
+import ads
+from profiling import record_ads_response
+
+# All the ADS queries go through one shared http session (see scheduled) which
+# - spaces the requests by at least min_interval seconds,
+# - reads the rate limit headers sent by ADS (one quota per endpoint: search, metrics, export...),
+# - stops before exhausting the run budget (max_requests) or the daily quota (reserve),
+# - backs off and retries when ADS answers 429 (too many requests).
+
+SCHEDULER = {
+    "min_interval": 0.2,  # minimum time between two requests, in seconds
+    "max_requests": None,  # maximum number of requests for this run, None for no limit
+    "reserve": 0,  # number of requests of the daily quota we never use
+    "max_retries": 5,  # number of retries after a 429
+    "backoff": 2.,  # base of the exponential backoff, in seconds
+    "max_wait": 600.,  # we never sleep longer than this, in seconds
+}
+
+ADS_SEARCH_URL = ads.config.SEARCH_URL
+ADS_METRICS_URL = ads.config.METRICS_URL
+ADS_EXPORT_URL = ads.config.EXPORT_URL
+
+RATE_LIMITS = dict()
+SCHEDULER_STATS = {"requests": 0, "throttled": 0, "last_request": 0.}
+
+_SESSION = {"session": None, "token": None}
+
+
+def configure_scheduler(**options):
+    """Set the scheduler options, e.g. configure_scheduler(max_requests=2000, min_interval=0.5).
+        The options can be given in the 'ads_scheduler' key of the yaml file.
+
+    Parameters
+    ----------
+    options: see SCHEDULER for the available keys
+    """
+    for key, value in options.items():
+        if key not in SCHEDULER:
+            raise Exception("Unknown ADS scheduler option '{0}', available options are {1}".format(
+                key, list(SCHEDULER.keys())))
+        SCHEDULER[key] = value
+
+
+def endpoint_name(url):
+    """Name of the ADS endpoint (quota) of an url,
+        e.g. https://api.adsabs.harvard.edu/v1/search/query -> 'search'
+    """
+    path = url.split('?')[0].split('/v1/')[-1]
+    return path.split('/')[0]
+
+
+def update_rate_limits(url, headers):
+    """Read the rate limit headers returned by ADS
+
+    Parameters
+    ----------
+    url: string, url of the request
+    headers: dict like, headers of the answer
+    """
+    if headers.get('X-RateLimit-Remaining') is None:
+        return
+    RATE_LIMITS[endpoint_name(url)] = {
+        "limit": int(headers.get('X-RateLimit-Limit', 0)),
+        "remaining": int(headers.get('X-RateLimit-Remaining')),
+        "reset": int(headers.get('X-RateLimit-Reset', 0)),
+    }
+
+
+def check_budget(url):
+    """Raise if the run budget or the daily quota of the endpoint is exhausted
+
+    Parameters
+    ----------
+    url: string, url of the next request
+    """
+    if SCHEDULER["max_requests"] is not None and SCHEDULER_STATS["requests"] >= SCHEDULER["max_requests"]:
+        raise Exception("ADS request budget of this run ({0} requests) is exhausted".format(
+            SCHEDULER["max_requests"]))
+
+    limits = RATE_LIMITS.get(endpoint_name(url))
+    if limits is not None and limits["remaining"] <= SCHEDULER["reserve"] and limits["reset"] > time.time():
+        raise Exception("ADS daily quota for '{0}' is exhausted (reserve of {1} requests), it resets at {2}".format(
+            endpoint_name(url), SCHEDULER["reserve"], time.ctime(limits["reset"])))
+
+
+def wait_for_turn(url):
+    """Block until the next request to ADS is allowed, raise if the budget is exhausted
+
+    Parameters
+    ----------
+    url: string, url of the next request
+    """
+    check_budget(url)
+
+    elapsed = time.time() - SCHEDULER_STATS["last_request"]
+    if elapsed < SCHEDULER["min_interval"]:
+        time.sleep(SCHEDULER["min_interval"] - elapsed)
+
+
+def backoff_time(headers, attempt):
+    """Time to wait after a 429: the Retry-After header if ADS gives one, else exponential backoff
+    """
+    retry_after = headers.get('Retry-After')
+    if retry_after is not None and retry_after.isdigit():
+        return float(retry_after)
+    return SCHEDULER["backoff"]**(attempt + 1)
+
+
+class ScheduledSession(requests.Session):
+    """http session used by all the ADS queries, see the comment at the top of this file
+    """
+
+    def request(self, method, url, *args, **kwargs):
+        for attempt in range(SCHEDULER["max_retries"] + 1):
+            wait_for_turn(url)
+            SCHEDULER_STATS["last_request"] = time.time()
+            SCHEDULER_STATS["requests"] += 1
+
+            response = super(ScheduledSession, self).request(method, url, *args, **kwargs)
+            record_ads_response(response)
+            update_rate_limits(url, response.headers)
+
+            if response.status_code != 429:
+                return response
+
+            SCHEDULER_STATS["throttled"] += 1
+            if attempt == SCHEDULER["max_retries"]:
+                # no retry left: no wait before giving up
+                break
+            wait = backoff_time(response.headers, attempt)
+            if wait > SCHEDULER["max_wait"]:
+                break
+            print("ADS is throttling us, waiting {0:.0f} s before retrying".format(wait))
+            time.sleep(wait)
+
+        # ads will raise an APIResponseError with the text of the 429
+        return response
+
+
+def ads_session():
+    """Shared http session to ADS, created with the current ads.config.token
+
+    Returns
+    ------------
+    session: ScheduledSession
+    """
+    token = ads.config.token
+    if _SESSION["session"] is None or _SESSION["token"] != token:
+        session = ScheduledSession()
+        session.headers.update({
+            "Authorization": "Bearer {}".format(token),
+            "User-Agent": "ads-api-client/{}".format(ads.__version__),
+            "Content-Type": "application/json",
+        })
+        _SESSION["session"] = session
+        _SESSION["token"] = token
+    return _SESSION["session"]
+
+
+def scheduled(query):
+    """Make an ads query (ads.SearchQuery, ads.MetricsQuery, ads.ExportQuery...) use the scheduler.
+        Example: papers = list(scheduled(ads.SearchQuery(author=author)))
+
+    Parameters
+    ----------
+    query: ads query object
+
+    Returns
+    ------------
+    query: the same query object
+    """
+    query._session = ads_session()
+    return query
+
+
+def quota_wait_time(endpoint='search', margin=0):
+    """Time to wait before the daily quota of an endpoint allows more requests
+
+    Parameters
+    ----------
+    endpoint: string, name of the ADS endpoint (see endpoint_name)
+    margin: int, we also wait if only reserve + margin requests remain
+
+    Returns
+    ------------
+    wait: float, in seconds, 0 if we can go on
+    """
+    limits = RATE_LIMITS.get(endpoint)
+    if limits is None or limits["remaining"] > SCHEDULER["reserve"] + margin:
+        return 0.
+    return max(limits["reset"] - time.time(), 0.)
+
+
+def quota_report():
+    """Requests done during this run and remaining ADS quota
+
+    Returns
+    ------------
+    report: string
+    """
+    lines = [
+        "ADS requests during this run: {0} ({1} throttled)".format(SCHEDULER_STATS["requests"],
+                                                                  SCHEDULER_STATS["throttled"])
+    ]
+    for endpoint, limits in sorted(RATE_LIMITS.items()):
+        lines.append("ADS quota '{0}': {1} remaining out of {2}, resets at {3}".format(
+            endpoint, limits["remaining"], limits["limit"], time.ctime(limits["reset"])))
+    return "\n".join(lines)
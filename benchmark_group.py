@@ -0,0 +1,418 @@
+import os
+import csv
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+import itertools
+
+# Scaling benchmark of the analytics of the group analysis (several_authors_paper_list.py), on synthetic
+# corpora: nothing is queried from ADS. Each paper has authors, french and foreign affiliations (aliases of
+# LAB_RULES with the noise of real ADS affiliations: institutions, addresses, case, typos, missing country)
+# and a title and an abstract, on the topic for a fraction of them. The stages are timed separately:
+#   keyword_triage           is_paper_on_topic on all the papers (select_papers_on_topic)
+#   abstract_index_build     indexing of the titles and abstracts (abstract_index.py, in memory)
+#   abstract_index_query     keywords selection in the index
+#   french_detection         french affiliations of the papers on the topic
+#   lab_classification_cold  labs of these affiliations, empty affiliation cache
+#   lab_classification_warm  same, every affiliation already in the cache
+#   aggregation              aggregate_group_statistics (latex lines, authors, labs per year)
+# and the timings are saved in json and csv with their scaling curves:
+#   python benchmark_group.py --sizes 1000 10000 100000 --output-dir benchmark
+# The local caches are not touched: the benchmark runs in a temporary cache directory.
+
+BENCHMARK = {
+    "sizes": [1000, 10000, 100000],  # number of papers of the corpora
+    "topic_fraction": 0.3,  # fraction of the papers with a keyword in their title or abstract
+    "french_fraction": 0.4,  # probability that an affiliation is french
+    "affiliations_per_paper": 0.5,  # distinct affiliation strings, per paper of the corpus
+    "authors_per_paper": 8,  # median number of authors, the distribution has a long tail (consortium papers)
+    "abstract_words": 180,  # number of words of an abstract
+    "repeat": 1,  # each stage is timed repeat times, the best time is kept
+}
+
+# stages timed by run_stages, in this order
+BENCHMARK_STAGES = [
+    'keyword_triage', 'abstract_index_build', 'abstract_index_query', 'french_detection', 'lab_classification_cold',
+    'lab_classification_warm', 'aggregation'
+]
+
+FRENCH_INSTITUTIONS = [
+    "CNRS", "Université PSL", "Sorbonne Université", "Université Paris Cité", "Université Grenoble Alpes",
+    "Aix Marseille Université", "Université Côte d'Azur", "Observatoire de Paris", "CNES", "Université de Toulouse",
+    "Université Paris-Saclay", "CEA"
+]
+FRENCH_CITIES = [("75014", "Paris"), ("92195", "Meudon"), ("38000", "Grenoble"), ("13388", "Marseille"),
+                 ("06304", "Nice"), ("31400", "Toulouse"), ("69561", "Saint-Genis-Laval"), ("91191", "Gif-sur-Yvette"),
+                 ("33615", "Pessac"), ("67000", "Strasbourg")]
+FOREIGN_AFFILIATIONS = [
+    "Department of Astronomy, University of {0}, {0}, USA", "Max-Planck-Institut für Astronomie, {0}, Germany",
+    "Department of Physics, University of {0}, {0}, UK", "Observatoire Astronomique de l'Université de {0}, Switzerland",
+    "European Southern Observatory, {0}, Chile", "INAF - Osservatorio Astronomico di {0}, Italy",
+    "Instituto de Astrofísica de {0}, Spain", "Leiden Observatory, {0}, The Netherlands"
+]
+FOREIGN_CITIES = ["Geneva", "Heidelberg", "Cambridge", "Padova", "Canarias", "Santiago", "Leiden", "Michigan", "Bern"]
+
+# words of the synthetic titles and abstracts, none of them contains a keyword of the topic
+FILLER_WORDS = ("we present new observations of the stellar population in the galaxy cluster using spectroscopy "
+                "and photometry data from the survey telescope with an instrument model simulation that shows "
+                "the emission line ratios temperature density profile of the gas dust grains molecular cloud "
+                "star formation rate magnetic field turbulence accretion disk black hole mass velocity dispersion "
+                "our results suggest a significant correlation between luminosity and metallicity").split()
+
+
+def synthetic_affiliation(rng, french):
+    """Affiliation string, french (alias of a lab of LAB_RULES) or foreign, with noise
+
+    Parameters
+    ----------
+    rng: random.Random
+    french: bool
+
+    Returns
+    ------------
+    affiliation: string
+    """
+    from lab_affiliations import LAB_RULES
+
+    if not french:
+        return rng.choice(FOREIGN_AFFILIATIONS).format(rng.choice(FOREIGN_CITIES))
+
+    _, aliases = rng.choice(LAB_RULES)
+    lab_name = rng.choice(aliases).strip(' ,')
+    lab_name = rng.choice([lab_name.upper() if len(lab_name) < 8 else lab_name.title(), lab_name, lab_name.title()])
+    if rng.random() < 0.05:
+        # typo: the lab is not found
+        position = rng.randrange(len(lab_name))
+        lab_name = lab_name[:position] + lab_name[position + 1:]
+
+    postcode, city = rng.choice(FRENCH_CITIES)
+    parts = [lab_name] + rng.sample(FRENCH_INSTITUTIONS, rng.randint(0, 3))
+    if rng.random() < 0.3:
+        parts.append("UMR {0}".format(rng.randint(5000, 9000)))
+    if rng.random() < 0.4:
+        parts.append("{0} rue {1}".format(rng.randint(1, 120), rng.choice(["Arago", "Janssen", "des Maraîchers"])))
+    parts.append(postcode + " " + city)
+    country = rng.choice(["France", "France", "France", "FRANCE", "F-" + postcode, ""])
+    if country != "":
+        parts.append(country)
+    return ', '.join(parts)
+
+
+def synthetic_text(rng, number_words, keywords, on_topic):
+    """Title or abstract, with one of the keywords if on_topic
+    """
+    words = rng.choices(FILLER_WORDS, k=number_words)
+    if on_topic:
+        words[rng.randrange(number_words)] = rng.choice(keywords)
+    return ' '.join(words)
+
+
+def synthetic_corpus(number_papers, keywords, seed=0, **options):
+    """Synthetic papers of a group analysis, as returned by ADS with all the fields of the pipeline
+
+    Parameters
+    ----------
+    number_papers: int
+    keywords: list of string, keywords of the topic
+    seed: int, the same seed gives the same corpus
+    options: see BENCHMARK for the available keys (topic_fraction, french_fraction, ...)
+
+    Returns
+    ------------
+    papers: list of ads publication objects
+    """
+    import ads
+
+    benchmark_options = dict(BENCHMARK)
+    benchmark_options.update(options)
+    rng = random.Random(seed)
+
+    # pools of authors and affiliations: the same strings come back in many papers, the biggest labs
+    # and the most prolific authors more often than the others (weights 1 / rank)
+    authors = [
+        "{0}, {1}.".format(''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(4, 10))).capitalize(),
+                           rng.choice('ABCDEFGHIJKLMNOPRSTVW')) for _ in range(max(50, number_papers // 2))
+    ]
+    affiliations = [
+        synthetic_affiliation(rng, rng.random() < benchmark_options["french_fraction"])
+        for _ in range(max(50, int(number_papers * benchmark_options["affiliations_per_paper"])))
+    ]
+    author_weights = list(itertools.accumulate(1. / rank for rank in range(1, len(authors) + 1)))
+    affiliation_weights = list(itertools.accumulate(1. / rank for rank in range(1, len(affiliations) + 1)))
+
+    papers = list()
+    for index in range(number_papers):
+        number_authors = min(500, max(1, int(rng.lognormvariate(math.log(benchmark_options["authors_per_paper"]),
+                                                                0.8))))
+        on_topic = rng.random() < benchmark_options["topic_fraction"]
+        title_on_topic = on_topic and rng.random() < 0.5
+        year = str(rng.randint(2019, 2023))
+        papers.append(
+            ads.search.Article(bibcode="{0}SYNTH{1:09d}".format(year, index),
+                               year=year,
+                               author=rng.choices(authors, cum_weights=author_weights, k=number_authors),
+                               aff=rng.choices(affiliations, cum_weights=affiliation_weights, k=number_authors),
+                               title=[synthetic_text(rng, 12, keywords, title_on_topic)],
+                               abstract=synthetic_text(rng, benchmark_options["abstract_words"], keywords,
+                                                       on_topic and not title_on_topic),
+                               citation_count=rng.randint(0, 200),
+                               pub='Astronomy and Astrophysics',
+                               volume=str(rng.randint(600, 690)),
+                               page=['A{0}'.format(rng.randint(1, 200))],
+                               doi=['10.1051/synthetic/{0}'.format(index)],
+                               identifier=['arXiv:2301.{0:05d}'.format(index % 100000)]))
+    return papers
+
+
+def best_time(function, repeat=1):
+    """Best wall time of a function over repeat calls
+
+    Returns
+    ------------
+    (best time in seconds, result of the last call)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_stages(papers, keywords, repeat=1):
+    """Time the stages of the group analysis on a corpus, see BENCHMARK_STAGES
+
+    Parameters
+    ----------
+    papers: list of ads publication objects, see synthetic_corpus
+    keywords: list of string
+    repeat: int, each stage is timed repeat times, the best time is kept
+
+    Returns
+    ------------
+    dict with keys
+        'timings': dict, stage -> time in seconds
+        'papers_on_topic': int
+        'french_affiliations': int, french affiliations of the papers on the topic
+        'distinct_affiliations': int, distinct french affiliations classified
+    """
+    from abstract_index import open_abstract_index, index_papers, papers_on_topic
+    from lab_affiliations import AFFILIATION_CACHE, lab_rules_hash, paper_labs
+    from several_authors_paper_list import (aggregate_group_statistics, close_latex_spool, is_french_affiliation,
+                                            select_papers_on_topic, stage_fields)
+
+    timings = dict()
+    kept_fields = stage_fields('harvest', 'affiliation', 'latex')
+
+    timings['keyword_triage'], on_topic = best_time(
+        lambda: list(select_papers_on_topic(papers, keywords, kept_fields)), repeat)
+
+    def build_index():
+        connection = open_abstract_index(':memory:')
+        index_papers(connection, papers)
+        return connection
+
+    timings['abstract_index_build'], connection = best_time(build_index, repeat)
+    timings['abstract_index_query'], bibcodes_on_topic = best_time(lambda: papers_on_topic(connection, keywords),
+                                                                   repeat)
+    connection.close()
+    if bibcodes_on_topic != {paper.bibcode for paper in on_topic}:
+        raise ValueError("the abstract index and is_paper_on_topic do not select the same papers")
+
+    timings['french_detection'], french_affiliations = best_time(
+        lambda: [[afil for afil in paper.aff if is_french_affiliation(afil)] for paper in on_topic], repeat)
+
+    def classify_labs():
+        return [paper_labs(paper_affiliations) for paper_affiliations in french_affiliations]
+
+    def empty_affiliation_cache():
+        # current rules, no affiliation classified yet (the cache file is not read)
+        AFFILIATION_CACHE.update({"rules_hash": lab_rules_hash(), "labs": dict(), "new_entries": 0, "hits": 0,
+                                  "classified": 0})
+
+    cold_times = list()
+    for _ in range(repeat):
+        empty_affiliation_cache()
+        cold_time, _ = best_time(classify_labs)
+        cold_times.append(cold_time)
+    timings['lab_classification_cold'] = min(cold_times)
+    distinct_affiliations = len(AFFILIATION_CACHE["labs"])
+    timings['lab_classification_warm'], _ = best_time(classify_labs, repeat)
+
+    # warm affiliation cache, as in a run after the first one. A first call on a few papers loads the modules
+    # and tables used by the latex lines, out of the timing
+    close_latex_spool(aggregate_group_statistics(on_topic[:10])['latex_lines'])
+    timings['aggregation'], statistics = best_time(lambda: aggregate_group_statistics(on_topic), repeat)
+    close_latex_spool(statistics['latex_lines'])
+
+    return {
+        'timings': timings,
+        'papers_on_topic': len(on_topic),
+        'french_affiliations': sum(len(paper_affiliations) for paper_affiliations in french_affiliations),
+        'distinct_affiliations': distinct_affiliations,
+    }
+
+
+def run_benchmark(sizes=None, seed=0, **options):
+    """Time the stages of the group analysis on synthetic corpora of increasing size
+
+    Parameters
+    ----------
+    sizes: list of int or `None`, number of papers of the corpora. Default BENCHMARK["sizes"]
+    seed: int, seed of the synthetic corpora
+    options: see BENCHMARK for the available keys
+
+    Returns
+    ------------
+    results: list of dict, one per size, see run_stages (with 'papers' and 'generation' time in addition)
+    """
+    from several_authors_paper_list import KEYWORDS_EXOPLANETS
+    from lab_affiliations import AFFILIATION_CACHE
+
+    benchmark_options = dict(BENCHMARK)
+    benchmark_options.update(options)
+    repeat = benchmark_options.pop("repeat")
+    benchmark_options.pop("sizes")
+    if sizes is None:
+        sizes = BENCHMARK["sizes"]
+
+    # the affiliation cache (and the profile) of the benchmark must not end in the local caches
+    previous_cache_dir = os.environ.get('PUBLIST_CACHE_DIR')
+    results = list()
+    with tempfile.TemporaryDirectory() as temporary_cache_dir:
+        os.environ['PUBLIST_CACHE_DIR'] = temporary_cache_dir
+        try:
+            for number_papers in sizes:
+                generation_time, papers = best_time(
+                    lambda: synthetic_corpus(number_papers, KEYWORDS_EXOPLANETS, seed=seed, **benchmark_options))
+                result = run_stages(papers, KEYWORDS_EXOPLANETS, repeat=repeat)
+                result.update({'papers': number_papers, 'generation': generation_time})
+                results.append(result)
+                print(benchmark_line(result))
+                del papers
+        finally:
+            if previous_cache_dir is None:
+                del os.environ['PUBLIST_CACHE_DIR']
+            else:
+                os.environ['PUBLIST_CACHE_DIR'] = previous_cache_dir
+            # the next run of the group analysis reads the real cache again
+            AFFILIATION_CACHE["rules_hash"] = None
+    return results
+
+
+def benchmark_line(result):
+    """One line of report: time of each stage for a corpus
+    """
+    return "{0:>8d} papers ({1} on topic, {2} distinct french affiliations): ".format(
+        result['papers'], result['papers_on_topic'], result['distinct_affiliations']) + ", ".join(
+            "{0} {1:.3f} s".format(stage, result['timings'][stage]) for stage in BENCHMARK_STAGES)
+
+
+def scaling_exponents(results):
+    """Exponent of the time of each stage with the number of papers, between the two biggest corpora
+        (1: linear, 2: quadratic...)
+
+    Returns
+    ------------
+    dict, stage -> exponent (None if less than 2 corpora or a time is 0)
+    """
+    if len(results) < 2:
+        return {stage: None for stage in BENCHMARK_STAGES}
+    small, big = sorted(results, key=lambda result: result['papers'])[-2:]
+    exponents = dict()
+    for stage in BENCHMARK_STAGES:
+        if small['timings'][stage] <= 0 or big['timings'][stage] <= 0 or small['papers'] == big['papers']:
+            exponents[stage] = None
+            continue
+        exponents[stage] = (math.log(big['timings'][stage] / small['timings'][stage]) /
+                            math.log(big['papers'] / small['papers']))
+    return exponents
+
+
+def write_benchmark(output_dir, results):
+    """Save the results in benchmark_group.json and benchmark_group.csv (one row per corpus, one column per stage)
+        and draw the scaling curves in benchmark_group.pdf
+
+    Parameters
+    ----------
+    output_dir: string
+    results: list of dict, see run_benchmark
+
+    Returns
+    ------------
+    filenames: list of string
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    json_file = os.path.join(output_dir, 'benchmark_group.json')
+    with open(json_file, 'w') as f:
+        json.dump({'options': BENCHMARK, 'results': results, 'scaling_exponents': scaling_exponents(results)},
+                  f,
+                  indent=2)
+
+    csv_file = os.path.join(output_dir, 'benchmark_group.csv')
+    with open(csv_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['papers', 'papers_on_topic', 'french_affiliations', 'distinct_affiliations'] +
+                        BENCHMARK_STAGES)
+        for result in results:
+            writer.writerow([
+                result['papers'], result['papers_on_topic'], result['french_affiliations'],
+                result['distinct_affiliations']
+            ] + ['{0:.6f}'.format(result['timings'][stage]) for stage in BENCHMARK_STAGES])
+
+    plot_file = os.path.join(output_dir, 'benchmark_group.pdf')
+    plot_scaling(plot_file, results)
+    return [json_file, csv_file, plot_file]
+
+
+def plot_scaling(filename, results):
+    """Time of each stage vs number of papers (log-log), with a linear scaling for reference
+
+    Parameters
+    ----------
+    filename: string, pdf or png file
+    results: list of dict, see run_benchmark
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+
+    results = sorted(results, key=lambda result: result['papers'])
+    sizes = [result['papers'] for result in results]
+    exponents = scaling_exponents(results)
+
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    for stage in BENCHMARK_STAGES:
+        label = stage if exponents[stage] is None else "{0} (n^{1:.2f})".format(stage, exponents[stage])
+        ax.plot(sizes, [max(result['timings'][stage], 1e-6) for result in results], marker='o', label=label)
+    # linear scaling from the slowest stage of the smallest corpus
+    reference = max(results[0]['timings'].values())
+    ax.plot(sizes, [reference * size / sizes[0] for size in sizes], color='grey', linestyle='--', label='linear')
+
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.set_xlabel('Number of papers')
+    ax.set_ylabel('Time (s)')
+    ax.set_title('Group analysis: time per stage')
+    ax.legend(fontsize='small')
+    fig.savefig(filename)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scaling benchmark of the group analysis on synthetic corpora')
+    parser.add_argument('--sizes', nargs='+', type=int, default=BENCHMARK["sizes"], help='number of papers')
+    parser.add_argument('--repeat', type=int, default=BENCHMARK["repeat"], help='best of repeat times per stage')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default=os.path.join(os.getcwd(), 'benchmark'))
+    args = parser.parse_args()
+
+    benchmark_results = run_benchmark(sizes=args.sizes, seed=args.seed, repeat=args.repeat)
+    for stage, exponent in scaling_exponents(benchmark_results).items():
+        if exponent is not None:
+            print("{0:<25} time ~ n^{1:.2f}".format(stage, exponent))
+    print("Saved: " + ", ".join(write_benchmark(args.output_dir, benchmark_results)))
@@ -0,0 +1,252 @@
+import csv
+import time
+import numpy as np
+
+# Bibliometric indices computed from citation counts already downloaded (no ADS query).
+# All the researchers of a cohort are computed at once: their citation counts are put in one
+# array (one line per researcher, sorted in decreasing order, padded with zeros).
+
+# The metrics can also be computed by the ADS metrics service (server_metrics) from the bibcodes only:
+# papers are then queried with the small 'citation_count' field instead of the full 'citation' lists.
+
+METRICS_KEYS = [
+    'n_papers', 'citations', 'h_index', 'g_index', 'i10_index', 'm_index', 'first_year', 'refereed_papers',
+    'refereed_citations', 'refereed_h_index'
+]
+
+# the ADS metrics service refuses the requests with more bibcodes
+ADS_METRICS_MAX_BIBCODES = 2000
+
+
+def paper_citation_count(paper):
+    """Number of citations of an ads paper, 0 if unknown.
+        Uses the 'citation_count' field if it was queried, else the length of the 'citation' list.
+
+    Parameters
+    ----------
+    paper: ads publication object
+
+    Returns
+    ------------
+    number_citations: int
+    """
+    if paper._raw.get('citation_count') is not None:
+        return paper._raw['citation_count']
+    if paper.citation is None:
+        return 0
+    return len(paper.citation)
+
+
+def citation_matrix(citations_per_researcher):
+    """Put the citation counts of several researchers in one array
+
+    Parameters
+    ----------
+    citations_per_researcher: list of list of int, citation counts of the papers of each researcher
+
+    Returns
+    ------------
+    citations: 2d array (researchers x papers), each line sorted in decreasing order and padded with 0
+    """
+    max_papers = max([len(citations) for citations in citations_per_researcher] + [1])
+    citations = np.zeros((len(citations_per_researcher), max_papers), dtype=int)
+    for i, researcher_citations in enumerate(citations_per_researcher):
+        citations[i, :len(researcher_citations)] = researcher_citations
+    return -np.sort(-citations, axis=1)
+
+
+def bibliometric_indices(citations_per_researcher, first_years=None, current_year=None):
+    """Compute h, g, i10 and m-index of several researchers at once
+
+    Parameters
+    ----------
+    citations_per_researcher: list of list of int, citation counts of the papers of each researcher
+    first_years: list of int or None, year of the first paper of each researcher (needed for the m-index)
+    current_year: int or None, year used for the m-index, default is the current year
+
+    Returns
+    ------------
+    dict of 1d arrays (one value per researcher) with keys 'n_papers', 'citations', 'h_index',
+        'g_index', 'i10_index' and 'm_index' (and 'first_year' if first_years is given)
+    """
+    citations = citation_matrix(citations_per_researcher)
+    ranks = np.arange(1, citations.shape[1] + 1)
+
+    indices = dict()
+    indices['n_papers'] = np.array([len(researcher_citations) for researcher_citations in citations_per_researcher])
+    indices['citations'] = citations.sum(axis=1)
+    # h: number of papers with at least as many citations as their rank
+    indices['h_index'] = (citations >= ranks).sum(axis=1)
+    # g: largest rank g such as the g most cited papers have at least g^2 citations
+    indices['g_index'] = (np.cumsum(citations, axis=1) >= ranks**2).sum(axis=1)
+    indices['i10_index'] = (citations >= 10).sum(axis=1)
+
+    if first_years is not None:
+        if current_year is None:
+            current_year = time.localtime().tm_year
+        indices['first_year'] = np.array(first_years)
+        indices['m_index'] = indices['h_index'] / np.maximum(current_year - indices['first_year'] + 1, 1)
+    else:
+        indices['m_index'] = np.full(len(citations_per_researcher), np.nan)
+
+    return indices
+
+
+def cohort_metrics(papers_per_researcher, current_year=None, refereed_per_researcher=None):
+    """Bibliometric indices of a cohort from their papers
+
+    Parameters
+    ----------
+    papers_per_researcher: dict, researcher name -> list of ads publication objects
+    current_year: int or None, year used for the m-index, default is the current year
+    refereed_per_researcher: dict or None, researcher name -> list of their refereed papers, needed for the
+                refereed_* metrics (e.g. papers_per_researcher itself if only refereed papers were queried)
+
+    Returns
+    ------------
+    dict, researcher name -> dict of metrics (see METRICS_KEYS)
+    """
+    names = list(papers_per_researcher.keys())
+    citations_per_researcher = [[paper_citation_count(paper) for paper in papers_per_researcher[name]]
+                                for name in names]
+    first_years = [
+        min([int(paper.year) for paper in papers_per_researcher[name]] + [current_year or time.localtime().tm_year])
+        for name in names
+    ]
+
+    indices = bibliometric_indices(citations_per_researcher, first_years=first_years, current_year=current_year)
+
+    metrics = dict()
+    for i, name in enumerate(names):
+        metrics[name] = {key: indices[key][i].item() for key in METRICS_KEYS if key in indices}
+
+    if refereed_per_researcher is not None:
+        refereed_indices = bibliometric_indices(
+            [[paper_citation_count(paper) for paper in refereed_per_researcher.get(name, list())] for name in names])
+        for i, name in enumerate(names):
+            metrics[name]['refereed_papers'] = refereed_indices['n_papers'][i].item()
+            metrics[name]['refereed_citations'] = refereed_indices['citations'][i].item()
+            metrics[name]['refereed_h_index'] = refereed_indices['h_index'][i].item()
+    return metrics
+
+
+def researcher_metrics(papers, current_year=None, refereed_papers=None):
+    """Bibliometric indices of one researcher from their papers
+
+    Parameters
+    ----------
+    papers: list of ads publication objects
+    current_year: int or None, year used for the m-index, default is the current year
+    refereed_papers: list of ads publication objects or None, the refereed ones among papers,
+                needed for the refereed_* metrics
+
+    Returns
+    ------------
+    dict of metrics (see METRICS_KEYS)
+    """
+    refereed_per_researcher = None if refereed_papers is None else {'researcher': refereed_papers}
+    return cohort_metrics({'researcher': papers},
+                          current_year=current_year,
+                          refereed_per_researcher=refereed_per_researcher)['researcher']
+
+
+def server_metrics(bibcodes):
+    """Bibliometric indices computed by the ADS metrics service, in one request for all the bibcodes
+        (at most ADS_METRICS_MAX_BIBCODES). Only the basic stats, citation stats and indicators are requested,
+        not the histograms.
+
+    Parameters
+    ----------
+    bibcodes: list of string
+
+    Returns
+    ------------
+    dict of metrics (see METRICS_KEYS)
+    """
+    import json
+    from ads_scheduler import ADS_METRICS_URL, ads_session
+
+    bibcodes = list(bibcodes)
+    if len(bibcodes) == 0:
+        # no paper in the range: ADS answers an error, the metrics are all zero
+        return {
+            'n_papers': 0,
+            'citations': 0,
+            'h_index': 0,
+            'g_index': 0,
+            'i10_index': 0,
+            'm_index': 0.,
+            'refereed_papers': 0,
+            'refereed_citations': 0,
+            'refereed_h_index': 0,
+        }
+
+    if len(bibcodes) > ADS_METRICS_MAX_BIBCODES:
+        raise Exception("{0} bibcodes, the ADS metrics service accepts at most {1}: compute the metrics locally "
+                        "(researcher_metrics)".format(len(bibcodes), ADS_METRICS_MAX_BIBCODES))
+
+    response = ads_session().post(ADS_METRICS_URL,
+                                  data=json.dumps({
+                                      'bibcodes': bibcodes,
+                                      'types': ['basic', 'citations', 'indicators']
+                                  }))
+    if response.status_code != 200:
+        raise Exception("ADS metrics query failed: " + response.text)
+    ads_metrics = response.json()
+
+    return {
+        'n_papers': ads_metrics['basic stats']['number of papers'],
+        'citations': ads_metrics['citation stats']['total number of citations'],
+        'h_index': ads_metrics['indicators']['h'],
+        'g_index': ads_metrics['indicators']['g'],
+        'i10_index': ads_metrics['indicators']['i10'],
+        'm_index': ads_metrics['indicators']['m'],
+        'refereed_papers': ads_metrics['basic stats refereed']['number of papers'],
+        'refereed_citations': ads_metrics['citation stats refereed']['total number of citations'],
+        'refereed_h_index': ads_metrics['indicators refereed']['h'],
+    }
+
+
+def write_metrics_csv(filename, metrics_per_researcher):
+    """Save the metrics of one or several researchers in a csv file
+
+    Parameters
+    ----------
+    filename: string
+    metrics_per_researcher: dict, researcher name -> dict of metrics (see cohort_metrics). Only the metrics
+                known for at least one researcher are written (e.g. no first_year for the server metrics)
+    """
+    keys = [key for key in METRICS_KEYS if any(key in metrics for metrics in metrics_per_researcher.values())]
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['researcher'] + keys)
+        for name, metrics in metrics_per_researcher.items():
+            writer.writerow([name] + [metrics.get(key) for key in keys])
+
+
+def metrics_latex_line(metrics, french=False, separator=' \\quad '):
+    """Line of the latex header with the metrics
+
+    Parameters
+    ----------
+    metrics: dict of metrics (see researcher_metrics)
+    french: Bool
+        If true, in french, else in english
+    separator: string, between two metrics (e.g. ' | ' for a text or html line)
+
+    Returns
+    ------------
+    latex string
+    """
+    if french:
+        names = ['Publications', 'Citations', 'indice h', 'indice g', 'indice i10', 'indice m']
+    else:
+        names = ['Publications', 'Citations', 'h-index', 'g-index', 'i10-index', 'm-index']
+    values = [
+        str(metrics['n_papers']),
+        str(metrics['citations']),
+        str(metrics['h_index']),
+        str(metrics['g_index']),
+        str(metrics['i10_index']), '{0:.2f}'.format(metrics['m_index'])
+    ]
+    return separator.join([name + ': ' + value for name, value in zip(names, values)]) + ' (ADS)'
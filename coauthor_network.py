@@ -0,0 +1,313 @@
+import csv
+import numpy as np
+import scipy.sparse
+from scipy.sparse.csgraph import connected_components
+from xml.sax.saxutils import escape
+from unidecode import unidecode
+from profiling import profile_stage
+
+# Co-authorship graph of a corpus of papers (e.g. the papers harvested by several_authors_paper_list.py).
+# Authors are identified by their normalised name (last name without accents, first initial), papers
+# are the columns of a sparse author x paper incidence matrix A. The number of papers shared by
+# two authors is then (A A^T)_ij, computed as one sparse product even for tens of thousands of
+# author slots. The same is done for the labs, from the lab acronyms of each paper.
+
+
+def normalise_author_name(author):
+    """Name used to identify an author in the network: 'Mazoyer, Johan' and 'Mazoyer, J.' -> 'mazoyer, j'
+
+    Parameters
+    ----------
+    author: string, author name as given by ADS ('last name, first name')
+
+    Returns
+    ------------
+    normalised_name: string
+    """
+    names = unidecode(author).lower().split(',')
+    last_name = ' '.join(names[0].replace('-', ' ').split())
+    first_name = names[1].strip() if len(names) > 1 else ''
+    if len(first_name) > 0:
+        return last_name + ', ' + first_name[0]
+    return last_name
+
+
+def incidence_matrix(items_per_paper, item_index=None):
+    """Sparse incidence matrix of a corpus: one line per item (author, lab...), one column per paper
+
+    Parameters
+    ----------
+    items_per_paper: list of list of string, items of each paper (already normalised)
+    item_index: dict or `None`, item -> line, of the items already known (completed with the new items).
+        None to start from no item
+
+    Returns
+    ------------
+    incidence: scipy.sparse.csr_matrix of int (items x papers), 1 if the item is in the paper
+    item_names: list of string, name of each line
+    """
+    if item_index is None:
+        item_index = dict()
+    rows = list()
+    columns = list()
+    for paper_index, items in enumerate(items_per_paper):
+        # an author can appear twice in the author list of a paper (homonyms), counted once
+        for item in set(items):
+            rows.append(item_index.setdefault(item, len(item_index)))
+            columns.append(paper_index)
+
+    incidence = scipy.sparse.csr_matrix((np.ones(len(rows), dtype=int), (rows, columns)),
+                                        shape=(len(item_index), len(items_per_paper)))
+    return incidence, list(item_index.keys())
+
+
+def cooccurrence_matrix(incidence):
+    """Number of papers shared by each pair of items
+
+    Parameters
+    ----------
+    incidence: scipy.sparse matrix (items x papers), see incidence_matrix
+
+    Returns
+    ------------
+    cooccurrences: scipy.sparse.csr_matrix of int (items x items), with a zero diagonal
+    number_papers: 1d array, number of papers of each item
+    """
+    return split_cooccurrences((incidence @ incidence.T).tocsr())
+
+
+def split_cooccurrences(cooccurrences):
+    """Number of papers of each item (diagonal) and shared by each pair of items (the rest), see cooccurrence_matrix
+
+    Parameters
+    ----------
+    cooccurrences: scipy.sparse.csr_matrix of int (items x items), A A^T, modified in place
+
+    Returns
+    ------------
+    cooccurrences: scipy.sparse.csr_matrix of int (items x items), with a zero diagonal
+    number_papers: 1d array, number of papers of each item
+    """
+    number_papers = cooccurrences.diagonal()
+    cooccurrences.setdiag(0)
+    cooccurrences.eliminate_zeros()
+    return cooccurrences, number_papers
+
+
+def collaboration_clusters(cooccurrences, min_papers=1):
+    """Groups of items linked by a chain of collaborations (connected components of the graph)
+
+    Parameters
+    ----------
+    cooccurrences: scipy.sparse matrix (items x items), see cooccurrence_matrix
+    min_papers: int, two items are linked if they share at least min_papers papers
+
+    Returns
+    ------------
+    number_clusters: int
+    cluster_labels: 1d array, cluster of each item. Clusters are numbered by decreasing size
+    """
+    links = (cooccurrences >= min_papers).astype(int)
+    number_clusters, labels = connected_components(links, directed=False)
+
+    # renumber the clusters so that 0 is the biggest one
+    sizes = np.bincount(labels, minlength=number_clusters)
+    order = np.argsort(-sizes, kind='stable')
+    renumber = np.empty(number_clusters, dtype=int)
+    renumber[order] = np.arange(number_clusters)
+    return number_clusters, renumber[labels]
+
+
+def coauthor_network(papers):
+    """Co-authorship network of a list of papers
+
+    Parameters
+    ----------
+    papers: list of ads publication objects
+
+    Returns
+    ------------
+    network: dict with keys 'names' (normalised author names), 'number_papers' (1d array),
+        'cooccurrences' (sparse matrix of the number of papers shared) and 'clusters' (1d array)
+    """
+    with profile_stage('coauthor_network'):
+        normalised_names = dict()
+        authors_per_paper = [normalise_authors(paper.author, normalised_names) for paper in papers]
+        return cooccurrence_network(authors_per_paper)
+
+
+def normalise_authors(authors, normalised_names):
+    """Normalised names of the authors of a paper, see normalise_author_name
+
+    Parameters
+    ----------
+    authors: list of string, authors of the paper
+    normalised_names: dict, author -> normalised name, filled as we go: the same author strings
+        come back in many papers, each one is normalised once
+
+    Returns
+    ------------
+    list of string
+    """
+    normalised_authors = list()
+    for author in authors:
+        if author not in normalised_names:
+            normalised_names[author] = normalise_author_name(author)
+        normalised_authors.append(normalised_names[author])
+    return normalised_authors
+
+
+def lab_network(labs_per_paper):
+    """Collaboration network between labs
+
+    Parameters
+    ----------
+    labs_per_paper: list of list of string, lab acronyms of each paper (the group analysis builds the same network
+        paper by paper, see network_accumulator)
+
+    Returns
+    ------------
+    network: dict, see coauthor_network
+    """
+    with profile_stage('lab_network'):
+        return cooccurrence_network(labs_per_paper)
+
+
+def cooccurrence_network(items_per_paper, min_papers=1):
+    """Network of the items (authors, labs...) appearing together in papers, see coauthor_network
+    """
+    incidence, names = incidence_matrix(items_per_paper)
+    cooccurrences, number_papers = cooccurrence_matrix(incidence)
+    _, clusters = collaboration_clusters(cooccurrences, min_papers=min_papers)
+    return {'names': names, 'number_papers': number_papers, 'cooccurrences': cooccurrences, 'clusters': clusters}
+
+
+def network_accumulator(chunk_size=2000):
+    """Network built paper by paper (see add_network_paper), when the papers are streamed: only the names of the
+        items and the co-occurrence counts are kept (their size grows with the number of collaborations, not with
+        the number of papers)
+
+    Parameters
+    ----------
+    chunk_size: int, papers added to the counts at once (one sparse product per chunk)
+
+    Returns
+    ------------
+    accumulator: dict
+    """
+    return {
+        'item_index': dict(),
+        'cooccurrences': scipy.sparse.csr_matrix((0, 0), dtype=int),
+        'pending': list(),
+        'chunk_size': chunk_size,
+    }
+
+
+def add_network_paper(accumulator, items):
+    """Add the items (normalised authors, labs...) of one paper to a network, see network_accumulator
+    """
+    accumulator['pending'].append(items)
+    if len(accumulator['pending']) >= accumulator['chunk_size']:
+        flush_network_papers(accumulator)
+
+
+def flush_network_papers(accumulator):
+    """Add the pending papers of a network to its co-occurrence counts
+    """
+    if len(accumulator['pending']) == 0:
+        return
+    incidence, _ = incidence_matrix(accumulator['pending'], item_index=accumulator['item_index'])
+    cooccurrences = accumulator['cooccurrences']
+    cooccurrences.resize((incidence.shape[0], incidence.shape[0]))
+    accumulator['cooccurrences'] = (cooccurrences + incidence @ incidence.T).tocsr()
+    accumulator['pending'] = list()
+
+
+def accumulated_network(accumulator, min_papers=1):
+    """Network of the papers added to an accumulator, see network_accumulator and coauthor_network
+
+    Returns
+    ------------
+    network: dict, see coauthor_network
+    """
+    flush_network_papers(accumulator)
+    cooccurrences, number_papers = split_cooccurrences(accumulator['cooccurrences'].copy())
+    _, clusters = collaboration_clusters(cooccurrences, min_papers=min_papers)
+    return {
+        'names': list(accumulator['item_index'].keys()),
+        'number_papers': number_papers,
+        'cooccurrences': cooccurrences,
+        'clusters': clusters
+    }
+
+
+def network_edges(network):
+    """Edges of the network, each pair of items once
+
+    Parameters
+    ----------
+    network: dict, see coauthor_network
+
+    Returns
+    ------------
+    sources, targets, weights: 1d arrays (indices of the items and number of papers shared)
+    """
+    upper = scipy.sparse.triu(network['cooccurrences'], k=1).tocoo()
+    return upper.row, upper.col, upper.data
+
+
+def write_network_csv(filename, network):
+    """Save the edges of the network in a csv file (source, target, number of papers shared)
+
+    Parameters
+    ----------
+    filename: string
+    network: dict, see coauthor_network
+    """
+    names = network['names']
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['source', 'target', 'papers'])
+        sources, targets, weights = network_edges(network)
+        writer.writerows(zip([names[i] for i in sources], [names[i] for i in targets], weights.tolist()))
+
+
+def write_network_graphml(filename, network):
+    """Save the network in a GraphML file (Gephi, Cytoscape, networkx...). The nodes carry
+        their number of papers and their cluster, the edges the number of papers shared.
+
+    Parameters
+    ----------
+    filename: string
+    network: dict, see coauthor_network
+    """
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+                '  <key id="papers" for="node" attr.name="papers" attr.type="int"/>\n'
+                '  <key id="cluster" for="node" attr.name="cluster" attr.type="int"/>\n'
+                '  <key id="weight" for="edge" attr.name="weight" attr.type="int"/>\n'
+                '  <graph id="collaborations" edgedefault="undirected">\n')
+        for i, name in enumerate(network['names']):
+            f.write('    <node id="n{0}"><data key="label">{1}</data><data key="papers">{2}</data>'
+                    '<data key="cluster">{3}</data></node>\n'.format(i, escape(name), network['number_papers'][i],
+                                                                      network['clusters'][i]))
+        sources, targets, weights = network_edges(network)
+        f.writelines('    <edge source="n{0}" target="n{1}"><data key="weight">{2}</data></edge>\n'.format(
+            source, target, weight) for source, target, weight in zip(sources.tolist(), targets.tolist(),
+                                                                     weights.tolist()))
+        f.write('  </graph>\n</graphml>\n')
+
+
+def write_network(output_prefix, network):
+    """Save the network in output_prefix.graphml and its edges in output_prefix.csv
+
+    Parameters
+    ----------
+    output_prefix: string, path of the files without extension
+    network: dict, see coauthor_network
+    """
+    with profile_stage('write_network'):
+        write_network_graphml(output_prefix + '.graphml', network)
+        write_network_csv(output_prefix + '.csv', network)
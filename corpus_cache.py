@@ -0,0 +1,163 @@
+import time
+import hashlib
+import ads
+from ads_scheduler import scheduled
+from publist_cache import load_json_cache, save_json_cache
+from profiling import profile_stage
+from lazy_loads import link_papers
+
+# Local copy of the papers returned by an ADS query (author + filters + fields), the "corpus".
+# When the corpus cache is enabled (see configure_corpus_cache), query_papers (create_publist.py) reads the papers
+# from the corpus and only asks ADS for the records entered since the last refresh (entdate filter), which
+# is one small request instead of the full list. Citation counts and removed records are only updated by
+# a full refresh, every full_refresh_days.
+
+CORPUS_CACHE = {
+    "enabled": False,  # if False, query_papers always queries ADS
+    "max_age_days": 1.,  # the corpus is refreshed when it is older than this, 0 to refresh at every query
+    "full_refresh_days": 7.,  # a full query (new citation counts, removed records) every full_refresh_days
+    "entdate_margin_days": 2,  # records entered up to this number of days before the last refresh are queried again
+}
+
+# fields always stored in the corpus: key of the papers, order of the list and incremental refresh
+CORPUS_FIELDS = ['bibcode', 'pubdate', 'entdate']
+
+
+def configure_corpus_cache(**options):
+    """Set the corpus cache options, e.g. configure_corpus_cache(enabled=True, max_age_days=0.5).
+        The options can be given in the 'corpus_cache' key of the yaml file.
+
+    Parameters
+    ----------
+    options: see CORPUS_CACHE for the available keys
+    """
+    for key, value in options.items():
+        if key not in CORPUS_CACHE:
+            raise Exception("Unknown corpus cache option '{0}', available options are {1}".format(
+                key, list(CORPUS_CACHE.keys())))
+        CORPUS_CACHE[key] = value
+
+
+def corpus_name(author, q, fq, fl):
+    """Name of the cache file of the corpus of a query
+
+    Returns
+    ------------
+    name: string
+    """
+    key = '|'.join([author, q, fq, ','.join(sorted(fl))])
+    return 'corpus_' + hashlib.sha256(key.encode()).hexdigest()[:20] + '.json'
+
+
+def query_corpus_records(author, q, fq, fl, rows=1000):
+    """Raw ADS records of a query, with the fields of the corpus
+
+    Returns
+    ------------
+    records: dict, bibcode -> raw record (dict)
+    """
+    papers = scheduled(
+        ads.SearchQuery(author=author,
+                        fq=fq,
+                        q=q,
+                        sort='pubdate',
+                        rows=rows,
+                        fl=list(dict.fromkeys(list(fl) + CORPUS_FIELDS))))
+    return {paper._raw['bibcode']: paper._raw for paper in papers}
+
+
+def refresh_corpus(corpus, author, q, fq, fl, rows=1000, full=False):
+    """Update a corpus from ADS: all the records if full, else only the ones entered since the last refresh
+
+    Parameters
+    ----------
+    corpus: dict, see load_corpus
+    author, q, fq, fl, rows: ADS query, see create_publist.query_papers
+    full: bool, if True the whole list is queried again
+
+    Returns
+    ------------
+    changed: bool, True if a record was added, removed or modified
+    """
+    now = time.time()
+    with profile_stage('corpus_refresh'):
+        if full:
+            records = query_corpus_records(author, q, fq, fl, rows=rows)
+            changed = records != corpus['papers']
+            corpus['papers'] = records
+            corpus['full_refresh'] = now
+        else:
+            since = time.strftime('%Y-%m-%d',
+                                  time.gmtime(corpus['refresh'] - CORPUS_CACHE["entdate_margin_days"] * 86400))
+            records = query_corpus_records(author, q, fq + ' entdate:[{0} TO *]'.format(since), fl, rows=rows)
+            changed = any(corpus['papers'].get(bibcode) != record for bibcode, record in records.items())
+            corpus['papers'].update(records)
+
+    corpus['refresh'] = now
+    if changed:
+        corpus['changed'] = now
+    return changed
+
+
+def load_corpus(author, q, fq, fl):
+    """Corpus of a query, as saved on disk (empty if it was never queried)
+
+    Returns
+    ------------
+    corpus: dict with keys 'papers' (bibcode -> raw record), 'refresh', 'full_refresh' and 'changed' (times)
+    """
+    return load_json_cache(corpus_name(author, q, fq, fl),
+                           default={
+                               'papers': dict(),
+                               'refresh': 0.,
+                               'full_refresh': 0.,
+                               'changed': 0.
+                           })
+
+
+def corpus_changed_time(author, q, fq, fl):
+    """Last time a record of the corpus of a query was added, removed or modified (0 if never), to skip the
+        outputs that only depend on the papers (exports, server metrics) when nothing changed
+
+    Returns
+    ------------
+    changed: float, time
+    """
+    return load_corpus(author, q, fq, fl)['changed']
+
+
+def corpus_articles(corpus):
+    """Papers of a corpus, in the order of ADS (most recent first)
+
+    Returns
+    ------------
+    list of ads publication objects
+    """
+    records = sorted(corpus['papers'].values(),
+                     key=lambda record: (record.get('pubdate') or '', record['bibcode']),
+                     reverse=True)
+    return link_papers([ads.search.Article(**record) for record in records])
+
+
+def corpus_papers(author, q, fq, fl, rows=1000, max_age_days=None):
+    """Papers of an ADS query read from the local corpus, refreshed first if it is too old
+
+    Parameters
+    ----------
+    author, q, fq, fl, rows: ADS query, see create_publist.query_papers
+    max_age_days: float or `None`, refresh the corpus if it is older than this. Default CORPUS_CACHE["max_age_days"]
+
+    Returns
+    ------------
+    list of ads publication objects
+    """
+    if max_age_days is None:
+        max_age_days = CORPUS_CACHE["max_age_days"]
+
+    corpus = load_corpus(author, q, fq, fl)
+    now = time.time()
+    if now - corpus['refresh'] >= max_age_days * 86400:
+        full = now - corpus['full_refresh'] >= CORPUS_CACHE["full_refresh_days"] * 86400
+        refresh_corpus(corpus, author, q, fq, fl, rows=rows, full=full)
+        save_json_cache(corpus_name(author, q, fq, fl), corpus)
+    return corpus_articles(corpus)
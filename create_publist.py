@@ -1,9 +1,22 @@
 import os
+import io
 import time
-from pylatexenc.latexencode import utf8tolatex
+import heapq
+import argparse
 import ads
 import yaml
 import unicodedata, string
+import hashlib
+import html
+import re
+import filecmp
+from profiling import profile_stage, profile_function, record_papers, write_profile_report
+from ads_scheduler import ADS_SEARCH_URL, ads_session, scheduled, configure_scheduler, quota_report
+from publist_cache import load_json_cache, save_json_cache
+from bibliometrics import researcher_metrics, server_metrics, write_metrics_csv, metrics_latex_line, paper_citation_count
+from bibliometrics import ADS_METRICS_MAX_BIBCODES
+from lazy_loads import set_lazy_load_mode
+from corpus_cache import CORPUS_CACHE, configure_corpus_cache, corpus_papers, corpus_changed_time
 
 import warnings
 warnings.simplefilter('ignore', SyntaxWarning)
@@ -13,20 +26,176 @@ warnings.simplefilter('ignore', SyntaxWarning)
 # https://mommermi.github.io/software/2019/01/27/generating-latex-publication-lists-from-nasa-ads.html
 
 
-def check_ads_token():
-    """Check if the given token exist py trying to runa query
+@profile_function('utf8tolatex')
+def utf8tolatex(*args, **kwargs):
+    """pylatexenc.latexencode.utf8tolatex, imported on first use to keep the import of this module fast.
+        Time spent in latex encoding is reported separately in the profile.
     """
+    from pylatexenc.latexencode import utf8tolatex as pylatexenc_utf8tolatex
+    return pylatexenc_utf8tolatex(*args, **kwargs)
+
+
+# fields requested to ADS for the publication lists
+PAPER_FIELDS = ['title', 'author', 'year', 'volume', 'page', 'pub', 'identifier', 'citation', 'doi', 'bibcode']
+# same with only the number of citations, when the metrics are computed by ADS (metrics_source='server')
+PAPER_FIELDS_CITATION_COUNT = [field if field != 'citation' else 'citation_count' for field in PAPER_FIELDS]
+
+# records we never list, excluded by ADS itself (negated filter query, see ads_query_filters) instead of
+# being downloaded and rejected by reject_cit. Keys are ADS fields, values are the excluded values.
+# The values of a field can be changed with 'ads_exclusions' in the yaml file (see configure_exclusions).
+DEFAULT_ADS_EXCLUSIONS_PAPERS = {
+    # meeting abstracts (AAS, DPS, EGU...), VizieR catalogs, telescope proposals, theses, arXiv only papers
+    'doctype': ['abstract', 'catalog', 'proposal', 'phdthesis', 'mastersthesis', 'eprint'],
+    # European Planetary Science Congress, Bulletin of the AAS, AAS meetings, arXiv e-prints
+    'bibstem': ['EPSC', 'BAAS', 'AAS', 'arXiv'],
+    'pub': ['Space Astrophysics Landscape', 'Thirty years of Beta Pic', 'EAS2024'],
+}
+ADS_EXCLUSIONS_PAPERS = {field: list(values) for field, values in DEFAULT_ADS_EXCLUSIONS_PAPERS.items()}
+
+# words of the formatted lines of the excluded records, create_latex_files still rejects these lines while the
+# records are excluded (the excluded 'pub' values are rejected as they are)
+EXCLUSIONS_REJECT_KW = {
+    'doctype': {
+        'abstract': 'Abstracts',
+        'catalog': 'VizieR',
+        'proposal': 'JWST Proposal',
+        'phdthesis': 'Thesis',
+        'mastersthesis': 'Thesis',
+        'eprint': 'arXiv e-prints'
+    },
+    'bibstem': {
+        'EPSC': 'European Planetary Science Congress',
+        'BAAS': 'Bulletin of the American Astronomical Society',
+        'AAS': 'American Astronomical Society Meeting',
+        'arXiv': 'arXiv e-prints'
+    },
+}
+
+# corpus change time of the outputs made by ADS from the papers (server metrics, exports), see create_latex_files
+CORPUS_OUTPUTS_FILE = 'corpus_outputs.json'
+
+# section names and preamble of the latex file in each language
+LATEX_LANGUAGES = {
+    'fr': {
+        'ref_imp': 'PRINCIPAUX ARTICLES',
+        'nonref_imp': 'PRINCIPAUX ACTES DE CONFERENCES',
+        'ref_nonimp': 'AUTRES ARTICLES',
+        'nonref_nonimp': 'AUTRES ACTES DE CONFERENCES',
+        'white_paper': 'PAPIERS BLANCS (SELECTION)',
+        'thesis': 'THESES',
+        'ref': 'ARTICLES',
+        'nonref': 'ACTES DE CONFERENCES',
+        'other': 'AUTRES PUBLICATIONS',
+        'geom_string': ('\\documentclass[10pt, a4paper, french]{article}\n'
+                        '\\usepackage[total={17.2cm,25.cm}, left=1.9cm, top=2.5cm]{geometry}\n'),
+        'title_string': 'LISTE DE PUBLICATIONS',
+    },
+    'en': {
+        'ref_imp': 'MAJOR REFEREED PUBLICATIONS',
+        'nonref_imp': 'MAJOR CONFERENCE PROCEEDINGS',
+        'ref_nonimp': 'OTHER REFEREED PUBLICATIONS',
+        'nonref_nonimp': 'OTHER CONFERENCE PROCEEDINGS',
+        'white_paper': 'WHITE PAPERS (SELECTED)',
+        'thesis': 'THESIS',
+        'ref': 'REFEREED PUBLICATIONS',
+        'nonref': 'CONFERENCE PROCEEDINGS',
+        'other': 'OTHER PUBLICATIONS',
+        'geom_string': ('\\documentclass[10pt]{article}\n'
+                        '\\usepackage[total={6.5in,9in},left=1in,top=1in,headheight=110pt]{geometry} \n'),
+        'title_string': 'PUBLICATION LIST',
+    },
+}
+
+
+def check_ads_token(cache_days=1.):
+    """Check if the given token exist by running a minimal query (one id, no sorting).
+        A valid token is remembered (as a hash, never the token itself) for cache_days days
+        so that the following runs start without any request to ADS.
+
+    Parameters
+    ----------
+    cache_days: float, number of days a successful check is valid. 0 to always check
+    """
+
+    token_hash = hashlib.sha256(str(ads.config.token).encode()).hexdigest()
+    token_checks = load_json_cache('token_checks.json', default=dict())
+    if time.time() - token_checks.get(token_hash, 0) < cache_days * 86400:
+        return
 
     try:
-        papers = list(ads.SearchQuery(q="exoplanets", sort="citation_count", rows=2))
+        response = ads_session().get(ADS_SEARCH_URL, params={'q': 'year:2000', 'rows': 1, 'fl': 'id'})
+        token_ok = response.status_code == 200
     except:
+        token_ok = False
+    if not token_ok:
         raise Exception(
             "you first need to create a ADS token, following this proceedure (it takes 10 seconds): https://ads.harvard.edu/handouts/ADS_API_handout.pdf"
         )
 
+    token_checks[token_hash] = time.time()
+    save_json_cache('token_checks.json', token_checks)
+
+
+def publication_metrics(papers, metrics_source='local', refereed_papers=None):
+    """Bibliometric indices of a list of papers. The ADS metrics service only accepts ADS_METRICS_MAX_BIBCODES
+        bibcodes: above, the metrics are computed locally (from the citation counts of the papers).
+
+    Parameters
+    ----------
+    papers: list of ads publication objects
+    metrics_source: 'local' or 'server', if 'server' the metrics are computed by the ADS metrics service
+    refereed_papers: list of ads publication objects or None, the refereed ones among papers, for the local
+                refereed_* metrics (the ADS metrics service knows which papers are refereed)
+
+    Returns
+    ------------
+    dict of metrics (see bibliometrics.METRICS_KEYS)
+    """
+    if metrics_source == 'server' and len(papers) > ADS_METRICS_MAX_BIBCODES:
+        print("{0} papers, more than the {1} accepted by the ADS metrics service: metrics computed locally".format(
+            len(papers), ADS_METRICS_MAX_BIBCODES))
+        return researcher_metrics(papers, refereed_papers=refereed_papers)
+
+    print("Metrics of {0} papers computed {1}".format(
+        len(papers), 'by the ADS metrics service' if metrics_source == 'server' else 'locally'))
+    if metrics_source == 'server':
+        return server_metrics([paper.bibcode for paper in papers])
+    return researcher_metrics(papers, refereed_papers=refereed_papers)
+
+
+def publication_list_papers(author, years=None, rows=1000, fl=PAPER_FIELDS):
+    """Refereed and non refereed papers of a publication list: the years range, without the records excluded
+        from the lists (ADS_EXCLUSIONS_PAPERS). The metrics of the list and measure_h_factor use this scope.
+
+    Parameters
+    ----------
+    author: str, author name
+    years: tuple, list, or `None`, range of years to query or `None`
+    rows: int, maximum number of publications to extract by query
+    fl: list of string, fields returned by ADS, default PAPER_FIELDS
 
-def measure_h_factor(author, refereed=None, years=None, rows=1000):
-    """compute the researcher's h-index.
+    Returns
+    ------------
+    refereed_papers: list of ads publication objects
+    non_refereed_papers: list of ads publication objects
+    """
+    refereed_papers = query_papers(author,
+                                   refereed=True,
+                                   years=years,
+                                   rows=rows,
+                                   fl=fl,
+                                   exclusions=ADS_EXCLUSIONS_PAPERS)
+    non_refereed_papers = query_papers(author,
+                                       refereed=False,
+                                       years=years,
+                                       rows=rows,
+                                       fl=fl,
+                                       exclusions=ADS_EXCLUSIONS_PAPERS)
+    return refereed_papers, non_refereed_papers
+
+
+def measure_h_factor(author, refereed=None, years=None, rows=1000, metrics_source='local'):
+    """compute the researcher's h-index, on the papers of their publication list (see publication_list_papers).
 
     Parameters
     ----------
@@ -37,39 +206,90 @@ def measure_h_factor(author, refereed=None, years=None, rows=1000):
     years: tuple, list, or `None`, range of years to query or `None`,
                   default: `None`
     rows: int, maximum number of publications to extract
+    metrics_source: 'local' or 'server', if 'server' the h-index is computed by the ADS metrics service
+                and only the number of citations of each paper is downloaded
 
     Returns
     ------------
     h_factor : int, h factor of the researcher
     """
 
-    papers = query_papers(author, refereed=refereed, years=years, rows=rows)
+    fields = PAPER_FIELDS_CITATION_COUNT if metrics_source == 'server' else PAPER_FIELDS
+    if refereed is None:
+        refereed_papers, non_refereed_papers = publication_list_papers(author, years=years, rows=rows, fl=fields)
+        papers = refereed_papers + non_refereed_papers
+    else:
+        papers = query_papers(author,
+                              refereed=refereed,
+                              years=years,
+                              rows=rows,
+                              fl=fields,
+                              exclusions=ADS_EXCLUSIONS_PAPERS)
 
-    citations = []
-    for paper in papers:
-        if paper.citation is not None:
-            citations.append(len(paper.citation))
-    return sum(x >= i + 1 for i, x in enumerate(sorted(citations, reverse=True)))
+    return publication_metrics(papers, metrics_source=metrics_source)['h_index']
 
 
-def query_papers(author, refereed=None, years=None, rows=1000):
-    """query papers from NASA ADS
+def ads_exclusion_filter(exclusions):
+    """Translate structured exclusions into negated filter query clauses,
+        e.g. {'doctype': ['abstract', 'catalog']} -> '-doctype:("abstract" OR "catalog")'
+
+    Parameters
+    ----------
+    exclusions: dict, ADS field -> list of excluded values (see ADS_EXCLUSIONS_PAPERS)
+
+    Returns
+    ------------
+    filter_query: string
+    """
+    clauses = list()
+    for field, values in exclusions.items():
+        if len(values) > 0:
+            clauses.append('-{0}:({1})'.format(field, ' OR '.join(['"{0}"'.format(value) for value in values])))
+    return ' '.join(clauses)
+
+
+def ads_topic_query(keywords):
+    """Translate a list of keywords into an ADS query on the title and abstract ('abs:' searches
+        both, and the keywords of the paper). Single words match the words starting with them
+        (exoplanet -> exoplanets, exoplanetary), expressions are searched as phrases.
+
+    Parameters
+    ----------
+    keywords: list of string
+
+    Returns
+    ------------
+    query: string
+    """
+    terms = list()
+    for keyword in keywords:
+        if ' ' in keyword or '-' in keyword:
+            terms.append('"{0}"'.format(keyword))
+        else:
+            terms.append(keyword + '*')
+    return 'abs:({0})'.format(' OR '.join(terms))
+
+
+def ads_query_filters(refereed=None, years=None, exclusions=None, keywords=None):
+    """Build the query and filter query strings shared by all our ADS searches
 
     Parameters
     ----------
-    author: str, author name
     refereed: boolean or `None`, if `True`, only extract refereed
                      publications; if `False`, only extract not refereed
                      publications; if `None`, extract all; default: `None`
     years: tuple, list, or `None`, range of years to query or `None`,
                   default: `None`
-    rows: int, maximum number of publications to extract
+    exclusions: dict or `None`, records excluded by ADS, see ads_exclusion_filter,
+                  default: `None`
+    keywords: list of string or `None`, only the papers with one of these keywords in their title or
+                  abstract are returned, see ads_topic_query, default: `None`
 
     Returns
     ------------
-    list of ads publication objects
+    q: string, query
+    fq: string, filter query
     """
-    # set query payload
     if refereed is None:
         q = ''
     elif refereed:
@@ -79,25 +299,97 @@ def query_papers(author, refereed=None, years=None, rows=1000):
     fq = 'database:(physics OR astronomy)'
     if years is not None:
         fq += " year:{0}-{1}".format(years[0], years[1])
+    if exclusions:
+        fq += ' ' + ads_exclusion_filter(exclusions)
+    if keywords:
+        q = (q + ' ' + ads_topic_query(keywords)).strip()
+    return q, fq
+
+
+def query_papers(author, refereed=None, years=None, rows=1000, fl=PAPER_FIELDS, exclusions=None):
+    """query papers from NASA ADS
+
+    Parameters
+    ----------
+    author: str, author name
+    refereed: boolean or `None`, if `True`, only extract refereed
+                     publications; if `False`, only extract not refereed
+                     publications; if `None`, extract all; default: `None`
+    years: tuple, list, or `None`, range of years to query or `None`,
+                  default: `None`
+    rows: int, maximum number of publications to extract
+    fl: list of string, fields returned by ADS, default PAPER_FIELDS
+    exclusions: dict or `None`, records that ADS does not return (e.g. ADS_EXCLUSIONS_PAPERS),
+                  see ads_exclusion_filter, default: `None`
+
+    Returns
+    ------------
+    list of ads publication objects
+    """
+    # set query payload
+    q, fq = ads_query_filters(refereed=refereed, years=years, exclusions=exclusions)
+
+    with profile_stage('query_papers'):
+        if CORPUS_CACHE["enabled"]:
+            # local copy of the list, only the new records are asked to ADS (see corpus_cache.py)
+            papers = corpus_papers(author, q, fq, fl, rows=rows)
+        else:
+            # perform query
+            papers = list(scheduled(ads.SearchQuery(author=author, fq=fq, q=q, sort='pubdate', rows=rows, fl=fl)))
+
+    # each paper is counted once, whatever the number of parts of the list it goes through
+    record_papers(len(papers))
+    return papers
+
+
+def html_title(title):
+    """Title of a paper in html. ADS titles are already partly html (entities, <SUB> and <SUP> tags, see
+        clean_string): they are unescaped first, so that they are not escaped twice, and only the subscripts
+        and superscripts are kept as tags.
+
+    Parameters
+    ----------
+    title: string, title as given by ADS
+
+    Returns
+    ------------
+    str, escaped html
+    """
+    escaped_title = html.escape(html.unescape(title))
+    return re.sub(r'&lt;(/?)(sub|sup)&gt;',
+                  lambda match: '<' + match.group(1) + match.group(2).lower() + '>',
+                  escaped_title,
+                  flags=re.IGNORECASE)
+
 
-    # perform query
-    papers = ads.SearchQuery(author=author,
-                             fq=fq,
-                             q=q,
-                             sort='pubdate',
-                             rows=rows,
-                             fl=['title', 'author', 'year', 'volume', 'page', 'pub', 'identifier', 'citation', 'doi'])
-    return list(papers)
+def papers_changed_time(researcher_name, years, fields):
+    """Last time the papers of create_latex_files changed in the local corpus (see corpus_cache.py)
 
+    Parameters
+    ----------
+    researcher_name: string
+    years: tuple or `None`
+    fields: list of string, fields of the queries
+
+    Returns
+    ------------
+    changed: float (time) or `None` if the corpus cache is disabled (the papers always come from ADS)
+    """
+    if not CORPUS_CACHE["enabled"]:
+        return None
+    return max(
+        corpus_changed_time(researcher_name, *ads_query_filters(refereed=refereed, years=years,
+                                                                exclusions=ADS_EXCLUSIONS_PAPERS), fields)
+        for refereed in [True, False])
 
 
 def create_paper_html_line(paper, researcher_name=None, Number_authors_displayed=3):
-    """From a paper, create a string line in html format.
+    """From a paper, create a string line in html format, like create_paper_latex_line.
 
     Parameters
     ----------
     paper: ads publication object
-    researcher_name: string or `None`, name that will be highlighted in latex,
+    researcher_name: string or `None`, name that will be highlighted in html,
                     default: `None`
     Number_authors_displayed: the number of authors displayed in the citation line
                                     also used to defined what is an "major paper" if
@@ -105,13 +397,10 @@ def create_paper_html_line(paper, researcher_name=None, Number_authors_displayed
 
     Returns
     ------------
-    str, latex encoded string for paper
+    str, html string for paper (list item)
     """
-    out = ''
     # put paper title in italic font
-
-    title = paper.title[0]
-    title.replace("★", "*")
+    title = '<i>' + html_title(paper.title[0]) + '</i>'
 
     # build author list
 
@@ -125,37 +414,28 @@ def create_paper_html_line(paper, researcher_name=None, Number_authors_displayed
 
     for i in range(len(paper.author)):
         # `name` is the i-th author on this paper
-        author = utf8tolatex(paper.author[i])
+        author = paper.author[i]
         nom = author.split(',')[0]
         if len(author.split(',')) > 1:
             prenoms = author.split(',')[1]
         else:
             prenoms = '?'
         prenoms = prenoms.replace("-", " -")
-        prenoms = prenoms.split(' ')
-        while True:
-            try:
-                prenoms.remove('')
-            except ValueError:
-                break
+        prenoms = [prenom for prenom in prenoms.split(' ') if prenom != '']
 
         for prenomj, prenom in enumerate(prenoms):
             if prenom[0] == '-':
                 prenoms[prenomj] = prenom[0:2] + '.'
-            elif prenom[0] == '{':
-                end = prenom.find('}')
-                prenoms[prenomj] = prenom[0:end + 1] + '.'
             else:
                 prenoms[prenomj] = prenom[0] + '.'
 
-        author = nom + ", " + " ".join(prenoms)
-        #print(author)
-
-        if i < 1:
-            authors.append(author)
+        author = html.escape(nom + ", " + " ".join(prenoms))
 
-            #if len(prenoms.split(' ')) > 2:
-            #    print(author.split(' ')[1])
+        if i < Number_authors_displayed:
+            if researcher_name is not None and html.escape(researcher_name.split(', ')[0]) in author:
+                authors.append('<b>' + author + '</b>')
+            else:
+                authors.append(author)
         else:
             etal = True
             break
@@ -167,29 +447,42 @@ def create_paper_html_line(paper, researcher_name=None, Number_authors_displayed
         if comma_or_and_between_authors == 'coma':
             authors = ' ; '.join(authors)
         else:
-            authors = ' and '.join(authors)
+            authors = ' &amp; '.join(authors)
 
     year = paper.year
 
     # create string with journal volume and page number
-    pub = str(paper.pub)
+    pub = html.escape(html.unescape(str(paper.pub)))
     if paper.volume is not None:
-        pub += ', ' + str(paper.volume)
+        pub += ', ' + html.escape(str(paper.volume))
     if paper.page is not None:
-        pub += ', ' + str(paper.page[0])
+        pub += ', ' + html.escape(str(paper.page[0]))
 
     doi_link = ''
     if paper.doi is not None:
+        doi_link = '<a href="https://doi.org/' + html.escape(paper.doi[0]) + '">DOI</a>'
 
-        doi_link = ('<a href="https://doi.org/' + paper.doi[0] + '"> <u class="dotted">DOI</u> </a>')
+    arxiv_link = ''
+    for ident in paper.identifier or []:
+        if 'arXiv:' in ident:
+            arxiv_link = '<a href="https://arxiv.org/abs/' + html.escape(ident[6:]) + '">arXiv</a>'
 
-    pdf_link = ('<a href="my_proceedings/NAMEPDF.pdf"> <u class="dotted">PDF</u> </a>')
+    # assemble output string as html list item
+    out = '<li>' + authors + ' (<b>' + year + '</b>), ' + title + ', ' + pub
+    if doi_link != '':
+        out += ', ' + doi_link
+    if arxiv_link != '':
+        out += ', ' + arxiv_link
 
-    # assemble output string as latex bullet list item
-    out = ('<li style="font-size:0.8em">' + authors + ' ('+ year + '), ' + title + ', ' + pub)
-    out += ', ' + doi_link + ', ' + pdf_link + '</li>'
+    # add number of citations, if available
+    number_citations = paper_citation_count(paper)
+    if number_citations > 1:
+        out += ', ' + str(number_citations) + ' citations'
+    elif number_citations == 1:
+        out += ', ' + str(number_citations) + ' citation'
+
+    return out + '</li>'
 
-    return out
 
 def create_paper_latex_line(paper, researcher_name=None, Number_authors_displayed=3):
     """From a paper, create a string line in latex format.
@@ -254,8 +547,7 @@ def create_paper_latex_line(paper, researcher_name=None, Number_authors_displaye
         #print(author)
 
         if i < Number_authors_displayed:
-            researcher_name_short = researcher_name.split(', ')[0]
-            if researcher_name_short in author:
+            if researcher_name is not None and researcher_name.split(', ')[0] in author:
                 authors.append('{\\bf ' + author + '}')
             else:
                 authors.append(author)
@@ -303,10 +595,11 @@ def create_paper_latex_line(paper, researcher_name=None, Number_authors_displaye
         out += ', ' + arxiv_link
 
     # add number of citations, if available
-    if paper.citation is not None and len(paper.citation) > 1:
-        out += ', ' + str(len(paper.citation)) + ' citations'
-    elif paper.citation is not None and len(paper.citation) == 1:
-        out += ', ' + str(len(paper.citation)) + ' citation'
+    number_citations = paper_citation_count(paper)
+    if number_citations > 1:
+        out += ', ' + str(number_citations) + ' citations'
+    elif number_citations == 1:
+        out += ', ' + str(number_citations) + ' citation'
 
     return out
 
@@ -400,6 +693,64 @@ def clean_string(latex_string):
     return latex_string
 
 
+def paper_line(paper, researcher_name=None, Number_authors_displayed=3, line_format='latex', reject_kw=None,
+               select_kw=None):
+    """Line of a paper in the publication list, in latex or html, or '' if it is rejected (see reject_cit and select_cit)
+
+    Parameters
+    ----------
+    paper: ads publication object
+    researcher_name: string or `None`, name that will be highlighted
+    Number_authors_displayed: int, number of author printed by paper
+    line_format: string, 'latex' (create_paper_latex_line) or 'html' (create_paper_html_line)
+    reject_kw, select_kw: list of string or None, see reject_cit and select_cit
+
+    Returns
+    ------------
+    line: string
+    """
+    if line_format == 'html':
+        return select_cit(reject_cit(create_paper_html_line(paper,
+                                                            researcher_name,
+                                                            Number_authors_displayed=Number_authors_displayed),
+                                     reject_kw=reject_kw),
+                          select_kw=select_kw)
+
+    return clean_string(
+        select_cit(reject_cit(create_paper_latex_line(paper,
+                                                      researcher_name,
+                                                      Number_authors_displayed=Number_authors_displayed),
+                              reject_kw=reject_kw),
+                   select_kw=select_kw))
+
+
+def latex_line_to_html(latex_line):
+    """html version of a latex line added manually in the yaml file: the latex is converted to text
+        and the \\href are converted to html links
+
+    Parameters
+    ----------
+    latex_line: string, one paper line in the latex (starting with \\item)
+
+    Returns
+    ------------
+    str, html string for paper (list item)
+    """
+    from pylatexenc.latex2text import LatexNodes2Text
+
+    latex_line = re.sub(r'^\s*\\item(\[[^\]]*\])?', '', latex_line)
+    out = ''
+    # the text between the links is converted, the links are converted separately
+    for i, part in enumerate(re.split(r'\\href\{([^}]*)\}\{([^}]*)\}', latex_line)):
+        if i % 3 == 0:
+            out += html.escape(LatexNodes2Text().latex_to_text(part))
+        elif i % 3 == 1:
+            out += '<a href="' + html.escape(part) + '">'
+        else:
+            out += html.escape(LatexNodes2Text().latex_to_text(part)) + '</a>'
+    return '<li>' + out.strip() + '</li>'
+
+
 def remove_accents(data):
     return ''.join(x for x in unicodedata.normalize('NFKD', data) if x in string.ascii_letters).lower()
 
@@ -440,24 +791,84 @@ def is_name_in_first_authors(researcher_name, author_list, max_author_position=N
     return researcher_is_in_list
 
 
-def create_latex_subpart(researcher_name,
-                         years,
-                         Name_part='MY PAPERS',
-                         Number_authors_displayed=3,
-                         refereed=None,
-                         major=None,
-                         reject_kw=None,
-                         select_kw=None,
-                         bullet='itemize',
-                         add_publi_manually=list()):
-    """Create a Latex paragraph with a paper list based on different options
+def latex_subpart_header(Name_part='MY PAPERS', bullet='itemize'):
+    """Beginning of a latex subpart: title and beginning of the list
+    """
+    return ('\\vspace{-0.9cm}\n'
+            '\\textcolor{RoyalBlue}{\\section*{\large ' + Name_part + '}\n'
+            '\\vspace{-0.3cm}\hrule}\n'
+            '\\vspace{0.4cm}\n\n'
+            '\\begin{' + bullet + '} \itemsep -1pt\n\n')
+
+
+def write_latex_subpart(outf, latex_lines, Name_part='MY PAPERS', bullet='itemize'):
+    """Write a latex subpart in an open file, line by line as they are produced, so nothing
+        is accumulated in memory. The title is written with the first line: if there is no line, nothing is written.
 
     Parameters
     ----------
-    researcher_name : string, name of the reserachers for which this list is created
-    years: tupple, range of years in the query
+    outf: open file (or any object with a write method)
+    latex_lines: iterable of string, lines of the list (e.g. latex_subpart_entries)
     Name_part: string, optional, default 'MY PAPERS'
                 name of the latex subpart
+    bullet: string
+        latex list option 'enumerate' or 'itemize'
+
+    Returns
+    ------------
+    there_at_least_one_cit: bool, True if the subpart was written
+    """
+    return write_latex_subpart_languages({None: outf}, latex_lines, {None: Name_part}, bullet=bullet)
+
+
+def write_latex_subpart_languages(outfs, latex_lines, Name_parts, bullet='itemize'):
+    """Write the same latex subpart in several open files (one per language), line by line.
+        Only the title of the subpart differs between the files, the lines are formatted once.
+
+    Parameters
+    ----------
+    outfs: dict, language -> open file
+    latex_lines: iterable of string, lines of the list (e.g. latex_subpart_entries)
+    Name_parts: dict, language -> name of the latex subpart
+    bullet: string
+        latex list option 'enumerate' or 'itemize'
+
+    Returns
+    ------------
+    there_at_least_one_cit: bool, True if the subpart was written
+    """
+    there_at_least_one_cit = False
+    with profile_stage('create_latex_subpart'):
+        for latex_line in latex_lines:
+            for lang, outf in outfs.items():
+                if not there_at_least_one_cit:
+                    outf.write(latex_subpart_header(Name_part=Name_parts[lang], bullet=bullet))
+                outf.write(latex_line + '\n\n')
+            there_at_least_one_cit = True
+
+        if there_at_least_one_cit:
+            for outf in outfs.values():
+                outf.write('\\end{' + bullet + '}\n\n')
+    return there_at_least_one_cit
+
+
+def latex_subpart_entries(researcher_name,
+                          years,
+                          Number_authors_displayed=3,
+                          refereed=None,
+                          major=None,
+                          reject_kw=None,
+                          select_kw=None,
+                          add_publi_manually=list(),
+                          papers=None,
+                          line_format='latex'):
+    """Generate the latex lines (one per paper) of a subpart based on different options.
+        ADS is queried when the generator starts and lines are produced as papers are formatted.
+
+    Parameters
+    ----------
+    researcher_name : string, name of the reserachers for which this list is created
+    years: tupple, range of years in the query
     Number_authors_displayed: int, optinal, default = 3
                 number of author printed by paper. This is also the criteria used to distinguished if a paper is 'major' or 'minor'
     refereed: 'True', 'False' or 'None'
@@ -472,58 +883,77 @@ def create_latex_subpart(researcher_name,
             a list of keywords that can be used to reject some papers. Example reject_kw=['arXiv e-prints']
     select_kw: list of string or None
             a list of keywords that can be used to select only some papers. Example select_kw=['Thesis']
-    bullet: string
-        latex list option 'enumerate' or 'itemize'
     add_publi_manually: list
         add publication to this list no matter what. This can be for example a publication submitted but not yet on ADS. the format must be a list
         where each elements is a list of 2 element. The first one is 'last' (paper will be injected at the latest of the list) or 'year', paper will be injected at a specific year
-        and the second oen is the latex string of the paper. See yaml file for help
+        and the second oen is the latex string of the paper. Elements can also be dicts describing the publication
+        (authors, title, pub, year...), see parse_manual_publications. See yaml file for help
+    papers: list of ads publication objects or None
+        papers already queried (with the same refereed and years options). If None, ADS is queried
+    line_format: string, 'latex' or 'html', see paper_line
 
-    Returns
+    Yields
     ------------
-    latex_paragraph: string, paragraph in the latex 
+    latex_line: string, one paper line in the latex
     """
 
-    latex_subpart = ('\\vspace{-0.9cm}\n'
-                     '\\textcolor{RoyalBlue}{\\section*{\large ' + Name_part + '}\n'
-                     '\\vspace{-0.3cm}\hrule}\n'
-                     '\\vspace{0.4cm}\n\n'
-                     '\\begin{' + bullet + '} \itemsep -1pt\n\n')
-
     # pull references from ads
-    papers = query_papers(researcher_name, refereed=refereed, years=years)
-    there_at_least_one_cit = False
-
-    publi_manu_years = list()
-    for publi_manu in add_publi_manually:
-        if publi_manu == []:
-            continue
-        if publi_manu[0] == 'last':
-            there_at_least_one_cit = True
-            latex_subpart += publi_manu[1] + '\n\n'
-        else:
-            try:
-                year = int(publi_manu[0])
-            except:
-                print(publi_manu)
-                raise Exception(("when adding a paper, add a 2 elements list: first one is the position",
-                                 "where you want to insert it (year of 'last'), second one is the latex string line "))
-            there_at_least_one_cit = True
-            bool_is_injected = True
-            publi_manu_years.append([year, publi_manu[1], bool_is_injected])
-
-    for paper in list(papers):
+    if papers is None:
+        papers = query_papers(researcher_name, refereed=refereed, years=years)
+
+    manual_publications = parse_manual_publications(add_publi_manually,
+                                                    researcher_name=researcher_name,
+                                                    Number_authors_displayed=Number_authors_displayed,
+                                                    line_format=line_format)
+
+    for position, latex_line in manual_publications:
+        if position == 'last':
+            yield latex_line
+
+    # papers from ADS are sorted by date. A paper added manually at a given year is placed after
+    # the papers of this year (key (-year, 1) after (-year, 0)), both streams are merged in one pass
+    manual_years = sorted([((-position, 1), latex_line) for position, latex_line in manual_publications
+                           if position != 'last'],
+                          key=lambda entry: entry[0])
+
+    ads_entries = selected_paper_entries(papers,
+                                         researcher_name,
+                                         Number_authors_displayed=Number_authors_displayed,
+                                         major=major,
+                                         reject_kw=reject_kw,
+                                         select_kw=select_kw,
+                                         line_format=line_format)
+
+    for _, latex_line in heapq.merge(ads_entries, manual_years, key=lambda entry: entry[0]):
+        yield latex_line
+
+
+def selected_paper_entries(papers,
+                           researcher_name,
+                           Number_authors_displayed=3,
+                           major=None,
+                           reject_kw=None,
+                           select_kw=None,
+                           line_format='latex'):
+    """Generate the latex lines of the selected papers with their sorting key, see latex_subpart_entries
+
+    Yields
+    ------------
+    sort_key: tuple (-year, 0)
+    latex_line: string, one paper line in the latex
+    """
 
+    for paper in papers:
         this_is_major_paper = is_name_in_first_authors(researcher_name,
                                                        paper.author,
                                                        max_author_position=Number_authors_displayed)
 
-        ref_propre = clean_string(
-            select_cit(reject_cit(create_paper_latex_line(paper,
-                                                          researcher_name,
-                                                          Number_authors_displayed=Number_authors_displayed),
-                                  reject_kw=reject_kw),
-                       select_kw=select_kw))
+        ref_propre = paper_line(paper,
+                                researcher_name,
+                                Number_authors_displayed=Number_authors_displayed,
+                                line_format=line_format,
+                                reject_kw=reject_kw,
+                                select_kw=select_kw)
 
         if major is None:
             # in this case, all refs are selected
@@ -541,23 +971,144 @@ def create_latex_subpart(researcher_name,
             ref = ""
 
         if len(ref) > 0:
-            there_at_least_one_cit = True
+            print(paper.author[0], paper.year)
+            yield (-int(paper.year), 0), ref
 
-            # Mannually inject at the righ year
-            for publi_manu_year_here in publi_manu_years:
-                if int(paper.year) < publi_manu_year_here[0] and publi_manu_year_here[2]:
-                    latex_subpart += publi_manu_year_here[1] + '\n\n'
-                    publi_manu_year_here[2] = False
 
-            print(paper.author[0], paper.year)
-            latex_subpart = latex_subpart + ref + '\n\n'
+def manual_publication_paper(entry):
+    """Create an ads publication object from a publication described in the yaml file, so that
+        it is formatted like the papers from ADS
+
+    Parameters
+    ----------
+    entry: dict, with keys 'authors' (list), 'title', 'pub', 'year' and optionally 'volume', 'page', 'doi', 'arxiv'
+
+    Returns
+    ------------
+    ads publication object
+    """
+    identifier = list()
+    if entry.get('arxiv') is not None:
+        identifier.append('arXiv:' + str(entry['arxiv']))
+
+    dico_publi = {
+        'author': list(entry['authors']),
+        'title': [entry['title']],
+        'pub': entry['pub'],
+        'year': str(entry['year']),
+        'volume': None if entry.get('volume') is None else str(entry['volume']),
+        'page': None if entry.get('page') is None else [str(entry['page'])],
+        'doi': None if entry.get('doi') is None else [str(entry['doi'])],
+        'identifier': identifier,
+        'citation': None,
+        'bibcode': None,
+    }
+    return ads.search.Article(**dico_publi)
+
+
+def parse_manual_publications(add_publi_manually, researcher_name=None, Number_authors_displayed=3, line_format='latex'):
+    """Read the publications added manually in the yaml file. An entry is either
+        - a 2 elements list: position ('last' or a year) and the latex string line
+        - a dict describing the publication (authors, title, pub, year, doi, arxiv...), formatted
+            like the ADS papers. Its position is the key 'position' ('last' or a year), by default its year.
+
+    Parameters
+    ----------
+    add_publi_manually: list, see create_latex_subpart
+    researcher_name: string or `None`, name that will be highlighted in latex
+    Number_authors_displayed: int, number of author printed by paper
+    line_format: string, 'latex' or 'html' (the latex string lines are then converted, see latex_line_to_html)
+
+    Returns
+    ------------
+    list of (position, latex string line), position is 'last' or an int year
+    """
+    manual_publications = list()
+    for publi_manu in add_publi_manually:
+        if publi_manu == []:
+            continue
+
+        if isinstance(publi_manu, dict):
+            position = publi_manu.get('position', publi_manu['year'])
+            latex_line = paper_line(manual_publication_paper(publi_manu),
+                                    researcher_name,
+                                    Number_authors_displayed=Number_authors_displayed,
+                                    line_format=line_format)
+        else:
+            position, latex_line = publi_manu[0], publi_manu[1]
+            if line_format == 'html':
+                latex_line = latex_line_to_html(latex_line)
+
+        if position != 'last':
+            try:
+                position = int(position)
+            except:
+                print(publi_manu)
+                raise Exception(("when adding a paper, add a 2 elements list: first one is the position",
+                                 "where you want to insert it (year of 'last'), second one is the latex string line "))
+        manual_publications.append((position, latex_line))
 
-    if not there_at_least_one_cit:
-        return ''
+    return manual_publications
 
-    latex_subpart = latex_subpart + '\\end{' + bullet + '}\n\n'
-    # print(latex_subpart)
-    return latex_subpart
+
+def create_latex_subpart(researcher_name,
+                         years,
+                         Name_part='MY PAPERS',
+                         Number_authors_displayed=3,
+                         refereed=None,
+                         major=None,
+                         reject_kw=None,
+                         select_kw=None,
+                         bullet='itemize',
+                         add_publi_manually=list()):
+    """Create a Latex paragraph with a paper list based on different options
+
+    Parameters
+    ----------
+    researcher_name : string, name of the reserachers for which this list is created
+    years: tupple, range of years in the query
+    Name_part: string, optional, default 'MY PAPERS'
+                name of the latex subpart
+    Number_authors_displayed: int, optinal, default = 3
+                number of author printed by paper. This is also the criteria used to distinguished if a paper is 'major' or 'minor'
+    refereed: 'True', 'False' or 'None'
+            If True, only refereed papers are listed in this latex subpart, 
+            If False, only non refereed papers are listed in this latex subpart, 
+            if None, all papers are listed in this latex subpart, 
+    major: 
+            If True, only major papers strings are listed in this latex subpart (if researcher_name position in the author list <= Number_authors_displayed), 
+            If False, only minor papers strings are listed in this latex subpart (if researcher_name position in the author list > Number_authors_displayed), 
+            if None, all paper strings are returned
+    reject_kw: list of string or None
+            a list of keywords that can be used to reject some papers. Example reject_kw=['arXiv e-prints']
+    select_kw: list of string or None
+            a list of keywords that can be used to select only some papers. Example select_kw=['Thesis']
+    bullet: string
+        latex list option 'enumerate' or 'itemize'
+    add_publi_manually: list
+        add publication to this list no matter what. This can be for example a publication submitted but not yet on ADS. the format must be a list
+        where each elements is a list of 2 element. The first one is 'last' (paper will be injected at the latest of the list) or 'year', paper will be injected at a specific year
+        and the second oen is the latex string of the paper. Elements can also be dicts describing the publication
+        (authors, title, pub, year...), see parse_manual_publications. See yaml file for help
+
+    Returns
+    ------------
+    latex_paragraph: string, paragraph in the latex 
+    """
+
+    latex_subpart = io.StringIO()
+    write_latex_subpart(latex_subpart,
+                        latex_subpart_entries(researcher_name,
+                                              years,
+                                              Number_authors_displayed=Number_authors_displayed,
+                                              refereed=refereed,
+                                              major=major,
+                                              reject_kw=reject_kw,
+                                              select_kw=select_kw,
+                                              add_publi_manually=add_publi_manually),
+                        Name_part=Name_part,
+                        bullet=bullet)
+    return latex_subpart.getvalue()
 
 
 def create_latex_subpart_manually(Name_part='MY PAPERS', bullet='itemize', list_ref=list()):
@@ -572,40 +1123,191 @@ def create_latex_subpart_manually(Name_part='MY PAPERS', bullet='itemize', list_
     list_ref: list
         add publication to this list no matter what. This can be for example a publication submitted but not yet on ADS. the format must be a list
         where each elements is a list of 2 element. The first one is 'last' (paper will be injected at the latest of the list) or 'year', paper will be injected at a specific year
-        and the second oen is the latex string of the paper. See yaml file for help
+        and the second oen is the latex string of the paper. Elements can also be dicts describing the publication
+        (authors, title, pub, year...), see parse_manual_publications. See yaml file for help
 
     Returns
     ------------
     latex_paragraph: string, paragraph in the latex 
     """
 
-    latex_subpart = ('\\vspace{-0.9cm}\n'
-                     '\\textcolor{RoyalBlue}{\\section*{\large ' + Name_part + '}\n'
-                     '\\vspace{-0.3cm}\hrule}\n'
-                     '\\vspace{0.4cm}\n\n'
-                     '\\begin{' + bullet + '} \itemsep -1pt\n\n')
+    latex_subpart = io.StringIO()
+    write_latex_subpart(latex_subpart, (ref[1] for ref in parse_manual_publications(list_ref)),
+                        Name_part=Name_part,
+                        bullet=bullet)
+    return latex_subpart.getvalue()
+
+
+def publication_list_parts(researcher_name,
+                           years,
+                           refereed_papers,
+                           non_refereed_papers,
+                           add_pub_manually,
+                           Number_authors_displayed=3,
+                           phd_sec=False,
+                           reject_kw=None,
+                           line_format='latex'):
+    """Parts of the publication list (see create_latex_files), from papers already queried. The lines of each
+        part are generated when the part is written.
+
+    Parameters
+    ----------
+    refereed_papers, non_refereed_papers: list of ads publication objects
+    line_format: string, 'latex' or 'html', see paper_line
+    Other parameters: see create_latex_files and latex_subpart_entries
 
+    Yields
+    ------------
+    part: string, key of the part in LATEX_LANGUAGES (e.g. 'ref_imp')
+    bullet: string, 'enumerate' or 'itemize'
+    lines: generator of string, lines of the part
+    """
+    for part, refereed, major, papers in (('ref_imp', True, True, refereed_papers),
+                                          ('ref_nonimp', True, False, refereed_papers),
+                                          ('nonref_imp', False, True, non_refereed_papers),
+                                          ('nonref_nonimp', False, False, non_refereed_papers)):
+        yield part, 'enumerate', latex_subpart_entries(
+            researcher_name,
+            Number_authors_displayed=Number_authors_displayed,
+            refereed=refereed,
+            years=years,
+            major=major,
+            reject_kw=reject_kw,
+            add_publi_manually=add_pub_manually["refereed" if refereed else "proceeding"]['major' if major else 'minor'],
+            papers=papers,
+            line_format=line_format)
+
+    if len(add_pub_manually["white_paper"]) > 0:
+        yield 'white_paper', 'itemize', (ref[1] for ref in parse_manual_publications(
+            add_pub_manually["white_paper"], researcher_name=researcher_name, line_format=line_format))
+
+    if phd_sec:
+        yield 'thesis', 'itemize', (ref[1] for ref in parse_manual_publications(
+            add_pub_manually["thesis"], researcher_name=researcher_name, line_format=line_format))
+
+
+def html_page_header(lang, metrics_string=''):
+    """Beginning of the html page of a publication list: standalone page, with a small style sheet
+
+    Parameters
+    ----------
+    lang: string, language of the page (key of LATEX_LANGUAGES)
+    metrics_string: string, html line printed under the title (e.g. bibliometric indices)
+    """
+    return ('<!DOCTYPE html>\n'
+            '<html lang="' + lang + '">\n'
+            '<head>\n'
+            '<meta charset="utf-8">\n'
+            '<title>' + LATEX_LANGUAGES[lang]['title_string'].capitalize() + '</title>\n'
+            '<style>\n'
+            'body {font-family: sans-serif; max-width: 60em; margin: auto; line-height: 1.4;}\n'
+            'h2 {color: RoyalBlue; font-size: 1.1em; border-bottom: 1px solid RoyalBlue;}\n'
+            'li {font-size: 0.9em; margin-bottom: 0.3em;}\n'
+            '</style>\n'
+            '</head>\n'
+            '<body>\n'
+            '<h1>' + LATEX_LANGUAGES[lang]['title_string'] + '</h1>\n' + metrics_string)
+
+
+def write_html_subpart_languages(outfs, html_lines, Name_parts, bullet='itemize'):
+    """Write the same html section in several open files (one per language), line by line,
+        see write_latex_subpart_languages. The title is written with the first line: if there is no line,
+        nothing is written.
+
+    Parameters
+    ----------
+    outfs: dict, language -> open file
+    html_lines: iterable of string, lines of the list (e.g. latex_subpart_entries with line_format='html')
+    Name_parts: dict, language -> name of the section
+    bullet: string
+        'enumerate' (numbered list) or 'itemize'
+
+    Returns
+    ------------
+    there_at_least_one_cit: bool, True if the section was written
+    """
+    tag = 'ol' if bullet == 'enumerate' else 'ul'
     there_at_least_one_cit = False
+    with profile_stage('create_html_subpart'):
+        for html_line in html_lines:
+            for lang, outf in outfs.items():
+                if not there_at_least_one_cit:
+                    outf.write('<h2>' + html.escape(Name_parts[lang]) + '</h2>\n<' + tag + '>\n')
+                outf.write(html_line + '\n')
+            there_at_least_one_cit = True
+
+        if there_at_least_one_cit:
+            for outf in outfs.values():
+                outf.write('</' + tag + '>\n')
+    return there_at_least_one_cit
+
+
+def replace_if_changed(new_file, name_file):
+    """Move a file just written (new_file) to name_file, unless name_file already has the same content.
+        The file is then left untouched (same modification time, nothing to upload again).
+
+    Parameters
+    ----------
+    new_file: string, path of the file just written, removed in all cases
+    name_file: string, path of the final file
 
-    for ref in list(list_ref):
-        there_at_least_one_cit = True
-        latex_subpart += ref[1] + '\n\n'
+    Returns
+    ------------
+    changed: bool, True if name_file was written
+    """
+    if os.path.exists(name_file) and filecmp.cmp(new_file, name_file, shallow=False):
+        os.remove(new_file)
+        return False
+    os.replace(new_file, name_file)
+    return True
 
-    if not there_at_least_one_cit:
-        return ''
 
-    latex_subpart += '\\end{' + bullet + '}\n\n'
-    # print(latex_subpart)
-    return latex_subpart
+def write_html_files(name_files, parts, metrics_string=None):
+    """Write the html pages of a publication list (one per language), streaming: each line is written as
+        it is formatted. A page whose content did not change is not rewritten (see replace_if_changed).
 
+    Parameters
+    ----------
+    name_files: dict, language -> path of the html file
+    parts: iterable of (part, bullet, html lines), see publication_list_parts with line_format='html'
+    metrics_string: dict or `None`, language -> html line printed under the title
 
+    Returns
+    ------------
+    changed_files: list of string, paths of the pages written
+    """
+    outfs = {lang: open(name_file + '.tmp', 'w', encoding='utf-8') for lang, name_file in name_files.items()}
+    try:
+        for lang, outf in outfs.items():
+            outf.write(html_page_header(lang, metrics_string=(metrics_string or dict()).get(lang, '')))
+        for part, bullet, html_lines in parts:
+            write_html_subpart_languages(outfs,
+                                         html_lines,
+                                         Name_parts={lang: LATEX_LANGUAGES[lang][part]
+                                                     for lang in outfs},
+                                         bullet=bullet)
+        for outf in outfs.values():
+            outf.write('</body>\n</html>\n')
+    finally:
+        for outf in outfs.values():
+            outf.close()
+
+    return [name_file for lang, name_file in name_files.items() if replace_if_changed(name_file + '.tmp', name_file)]
+
+
+@profile_function('create_latex_files')
 def create_latex_files(researcher_name,
                        years,
                        french=False,
                        Number_authors_displayed=3,
                        phd_sec=False,
                        add_pub_manually=None,
-                       output_dir=''):
+                       output_dir='',
+                       show_metrics=False,
+                       metrics_source='local',
+                       languages=None,
+                       export_formats=None,
+                       write_html=False):
     """Create and save a full latex file. This part should be customized depending on how you want to organize your publication list.
     I'm an instrumentalist so SPIE proceedings are important but you can customized as you see fit.
     There are currently 6 parts:
@@ -621,158 +1323,366 @@ def create_latex_files(researcher_name,
     researcher_name : string, name of the reserachers for which this list is created
     years: tupple, range of years in the query
     french: Bool
-        If true, in french, else in english
+        If true, in french, else in english. Not used if languages is given
     Number_authors_displayed: int, optinal, default = 3
                 number of author printed by paper. This is also the criteria used to distinguished if a paper is 'major' or 'minor'
     phd_sec: bool, optional False
         Do you want a phd section (only if your phd is on ads :-) )
     add_publi_manually: dict()
         See yaml file for help
+    show_metrics: bool, optional False
+        If True, the bibliometric indices (h, g, i10, m) are printed under the title.
+        In all cases they are saved in a csv file next to the latex file. They are computed on the
+        papers returned by ADS, without the excluded records (see ADS_EXCLUSIONS_PAPERS).
+    metrics_source: 'local' or 'server', optional 'local'
+        If 'local', the metrics are computed from the citation lists of the papers.
+        If 'server', they are computed by the ADS metrics service in one request and only the
+        number of citations of each paper is downloaded (much smaller for long lists).
+    languages: list of string or None, optional None
+        languages of the latex files (keys of LATEX_LANGUAGES), e.g. ['fr', 'en']. All the files are
+        written from the same ADS queries and formatted lines, only the titles differ.
+        If None, one file in french or english depending on the french parameter.
+    export_formats: list of string or None, optional None
+        if given, the papers returned by ADS are also exported by the ADS export service in these formats
+        (e.g. ['bibtex', 'aastex']), in publication_list_<name>.bib, publication_list_<name>_aastex.tex...
+        With 'bibtex', a biblatex document publication_list_<name>_biblatex_<language>.tex is written too.
+        The publications added manually are not exported.
+    write_html: bool, optional False
+        if True, the same list is also saved as a standalone html page publication_list_<name>_<language>.html
+        (same papers, same parts), rewritten only if its content changed.
 
     Returns
     ------------
-    No return, latex file is directly savec
+    name_files: dict, language -> path of the latex file
+    metrics: dict, bibliometric indices of the researcher (see bibliometrics.researcher_metrics)
     """
 
-    if french:
-        Name_ref_imp = 'PRINCIPAUX ARTICLES'
-        Name_nonref_imp = 'PRINCIPAUX ACTES DE CONFERENCES'
-        Name_ref_nonimp = 'AUTRES ARTICLES'
-        Name_nonref_nonimp = 'AUTRES ACTES DE CONFERENCES'
-
-        Name_these = 'MANUSCRIT DE THESE'
-
-        lang = 'fr'
-        geom_string = ('\\documentclass[10pt, a4paper, french]{article}\n'
-                       '\\usepackage[total={17.2cm,25.cm}, left=1.9cm, top=2.5cm]{geometry}\n')
-        title_string = 'LISTE DE PUBLICATIONS'
-
-    else:
-        Name_ref_imp = 'MAJOR REFEREED PUBLICATIONS'
-        Name_nonref_imp = 'MAJOR CONFERENCE PROCEEDINGS'
-        Name_ref_nonimp = 'OTHER REFEREED PUBLICATIONS'
-        Name_nonref_nonimp = 'OTHER CONFERENCE PROCEEDINGS'
-
-        Name_these = 'PHD THESIS'
-
-        lang = 'en'
-        geom_string = ('\\documentclass[10pt]{article}\n'
-                       '\\usepackage[total={6.5in,9in},left=1in,top=1in,headheight=110pt]{geometry} \n')
-        title_string = 'PUBLICATION LIST'
-
-    # words leading to a rejections for papers and proc parts (proposal, abstracts, conference w/o proc)
-    reject_kw_papers = [
-        'Abstracts',
-        'European Planetary Science Congress',
-        'VizieR',
-        'JWST Proposal',
-        'Thesis',
-        'Space Astrophysics Landscape',
-        'Bulletin of the American Astronomical Society',
-        'American Astronomical Society Meeting',
-        'Thirty years of Beta Pic',
-        'arXiv e-prints',
-        'EAS2024'
-    ]
+    if languages is None:
+        languages = ['fr'] if french else ['en']
+    for lang in languages:
+        if lang not in LATEX_LANGUAGES:
+            raise Exception("Unknown language '{0}', available languages are {1}".format(
+                lang, list(LATEX_LANGUAGES.keys())))
+
+    # words leading to a rejections for papers and proc parts (proposal, abstracts, conference w/o proc),
+    # the ones of the records excluded by ADS (see EXCLUSIONS_REJECT_KW)
+    reject_kw_papers = list()
+    for field, values in ADS_EXCLUSIONS_PAPERS.items():
+        for value in values:
+            keyword = value if field == 'pub' else EXCLUSIONS_REJECT_KW.get(field, dict()).get(value)
+            if keyword is not None and keyword not in reject_kw_papers:
+                reject_kw_papers.append(keyword)
 
     researcher_name_short = researcher_name.split(', ')[0]
-    name_file = os.path.join(output_dir, 'publication_list_' + researcher_name_short + '_' + lang + '.tex')
-
-    latex_header = (
-        geom_string + '\\usepackage{etaremune}\n'
-        '\\usepackage[usenames, dvipsnames]{xcolor}\n'
-        '\\usepackage[colorlinks = true,urlcolor = BrickRed, breaklinks = true]{hyperref}\n'
-        '\\usepackage{fancyhdr}\n'
-        '\\renewcommand{\\headrulewidth}{0pt}\n'
-        '\\newcommand\\altand{\&}\n'
-        '\\usepackage[nobottomtitles]{titlesec}\n'
-        '\\pagestyle{fancy}\n'
-        '\\rhead{}\n'
-        '\\chead{}\n'
-        '\\cfoot{}\n'
-        '\\rfoot{}\n'
-        # '\\rfoot{' + rfoot + '}\n\n'
-        '\\begin{document}\n\n'
-        '\\begin{center}\\begin{Large}\n'
-        '\\textbf{' + title_string + '}\n'
-        '\\end{Large}\\end{center}\n\n'
-        '\\setcounter{section}{0}\n\n')
+    name_files = dict()
+    for lang in languages:
+        name_files[lang] = os.path.join(output_dir, 'publication_list_' + researcher_name_short + '_' + lang + '.tex')
+
+    # pull references from ads once, they are used by all the parts, all the languages and for the metrics.
+    # Most of the rejected records (abstracts, catalogs...) are excluded by ADS, reject_kw_papers still
+    # checks the formatted lines.
+    fields = PAPER_FIELDS_CITATION_COUNT if metrics_source == 'server' else PAPER_FIELDS
+    refereed_papers, non_refereed_papers = publication_list_papers(researcher_name, years=years, fl=fields)
+
+    # with the corpus cache (e.g. watch mode), the outputs computed by ADS from the papers (server metrics,
+    # exports) are only requested again when the corpus changed since they were made
+    output_prefix = os.path.join(output_dir, 'publication_list_' + researcher_name_short)
+    changed_time = papers_changed_time(researcher_name, years, fields)
+    outputs_state = load_json_cache(CORPUS_OUTPUTS_FILE, default=dict())
+    state = outputs_state.setdefault(os.path.abspath(output_prefix), dict())
+    state_changed = False
+
+    if metrics_source == 'server':
+        if changed_time is not None and state.get('server_metrics_changed') == changed_time:
+            metrics = state['server_metrics']
+        else:
+            metrics = publication_metrics(refereed_papers + non_refereed_papers,
+                                          metrics_source='server',
+                                          refereed_papers=refereed_papers)
+            state.update({'server_metrics': metrics, 'server_metrics_changed': changed_time})
+            state_changed = True
+    else:
+        metrics = publication_metrics(refereed_papers + non_refereed_papers, refereed_papers=refereed_papers)
+    write_metrics_csv(os.path.join(output_dir, 'publication_metrics_' + researcher_name_short + '.csv'),
+                      {researcher_name: metrics})
+
+    if export_formats:
+        from ads_export import EXPORT_FORMATS
+
+        export_key = [changed_time, list(export_formats), list(languages), Number_authors_displayed]
+        exported = (changed_time is not None and state.get('export') == export_key and all(
+            os.path.exists(output_prefix + EXPORT_FORMATS[export_format]) for export_format in export_formats))
+        if not exported:
+            # one request for all the papers, formatted by ADS
+            export_publication_list(output_prefix,
+                                    [paper.bibcode for paper in refereed_papers + non_refereed_papers],
+                                    export_formats,
+                                    refereed_bibcodes=[paper.bibcode for paper in refereed_papers],
+                                    languages=languages,
+                                    Number_authors_displayed=Number_authors_displayed)
+            state['export'] = export_key
+            state_changed = True
+
+    if state_changed and changed_time is not None:
+        save_json_cache(CORPUS_OUTPUTS_FILE, outputs_state)
+
+    def latex_header(lang):
+        if show_metrics:
+            metrics_string = ('\\begin{center}\n' + metrics_latex_line(metrics, french=(lang == 'fr')) +
+                              '\n\\end{center}\n\n')
+        else:
+            metrics_string = ''
+
+        return (
+            LATEX_LANGUAGES[lang]['geom_string'] + '\\usepackage{etaremune}\n'
+            '\\usepackage[usenames, dvipsnames]{xcolor}\n'
+            '\\usepackage[colorlinks = true,urlcolor = BrickRed, breaklinks = true]{hyperref}\n'
+            '\\usepackage{fancyhdr}\n'
+            '\\renewcommand{\\headrulewidth}{0pt}\n'
+            '\\newcommand\\altand{\&}\n'
+            '\\usepackage[nobottomtitles]{titlesec}\n'
+            '\\pagestyle{fancy}\n'
+            '\\rhead{}\n'
+            '\\chead{}\n'
+            '\\cfoot{}\n'
+            '\\rfoot{}\n'
+            # '\\rfoot{' + rfoot + '}\n\n'
+            '\\begin{document}\n\n'
+            '\\begin{center}\\begin{Large}\n'
+            '\\textbf{' + LATEX_LANGUAGES[lang]['title_string'] + '}\n'
+            '\\end{Large}\\end{center}\n\n' + metrics_string + '\\setcounter{section}{0}\n\n')
 
     latex_footer = ('\n\n'
                     '\n\n'
                     '\\end{document}\n')
 
-    # print(name_file)
-    with open(name_file, 'w') as outf:
-        outf.write(latex_header + '\n\n')
-        outf.write(
-            create_latex_subpart(researcher_name,
-                                 Name_part=Name_ref_imp,
-                                 Number_authors_displayed=Number_authors_displayed,
-                                 refereed=True,
-                                 years=years,
-                                 major=True,
-                                 reject_kw=reject_kw_papers,
-                                 bullet='enumerate',
-                                 add_publi_manually=add_pub_manually["refereed"]['major']))
-        outf.write(
-            create_latex_subpart(researcher_name,
-                                 Name_part=Name_ref_nonimp,
-                                 Number_authors_displayed=Number_authors_displayed,
-                                 refereed=True,
-                                 years=years,
-                                 major=False,
-                                 reject_kw=reject_kw_papers,
-                                 bullet='enumerate',
-                                 add_publi_manually=add_pub_manually["refereed"]['minor']))
-
-        outf.write(
-            create_latex_subpart(researcher_name,
-                                 Name_part=Name_nonref_imp,
-                                 Number_authors_displayed=Number_authors_displayed,
-                                 refereed=False,
-                                 years=years,
-                                 major=True,
-                                 reject_kw=reject_kw_papers,
-                                 bullet='enumerate',
-                                 add_publi_manually=add_pub_manually["proceeding"]['major']))
-        outf.write(
-            create_latex_subpart(researcher_name,
-                                 Name_part=Name_nonref_nonimp,
-                                 Number_authors_displayed=Number_authors_displayed,
-                                 refereed=False,
-                                 years=years,
-                                 major=False,
-                                 reject_kw=reject_kw_papers,
-                                 bullet='enumerate',
-                                 add_publi_manually=add_pub_manually["proceeding"]['minor']))
-
-        if len(add_pub_manually["white_paper"]) > 0:
-            if french:
-                Name_wp_imp = 'PAPIERS BLANCS (SELECTION)'
-            else:
-                Name_wp_imp = 'WHITE PAPERS (SELECTED)'
+    def section_names(part):
+        return {lang: LATEX_LANGUAGES[lang][part] for lang in languages}
 
-            outf.write(create_latex_subpart_manually(Name_part=Name_wp_imp, list_ref=add_pub_manually["white_paper"]))
+    # each part is written in all the files as the papers are formatted. The files are only replaced
+    # if their content changed, so that an unchanged list is not compiled again (see build_publication_list)
+    outfs = {lang: open(name_files[lang] + '.tmp', 'w') for lang in languages}
+    try:
+        for lang, outf in outfs.items():
+            outf.write(latex_header(lang) + '\n\n')
+            outf.flush()
+        for part, bullet, latex_lines in publication_list_parts(researcher_name,
+                                                                years,
+                                                                refereed_papers,
+                                                                non_refereed_papers,
+                                                                add_pub_manually,
+                                                                Number_authors_displayed=Number_authors_displayed,
+                                                                phd_sec=phd_sec,
+                                                                reject_kw=reject_kw_papers):
+            write_latex_subpart_languages(outfs, latex_lines, Name_parts=section_names(part), bullet=bullet)
+
+        for outf in outfs.values():
+            outf.write(latex_footer + '\n')
+    finally:
+        for outf in outfs.values():
+            outf.close()
+    for lang in languages:
+        replace_if_changed(name_files[lang] + '.tmp', name_files[lang])
+
+    if write_html:
+        # same papers and parts, formatted again in html
+        html_files = {
+            lang: os.path.join(output_dir, 'publication_list_' + researcher_name_short + '_' + lang + '.html')
+            for lang in languages
+        }
+        html_metrics = None
+        if show_metrics:
+            html_metrics = {
+                lang: '<p>' + html.escape(metrics_latex_line(metrics, french=(lang == 'fr'), separator=' | ')) +
+                '</p>\n'
+                for lang in languages
+            }
+        write_html_files(html_files,
+                         publication_list_parts(researcher_name,
+                                                years,
+                                                refereed_papers,
+                                                non_refereed_papers,
+                                                add_pub_manually,
+                                                Number_authors_displayed=Number_authors_displayed,
+                                                phd_sec=phd_sec,
+                                                reject_kw=reject_kw_papers,
+                                                line_format='html'),
+                         metrics_string=html_metrics)
+
+    return name_files, metrics
+
+
+def export_publication_list(output_prefix,
+                            bibcodes,
+                            export_formats,
+                            refereed_bibcodes=(),
+                            languages=('en', ),
+                            Number_authors_displayed=3):
+    """Export a list of papers with the ADS export service, in one request for all the papers
+        (see ads_export.py). For BibTeX, a biblatex document using the .bib file is also written for each language.
 
-        if phd_sec:
-            if french:
-                Name_wp_imp = 'THESES'
-            else:
-                Name_wp_imp = 'THESIS'
-            outf.write(create_latex_subpart_manually(Name_part=Name_wp_imp, list_ref=add_pub_manually["thesis"]))
+    Parameters
+    ----------
+    output_prefix: string, path of the files without extension
+    bibcodes: iterable of string
+    export_formats: list of string, formats of the ADS export service, e.g. ['bibtex', 'aastex']
+        (see ads_export.EXPORT_FORMATS)
+    refereed_bibcodes: list of string, bibcodes of the refereed papers, printed in the first section of the
+        biblatex document
+    languages: list of string, languages of the biblatex documents (keys of LATEX_LANGUAGES)
+    Number_authors_displayed: int, number of authors printed by paper in the biblatex document
+
+    Returns
+    ------------
+    export_files: dict, export format (or 'biblatex_' + language) -> path of the file
+    """
+    from ads_export import write_export, biblatex_document, EXPORT_FORMATS
+
+    # the bibcodes are read once by format (e.g. a generator of the spooled papers)
+    bibcodes = list(bibcodes)
+
+    # the files are only replaced if their content changed, see replace_if_changed
+    export_files = dict()
+    for export_format in export_formats:
+        export_files[export_format] = output_prefix + EXPORT_FORMATS[export_format]
+        replace_if_changed(write_export(output_prefix + '.tmp', bibcodes, export_format=export_format),
+                           export_files[export_format])
+
+    if 'bibtex' in export_files:
+        for lang in languages:
+            export_files['biblatex_' + lang] = output_prefix + '_biblatex_' + lang + '.tex'
+            with open(export_files['biblatex_' + lang] + '.tmp', 'w') as f:
+                f.write(
+                    biblatex_document(os.path.basename(export_files['bibtex']),
+                                      LATEX_LANGUAGES[lang]['title_string'],
+                                      {part: LATEX_LANGUAGES[lang][part]
+                                       for part in ['ref', 'nonref', 'other']},
+                                      refereed_bibcodes=refereed_bibcodes,
+                                      geom_string=LATEX_LANGUAGES[lang]['geom_string'],
+                                      Number_authors_displayed=Number_authors_displayed))
+            replace_if_changed(export_files['biblatex_' + lang] + '.tmp', export_files['biblatex_' + lang])
+    return export_files
+
+
+def compile_latex_file(name_file, output_dir=''):
+    """Compile a latex file with pdflatex and remove the auxiliary files
 
-        outf.write(latex_footer + '\n')
+    Parameters
+    ----------
+    name_file: string, path of the latex file
+    output_dir: string, directory where pdflatex writes the pdf
+    """
+
+    with profile_stage('pdflatex'):
+        os.system('pdflatex -output-directory ' + output_dir + ' ' + name_file)
+
+    clean_files_extension = [".aux", ".log", ".out", ".fls", ".fdb_latexmk"]
+    output_files = os.listdir(output_dir)
+    for item in output_files:
+        for extension in clean_files_extension:
+            if item.endswith(extension):
+                os.remove(os.path.join(output_dir, item))
+
+
+def configure_exclusions(exclusions=None):
+    """Set the records excluded from the publication lists (ADS_EXCLUSIONS_PAPERS). It is changed in place,
+        so that the modules which imported it use the new values.
+
+    Parameters
+    ----------
+    exclusions: dict or `None`, ADS field -> list of excluded values. The fields given replace their default
+                values (DEFAULT_ADS_EXCLUSIONS_PAPERS), an empty list excludes nothing on this field.
+    """
+    ADS_EXCLUSIONS_PAPERS.clear()
+    for field, values in dict(DEFAULT_ADS_EXCLUSIONS_PAPERS, **(exclusions or dict())).items():
+        ADS_EXCLUSIONS_PAPERS[field] = list(values or list())
+
+
+def setup_ads(config):
+    """Set the ADS token and the request scheduler from the yaml config and check the token
+
+    Parameters
+    ----------
+    config: dict, content of the yaml config file
+    """
+    # first get a token https://ads.harvard.edu/handouts/ADS_API_handout.pdf
+    ads.config.token = config["ads_config_token"]  # your ADS token
+    configure_scheduler(**config.get("ads_scheduler", dict()))
+    set_lazy_load_mode(config.get("lazy_loads", 'allow'))
+    configure_corpus_cache(**config.get("corpus_cache", dict()))
+    configure_exclusions(config.get("ads_exclusions"))
+    check_ads_token(cache_days=config.get("token_cache_days", 1.))
+
+
+def build_publication_list(researcher_name,
+                           years,
+                           french=False,
+                           Number_authors_displayed=3,
+                           phd_sec=True,
+                           add_pub_manually=None,
+                           output_dir='',
+                           compile_pdf=True,
+                           show_metrics=False,
+                           metrics_source='local',
+                           languages=None,
+                           export_formats=None,
+                           write_html=False):
+    """Create the latex publication list of a researcher, compile it and print its h-factor.
+        ADS must be set up first (see setup_ads). See create_latex_files for the parameters.
+
+    Parameters
+    ----------
+    compile_pdf: bool, if True the latex file is compiled with pdflatex, unless its pdf is more recent
+
+    Returns
+    ------------
+    name_files: dict, language -> path of the latex file
+    metrics: dict, bibliometric indices of the researcher
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    name_files, metrics = create_latex_files(researcher_name,
+                                             years=years,
+                                             french=french,
+                                             Number_authors_displayed=Number_authors_displayed,
+                                             phd_sec=phd_sec,
+                                             add_pub_manually=add_pub_manually,
+                                             output_dir=output_dir,
+                                             show_metrics=show_metrics,
+                                             metrics_source=metrics_source,
+                                             languages=languages,
+                                             export_formats=export_formats,
+                                             write_html=write_html)
+
+    if compile_pdf:
+        for name_file in name_files.values():
+            # like make: a pdf more recent than its latex file is up to date
+            name_pdf = os.path.join(output_dir, os.path.splitext(os.path.basename(name_file))[0] + '.pdf')
+            if not os.path.exists(name_pdf) or os.path.getmtime(name_pdf) < os.path.getmtime(name_file):
+                compile_latex_file(name_file, output_dir=output_dir)
+
+    # computed from the papers of the list, over the queried years
+    print("")
+    print("The h-factor of " + researcher_name + " is:", metrics['h_index'])
+    print("")
+
+    return name_files, metrics
 
 
 if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser(description='Create a latex publication list from ADS')
+    parser.add_argument('--profile',
+                        nargs='?',
+                        const='-',
+                        default=None,
+                        help='report time per stage and ADS calls, printed or saved in the given file (.json or .txt)')
+    args = parser.parse_args()
+
     with open(os.path.join(os.getcwd(), 'config_pub_list.yaml'), 'r') as file:
         config = yaml.safe_load(file)
 
-    # first get a token https://ads.harvard.edu/handouts/ADS_API_handout.pdf
-    ads.config.token = config["ads_config_token"]  # your ADS token
-    check_ads_token()
+    setup_ads(config)
 
     researcher_name = 'Mayor,  Michel'  # last name, first name
     years = (1900, 2040)  # years to be queried: (start year, end year). If None, all years (careful with old homonyms)
@@ -784,28 +1694,22 @@ if __name__ == '__main__':
     dict_pub_manually = config["add_pub_manually"]
 
     output_dir = os.path.join(os.getcwd(), 'outputfiles')
-    os.makedirs(output_dir, exist_ok=True)
-
-    lang = '_fr' if french else '_en'
-    name_publi = 'publication_list_' + researcher_name.split(',')[0] + lang
 
-    create_latex_files(researcher_name,
-                       years=years,
-                       french=french,
-                       Number_authors_displayed=Number_authors_displayed,
-                       phd_sec=True,
-                       add_pub_manually=dict_pub_manually,
-                       output_dir=output_dir)
+    # e.g. ['bibtex', 'aastex'] to also get the list formatted by ADS (.bib file and biblatex document)
+    export_formats = None
+    write_html = False  # also save the list as a html page (e.g. for a lab website)
 
-    os.system('pdflatex -output-directory ' + output_dir + ' ' + os.path.join(output_dir, name_publi + '.tex'))
+    build_publication_list(researcher_name,
+                           years=years,
+                           french=french,
+                           Number_authors_displayed=Number_authors_displayed,
+                           phd_sec=True,
+                           add_pub_manually=dict_pub_manually,
+                           output_dir=output_dir,
+                           export_formats=export_formats,
+                           write_html=write_html)
 
-    print("")
-    print("The h-factor of " + researcher_name + " is:", measure_h_factor(researcher_name))
-    print("")
+    print(quota_report())
 
-    clean_files_extension = [".aux", ".log", ".out", ".fls", ".fdb_latexmk"]
-    output_files = os.listdir(output_dir)
-    for item in output_files:
-        for extension in clean_files_extension:
-            if item.endswith(extension):
-                os.remove(os.path.join(output_dir, item))
+    if args.profile is not None:
+        write_profile_report(args.profile)
@@ -0,0 +1,218 @@
+import os
+import json
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# Figures of the group analysis (several_authors_paper_list.py), drawn from the aggregates of
+# aggregate_group_statistics saved in a json file: changing the years or the labs of a figure does not need
+# to query ADS or to classify the affiliations again:
+#   python group_plots.py group_aggregates.json --years 2021 2023 --labs LESIA IPAG LAM
+# The figures are drawn with the non interactive Agg backend (matplotlib Figure objects, no pyplot state,
+# works without display) in parallel worker processes, one figure per process.
+
+
+def save_group_aggregates(filename, statistics, range_years):
+    """Save the aggregates needed by the figures in a json file
+
+    Parameters
+    ----------
+    filename: string
+    statistics: dict, see several_authors_paper_list.aggregate_group_statistics
+    range_years: tuple, years of the analysis (start year, end year)
+
+    Returns
+    ------------
+    aggregates: dict, as saved in the file
+    """
+    aggregates = {
+        'range_years': list(range_years),
+        'papers_per_year': dict(statistics['papers_per_year']),
+        'labs_per_year': {year: dict(labs) for year, labs in statistics['labs_per_year'].items()},
+    }
+    with open(filename, 'w') as f:
+        json.dump(aggregates, f)
+    return aggregates
+
+
+def load_group_aggregates(filename):
+    """Aggregates saved by save_group_aggregates
+    """
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def selected_years(aggregates, years=None):
+    """Years of the aggregates in a range, as strings (ADS years)
+
+    Parameters
+    ----------
+    aggregates: dict, see save_group_aggregates
+    years: tuple or `None`, (start year, end year), None for the years of the analysis
+    """
+    if years is None:
+        years = aggregates['range_years']
+    return [str(year) for year in range(years[0], years[1] + 1)]
+
+
+def lab_counts(aggregates, years=None, labs=None):
+    """Number of papers of each lab over some years
+
+    Parameters
+    ----------
+    aggregates: dict, see save_group_aggregates
+    years: tuple or `None`, (start year, end year), None for the years of the analysis
+    labs: list of string or `None`, labs kept, None for all
+
+    Returns
+    ------------
+    Counter, lab -> number of papers
+    """
+    counts = Counter()
+    for year in selected_years(aggregates, years):
+        counts.update(aggregates['labs_per_year'].get(year, dict()))
+    if labs is not None:
+        counts = Counter({lab: counts[lab] for lab in labs})
+    return counts
+
+
+def plot_labs(filename, aggregates, years=None, labs=None, N_biggest_lab=12):
+    """Bar chart of the number of papers of the biggest labs
+
+    Parameters
+    ----------
+    filename: string, pdf or png file
+    aggregates: dict, see save_group_aggregates
+    years: tuple or `None`, (start year, end year), None for the years of the analysis
+    labs: list of string or `None`, labs plotted, None for the N_biggest_lab biggest labs
+    N_biggest_lab: int, we plot only the N biggest labs
+    """
+    import numpy as np
+    from matplotlib.figure import Figure
+
+    counts = lab_counts(aggregates, years=years, labs=labs)
+    counts.pop('Irrelevant', None)
+    total_papers = sum(aggregates['papers_per_year'].get(year, 0) for year in selected_years(aggregates, years))
+
+    # biggest labs, in alphabetical order
+    big_labs = sorted([lab for lab, _ in sorted(counts.items(), key=lambda item: (item[1], item[0]))[-N_biggest_lab:]])
+    big_counts = [counts[lab] for lab in big_labs]
+    years_string = '{0}-{1}'.format(*(years or aggregates['range_years']))
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.bar(big_labs, big_counts)
+    ax.set_ylim(0, 100 * (np.ceil(max(big_counts + [1]) * 1.2 / 100)))
+
+    ax.set_xticks(range(len(big_labs)))
+    ax.set_xticklabels(big_labs, rotation=30, ha='right')
+    ax.set_title(f"Publications 'exoplanètes' françaises par laboratoire ({years_string})")
+    ax.text(-0.5, max(big_counts + [1]) * 1.18, "Attention, une même publication est ici comptée plusieurs fois si")
+    ax.text(-0.5, max(big_counts + [1]) * 1.12, "elle inclue des auteurs dans différents laboratoires français.")
+    ax.text(-0.5, max(big_counts + [1]) * 1.06, f"Le nombre de publications réel est de {total_papers}.")
+    ax.set_ylabel('Nombre de publications')
+
+    fig.savefig(filename)
+
+
+def plot_papers_per_year(filename, aggregates, years=None):
+    """Bar chart of the number of papers with a french affiliation per year
+
+    Parameters
+    ----------
+    filename: string, pdf or png file
+    aggregates: dict, see save_group_aggregates
+    years: tuple or `None`, (start year, end year), None for the years of the analysis
+    """
+    from matplotlib.figure import Figure
+
+    listannee = [year for year in selected_years(aggregates, years) if year in aggregates['papers_per_year']]
+    countspubli_annee = [aggregates['papers_per_year'][year] for year in listannee]
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.bar(listannee, countspubli_annee)
+    ax.set_xlabel('Année')
+    ax.set_ylabel('Nombres de publications')
+    ax.set_title(f"Publications 'exoplanètes' françaises (total = { sum(countspubli_annee) })")
+
+    fig.savefig(filename)
+
+
+# name of the figure -> function drawing it
+GROUP_PLOTS = {
+    'labs': plot_labs,
+    'papers_per_year': plot_papers_per_year,
+}
+
+
+def render_plot(plot_job):
+    """Draw one figure, in a worker process
+
+    Parameters
+    ----------
+    plot_job: tuple (name of the figure in GROUP_PLOTS, filename, aggregates, dict of options)
+
+    Returns
+    ------------
+    filename: string
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+    plot_name, filename, aggregates, options = plot_job
+    GROUP_PLOTS[plot_name](filename, aggregates, **options)
+    return filename
+
+
+def render_plots(plot_jobs, max_workers=None):
+    """Draw figures in parallel, one worker process per figure
+
+    Parameters
+    ----------
+    plot_jobs: list of tuple, see render_plot
+    max_workers: int or `None`, number of processes, None for the number of cpus
+
+    Returns
+    ------------
+    filenames: list of string
+    """
+    if len(plot_jobs) <= 1:
+        return [render_plot(plot_job) for plot_job in plot_jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(render_plot, plot_jobs))
+
+
+def group_plot_jobs(aggregates, output_dir, years=None, labs=None, file_extension='.pdf'):
+    """The figures of the group analysis: labs and papers per year
+
+    Returns
+    ------------
+    plot_jobs: list of tuple, see render_plot
+    """
+    return [
+        ('labs', os.path.join(output_dir, 'publi_par_labo' + file_extension), aggregates, {
+            'years': years,
+            'labs': labs
+        }),
+        ('papers_per_year', os.path.join(output_dir, 'paper_per_year' + file_extension), aggregates, {
+            'years': years
+        }),
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Figures of the group analysis from its saved aggregates')
+    parser.add_argument('aggregates', help='json file saved by several_authors_paper_list.py')
+    parser.add_argument('--output-dir', default=os.getcwd())
+    parser.add_argument('--years', nargs=2, type=int, default=None, metavar=('START', 'END'))
+    parser.add_argument('--labs', nargs='+', default=None, help='labs plotted, default the biggest ones')
+    parser.add_argument('--format', default='pdf', help='pdf, png, svg...')
+    args = parser.parse_args()
+
+    render_plots(
+        group_plot_jobs(load_group_aggregates(args.aggregates),
+                        args.output_dir,
+                        years=args.years,
+                        labs=args.labs,
+                        file_extension='.' + args.format))
@@ -0,0 +1,232 @@
+import json
+import hashlib
+import inspect
+from unidecode import unidecode
+from publist_cache import load_json_cache, save_json_cache
+
+# Resolution of the affiliations of the papers into lab acronyms, for the group statistics.
+# A lab is found if one of its aliases is in the normalised affiliation (lower case, no accents,
+# no apostrophes or hyphens). The same affiliation strings come back in thousands of papers, so the
+# labs of each affiliation (as given by ADS, before normalisation) are kept in a json cache. The cache is
+# tagged with a hash of LAB_RULES and of the normalisation and classification code: when they change,
+# it is emptied and all the affiliations are classified again.
+
+AFFILIATION_CACHE_FILE = 'affiliation_labs.json'
+
+# (lab acronym, aliases found in the normalised affiliations). 'Irrelevant' are french affiliations
+# that are not research labs of interest.
+LAB_RULES = [
+    ("ONERA", ["onera"]),
+    ("LESIA", ["lesia", "laboratoire detudes spatiales et dinstrumentation en astrophysique"]),
+    ("LPC2E", ["laboratoire de physique et chimie de lenvironnement et de lespace", "lpc2e"]),
+    ("Laboratoire de Physique de l'ENS", ["laboratoire de physique de lens"]),
+    ("IPAG", [
+        "ipag", "institut de planetologie et dastrophysique de grenoble",
+        "institute of planetology and astrophysics of grenoble", "laboratoire dastrophysique de grenoble",
+        "institut de planetologie et astrophysique de grenoble",
+        "institut de planetologie et dastrophysique, university of grenoble",
+        "institut de planetologie et astrophysique, de grenoble"
+    ]),
+    ("CRAL", ["cral", "centre de recherche astrophysique de lyon", "centre de recherche astrophysique, de lyon"]),
+    ("ObAS", ["observatoire astronomique de strasbourg"]),
+    ("Lagrange", ["lagrange"]),
+    ("Institut Fresnel", ["institut fresnel"]),
+    ("IAP", [
+        "iap", "institut dastrophysique de paris", "institute dastrophysique de paris",
+        "institut dastrophysique de pari s"
+    ]),
+    ("LAM", ["lam,", "laboratoire dastrophysique de marseille"]),
+    ("LMD", ["lmd", "laboratoire de meteorologie dynamique", "lab. de meteorologie dynamique"]),
+    ("IAS", ["ias, ", "institut dastrophysique spatiale"]),
+    ("OHP", ["observatoire de haute provence"]),
+    ("LAB", ["lab,", "laboratoire dastrophysique de bordeaux", "laboratory of astrophysics at bordeaux"]),
+    ("LERMA", ["lerma", "laboratoire detudes du rayonnement et de la matiere en astrophysique et atmospheres"]),
+    ("IRAP", ["irap", "institut de recherche en astrophysique et planetologie"]),
+    ("LISA", ["laboratoire interuniversitaire des systemes atmospheriques", "lisa"]),
+    ("PIIM", ["piim", "physique des interactions ioniques et moleculaires"]),
+    ("IPGP", [
+        "ipgp", "institut de physique du globe de paris", "institut de physique du globe",
+        "paris globe institute of physics"
+    ]),
+    ("IMCCE", ["imcce", "imcee", "institut de mecanique celeste et de calcul des ephemerides"]),
+    ("IOGS", ["institut doptique graduate school"]),
+    ("LUTH", ["laboratoire univers et theories", "luth"]),
+    ("IRAM", ["institut de radioastronomie millimetrique", "iram"]),
+    ("MdlS", ["maison de la simulation", "house of simulation"]),
+    ("CEA / AIM", ["irfu", "laboratoire aim", "aim,", "astrophysique, instrumentation et modelisation"]),
+    ("LAPTh", ["laboratoire dannecy le vieux de physique theorique", "lapth"]),
+    ("UTINAM", [
+        "utinam", "univers, temps-frequence, interfaces, nanostructures, atmosphere et environnement, molecules"
+    ]),
+    ("LUPM", ["laboratoire univers et particules de montpellier", "lupm"]),
+    ("ISAE", [
+        "institut superieur de laeronautique et de lespace", "institut superieur en aeronautique et espace", "isae"
+    ]),
+    ("CFHT", ["canada-france-hawaii telescope", "canada france hawaii telescope", "cfht"]),
+    ("Laboratoire de planétologie de Nantes", ["laboratoire de planetologie de nantes"]),
+    ("CRPG", ["crpg", "centre de recherches petrographiques et geochimiques"]),
+    ("GEPI", ["gepi", "galaxies, etoiles, physique et instrumentation"]),
+    ("Laboratoire de Géologie de Lyon", ["lgl", "umr 5276"]),
+    ("SYRTE", ["syrte", "systemes de reference temps espace"]),
+    ("LATMOS", [
+        "latmos", "laboratoire atmospheres, observations spatiales",
+        "laboratoire atmospheres, milieux, observations spatiales",
+        "laboratoire atmospheres, milieux et observations spatiales"
+    ]),
+    ("Institut Lumière Matière", ["institut lumiere matiere"]),
+    ("LRGP", ["laboratoire reactions et genie des procedes", "lrgp"]),
+    ("Laboratoire de planétologie et Géosciences", ["laboratoire de planetologie et geosciences"]),
+    ("GEOPS", ["geops", "geosciences paris saclay"]),
+    ("Institut des Sciences Moléculaires", ["institut des sciences moleculaires"]),
+    ("LAPP", ["lapp", "laboratoire dannecy de physique des particules"]),
+    ("GSMA", [
+        "groupe de spectrometrie moleculaire et atmospherique", "groupe de spectroscopie moleculaire et atmospherique",
+        "gsma"
+    ]),
+    ("GSMA", ["laboratoire de geologie de lyon"]),
+    ("Laboratoire de Planetologie et Géodynamique", ["laboratoire de planetologie et geodynamique"]),
+    ("Institut de Chimie Physique", ["institut de chimie physique", "laboratoire de chimie physique"]),
+    ("IMPMC", [
+        "institut de mineralogie, de physique des materiaux et de cosmochimie",
+        "institut de mineralogie, physique des materiaux et cosmochimie", "impmc"
+    ]),
+    ("ISTO", ["institut des sciences de la terre dorleans", "isto"]),
+    ("APC", ["astroparticule et cosmologie"]),
+    ("Observatoire des Baronnies Provencales", [
+        "observatoire des baronnies provencales", "baronnies provencales observatory"
+    ]),
+    ("Irrelevant", [
+        "lab sticc", "agenium", "pixyl", "european space agency", "mesocentre de calcul de franche comte",
+        "mesocentre de franche comte", "silios", "thales", "laboratoire de physique des deux infinis",
+        "centre de biophysique moleculaire", "centre lasers intenses et applications",
+        "institut de mecanique des fluides de toulouse", "amateur astronomer 101"
+    ]),
+]
+
+AFFILIATION_CACHE = {"rules_hash": None, "labs": dict(), "new_entries": 0, "hits": 0, "classified": 0}
+
+
+def lab_rules_hash():
+    """Hash of LAB_RULES and of the code normalising and classifying the affiliations, stored with the cache
+        to detect a change of the rules or of the normalisation
+
+    Returns
+    ------------
+    hash: string
+    """
+    classification_code = inspect.getsource(normalise_affiliation) + inspect.getsource(classify_affiliation)
+    return hashlib.sha256((json.dumps(LAB_RULES, sort_keys=True) + classification_code).encode('utf-8')).hexdigest()
+
+
+def normalise_affiliation(affiliation):
+    """Normalise an affiliation before looking for the lab aliases
+
+    Parameters
+    ----------
+    affiliation: string, affiliation as given by ADS
+
+    Returns
+    ------------
+    normalised_affiliation: string
+    """
+    normalised_affiliation = unidecode(affiliation.lower()).replace("'", "").replace("-", " ").replace("`", "")
+    return normalised_affiliation.replace("d astrophysique", "dastrophysique")
+
+
+def classify_affiliation(normalised_affiliation):
+    """Labs of a normalised affiliation, from LAB_RULES
+
+    Parameters
+    ----------
+    normalised_affiliation: string, see normalise_affiliation
+
+    Returns
+    ------------
+    labs: list of string, lab acronyms (sorted, can be empty)
+    """
+    labs = set()
+    for acronym, aliases in LAB_RULES:
+        if any(alias in normalised_affiliation for alias in aliases):
+            labs.add(acronym)
+    return sorted(labs)
+
+
+def load_affiliation_cache():
+    """Load the persistent affiliation -> labs cache, or start an empty one if the rules changed
+    """
+    rules_hash = lab_rules_hash()
+    cache = load_json_cache(AFFILIATION_CACHE_FILE, default=dict())
+    AFFILIATION_CACHE["rules_hash"] = rules_hash
+    AFFILIATION_CACHE["new_entries"] = 0
+    AFFILIATION_CACHE["hits"] = 0
+    AFFILIATION_CACHE["classified"] = 0
+    if cache.get("rules_hash") == rules_hash:
+        AFFILIATION_CACHE["labs"] = cache["labs"]
+    else:
+        AFFILIATION_CACHE["labs"] = dict()
+
+
+def save_affiliation_cache():
+    """Save the affiliation -> labs cache, if new affiliations were classified
+    """
+    if AFFILIATION_CACHE["new_entries"] == 0:
+        return
+    save_json_cache(AFFILIATION_CACHE_FILE, {
+        "rules_hash": AFFILIATION_CACHE["rules_hash"],
+        "labs": AFFILIATION_CACHE["labs"]
+    })
+    AFFILIATION_CACHE["new_entries"] = 0
+
+
+def affiliation_labs(affiliation):
+    """Labs of an affiliation, classified only if this affiliation was never seen with the current rules
+
+    Parameters
+    ----------
+    affiliation: string, affiliation as given by ADS
+
+    Returns
+    ------------
+    labs: list of string, lab acronyms
+    """
+    if AFFILIATION_CACHE["rules_hash"] is None:
+        load_affiliation_cache()
+
+    # keyed by the affiliation as given by ADS: an affiliation already seen is not normalised again
+    labs = AFFILIATION_CACHE["labs"].get(affiliation)
+    if labs is None:
+        labs = classify_affiliation(normalise_affiliation(affiliation))
+        AFFILIATION_CACHE["labs"][affiliation] = labs
+        AFFILIATION_CACHE["new_entries"] += 1
+        AFFILIATION_CACHE["classified"] += 1
+    else:
+        AFFILIATION_CACHE["hits"] += 1
+    return labs
+
+
+def paper_labs(affiliations):
+    """Labs of a paper from its affiliations
+
+    Parameters
+    ----------
+    affiliations: list of string, affiliations of the paper (e.g. only the french ones)
+
+    Returns
+    ------------
+    labs: list of string, lab acronyms, each lab once
+    """
+    labs = set()
+    for affiliation in affiliations:
+        labs.update(affiliation_labs(affiliation))
+    return sorted(labs)
+
+
+def affiliation_cache_report():
+    """Number of affiliations found in the cache and classified during this run
+
+    Returns
+    ------------
+    report: string
+    """
+    return "Affiliations: {0} found in the cache, {1} classified".format(AFFILIATION_CACHE["hits"],
+                                                                        AFFILIATION_CACHE["classified"])
@@ -0,0 +1,137 @@
+import ads
+from ads_scheduler import scheduled
+from profiling import record_lazy_load
+
+# ads.search.Article silently sends a new request to ADS when a field that was not in the fl of
+# the query is read (one request per paper and per field). Depending on the mode (see set_lazy_load_mode):
+# - 'allow': the field is loaded by ads as usual (default),
+# - 'raise': an exception names the missing field, to fix the fl of the query,
+# - 'batch': the field is loaded at once for all the papers returned by the same query.
+# In all the modes the lazy loads are counted in the profile report. ads.search.Article (and SearchQuery
+# in 'batch' mode) is only patched by set_lazy_load_mode: importing this module does not change ads.
+
+LAZY_LOADS = {"mode": "allow", "chunk_size": 200}
+
+# the original methods, patched by set_lazy_load_mode
+_ORIGINAL = {"get_field": ads.search.Article._get_field, "execute": ads.search.SearchQuery.execute}
+
+
+def set_lazy_load_mode(mode):
+    """Choose what happens when a field that was not requested is read on an ads paper
+
+    Parameters
+    ----------
+    mode: string, 'allow', 'raise' or 'batch'
+    """
+    if mode not in ['allow', 'raise', 'batch']:
+        raise Exception("Unknown lazy load mode '{0}', use 'allow', 'raise' or 'batch'".format(mode))
+    LAZY_LOADS["mode"] = mode
+    # get_field counts the lazy load, then calls the original method in 'allow' mode
+    ads.search.Article._get_field = get_field
+    # the papers of a query only need to be linked to be loaded together
+    ads.search.SearchQuery.execute = execute if mode == 'batch' else _ORIGINAL["execute"]
+
+
+def link_papers(papers):
+    """Papers loaded together: a lazy load in 'batch' mode fetches the field for all of them.
+        The papers of a SearchQuery are linked automatically.
+
+    Parameters
+    ----------
+    papers: list of ads publication objects
+
+    Returns
+    ------------
+    papers: the same list
+    """
+    for paper in papers:
+        paper._linked_papers = papers
+    return papers
+
+
+def query_field_values(key, values, field):
+    """Value of a field for papers identified by their ADS id or their bibcode, by chunks
+
+    Parameters
+    ----------
+    key: string, 'id' or 'bibcode'
+    values: list of string, ids or bibcodes of the papers
+    field: string, name of the field
+
+    Returns
+    ------------
+    dict, id or bibcode -> value of the field
+    """
+    field_values = dict()
+    for i in range(0, len(values), LAZY_LOADS["chunk_size"]):
+        chunk = values[i:i + LAZY_LOADS["chunk_size"]]
+        query = ads.SearchQuery(q='{0}:({1})'.format(key, ' OR '.join('"' + value + '"' for value in chunk)),
+                                fl=[key, field],
+                                rows=len(chunk))
+        for doc in scheduled(query):
+            field_values[str(doc._raw[key])] = doc._raw.get(field)
+    return field_values
+
+
+def batch_load_field(paper, field):
+    """Load a field for a paper and all the papers linked to it that do not have it, by chunks of ids.
+        Papers without id (e.g. added manually or slimmed) are loaded by bibcode.
+
+    Parameters
+    ----------
+    paper: ads publication object
+    field: string, name of the field
+
+    Returns
+    ------------
+    value of the field for paper
+    """
+    missing_papers = [
+        linked_paper for linked_paper in getattr(paper, '_linked_papers', [paper]) if field not in linked_paper._raw
+    ]
+    if not any(linked_paper is paper for linked_paper in missing_papers):
+        missing_papers.append(paper)
+
+    papers_by_key = {'id': dict(), 'bibcode': dict()}
+    for missing_paper in missing_papers:
+        for key in ['id', 'bibcode']:
+            if missing_paper._raw.get(key) is not None:
+                papers_by_key[key].setdefault(str(missing_paper._raw[key]), list()).append(missing_paper)
+                break
+
+    if not any(loaded_paper is paper for papers_key in papers_by_key.values() for papers in papers_key.values()
+               for loaded_paper in papers):
+        # neither id nor bibcode: nothing to query
+        raise Exception("Field '{0}' cannot be loaded for a paper without id and bibcode".format(field))
+
+    for key, papers_key in papers_by_key.items():
+        if len(papers_key) == 0:
+            continue
+        field_values = query_field_values(key, list(papers_key), field)
+        for value_key, papers in papers_key.items():
+            for missing_paper in papers:
+                value = field_values.get(value_key)
+                missing_paper._raw[field] = value
+                # where the cached properties of ads.search.Article keep their value
+                missing_paper.__dict__[field] = value
+    return paper._raw[field]
+
+
+def get_field(paper, field):
+    """Replaces ads.search.Article._get_field, see the comment at the top of this file
+    """
+    record_lazy_load(field)
+    if LAZY_LOADS["mode"] == 'raise':
+        raise Exception("Field '{0}' of paper {1} was not requested to ADS: add it to the fl of the query".format(
+            field, paper._raw.get('bibcode', paper._raw.get('id'))))
+    if LAZY_LOADS["mode"] == 'batch':
+        return batch_load_field(paper, field)
+    return _ORIGINAL["get_field"](paper, field)
+
+
+def execute(query):
+    """Replaces ads.search.SearchQuery.execute: the papers of a query are linked, see link_papers
+    """
+    _ORIGINAL["execute"](query)
+    link_papers(query._articles)
+
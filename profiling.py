@@ -0,0 +1,134 @@
+import json
+import time
+from contextlib import contextmanager
+
+# Run-wide instrumentation: wall time per stage, ADS calls, bytes received and papers processed.
+# Stages can be nested (e.g. query_papers runs inside create_latex_subpart), so stage times are inclusive.
+
+PROFILE = dict()
+
+
+def reset_profile():
+    """Reset all the counters of the current run
+    """
+    PROFILE.clear()
+    PROFILE["stages"] = dict()
+    PROFILE["ads_calls"] = 0
+    PROFILE["bytes_received"] = 0
+    PROFILE["papers_processed"] = 0
+    PROFILE["lazy_loads"] = dict()
+
+
+reset_profile()
+
+
+@contextmanager
+def profile_stage(stage_name):
+    """Context manager measuring the wall time spent in a stage of the run.
+
+    Parameters
+    ----------
+    stage_name: string, name of the stage in the report
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage = PROFILE["stages"].setdefault(stage_name, {"calls": 0, "wall_time": 0.})
+        stage["calls"] += 1
+        stage["wall_time"] += time.perf_counter() - start
+
+
+def profile_function(stage_name):
+    """Decorator measuring the wall time spent in a function, see profile_stage.
+
+    Parameters
+    ----------
+    stage_name: string, name of the stage in the report
+    """
+
+    def decorator(function):
+
+        def wrapper(*args, **kwargs):
+            with profile_stage(stage_name):
+                return function(*args, **kwargs)
+
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+
+    return decorator
+
+
+def record_ads_response(response):
+    """Count one http call to ADS and the bytes it returned.
+
+    Parameters
+    ----------
+    response: requests.Response, answer of ADS
+    """
+    PROFILE["ads_calls"] += 1
+    PROFILE["bytes_received"] += len(response.content)
+
+
+def record_papers(number_papers=1):
+    """Count papers processed during the run
+
+    Parameters
+    ----------
+    number_papers: int, number of papers to add to the counter
+    """
+    PROFILE["papers_processed"] += number_papers
+
+
+def record_lazy_load(field):
+    """Count one field of an ads paper loaded lazily (one extra request), see lazy_loads.py
+
+    Parameters
+    ----------
+    field: string, name of the field
+    """
+    PROFILE["lazy_loads"][field] = PROFILE["lazy_loads"].get(field, 0) + 1
+
+
+def profile_report(report_format='text'):
+    """Build the report of the current run.
+
+    Parameters
+    ----------
+    report_format: string, 'text' or 'json'
+
+    Returns
+    ------------
+    report: string
+    """
+    if report_format == 'json':
+        return json.dumps(PROFILE, indent=2)
+
+    lines = ["Profile of the run", "------------------"]
+    for stage_name, stage in sorted(PROFILE["stages"].items(), key=lambda item: -item[1]["wall_time"]):
+        lines.append("{0:<30} {1:>10.3f} s  ({2} calls)".format(stage_name, stage["wall_time"], stage["calls"]))
+    lines.append("ADS calls: {0}".format(PROFILE["ads_calls"]))
+    lines.append("Bytes received from ADS: {0}".format(PROFILE["bytes_received"]))
+    lines.append("Papers processed: {0}".format(PROFILE["papers_processed"]))
+    if len(PROFILE["lazy_loads"]) > 0:
+        lines.append("Fields loaded lazily (not in fl): " + ", ".join(
+            ["{0} ({1})".format(field, number) for field, number in sorted(PROFILE["lazy_loads"].items())]))
+    return "\n".join(lines)
+
+
+def write_profile_report(filename=None):
+    """Print the report of the current run or save it. The format is json
+        if the filename ends with .json, text otherwise.
+
+    Parameters
+    ----------
+    filename: string or None, if None or '-' the text report is printed
+    """
+    if filename is None or filename == '-':
+        print(profile_report())
+        return
+
+    report_format = 'json' if filename.endswith('.json') else 'text'
+    with open(filename, 'w') as outf:
+        outf.write(profile_report(report_format) + '\n')
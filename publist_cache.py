@@ -0,0 +1,55 @@
+import os
+import json
+
+# Small json caches shared by the scripts (token validation, h-index, ...).
+# They are stored in ~/.cache/create_publication_list unless PUBLIST_CACHE_DIR is set.
+
+
+def cache_dir():
+    """Directory of the local caches, created if needed
+
+    Returns
+    ------------
+    path: string
+    """
+    path = os.environ.get('PUBLIST_CACHE_DIR',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'create_publication_list'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def load_json_cache(name, default=None):
+    """Load a json cache file
+
+    Parameters
+    ----------
+    name: string, name of the file in the cache directory
+    default: value returned if the cache does not exist or cannot be read
+
+    Returns
+    ------------
+    content of the cache
+    """
+    path = os.path.join(cache_dir(), name)
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except ValueError:
+        # corrupted cache, we just start again
+        return default
+
+
+def save_json_cache(name, data):
+    """Save a json cache file. We write in a temporary file first so that the cache is never corrupted
+
+    Parameters
+    ----------
+    name: string, name of the file in the cache directory
+    data: json serializable object
+    """
+    path = os.path.join(cache_dir(), name)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+# Single entry point for the scripts of this repository:
+#   python publist_cli.py list "Mayor, Michel" --years 1990 2024
+#   python publist_cli.py batch
+#   python publist_cli.py watch
+#   python publist_cli.py serve --port 8000
+#   python publist_cli.py group
+#   python publist_cli.py hindex "Mayor, Michel"
+# Heavy modules (ads, pylatexenc, numpy, pandas, matplotlib) are only imported by the subcommands
+# that need them, so that e.g. an h-index already in cache is printed without importing any of them.
+
+
+def load_config(config_file):
+    import yaml
+
+    with open(config_file, 'r') as file:
+        return yaml.safe_load(file)
+
+
+def years_tuple(years):
+    return None if years is None else (years[0], years[1])
+
+
+def run_list(args):
+    """Publication list of a single researcher"""
+    from create_publist import setup_ads, build_publication_list
+
+    config = load_config(args.config)
+    setup_ads(config)
+    build_publication_list(args.researcher_name,
+                           years=years_tuple(args.years),
+                           french=args.french,
+                           languages=args.languages,
+                           export_formats=args.export,
+                           write_html=args.html,
+                           Number_authors_displayed=args.authors_displayed,
+                           phd_sec=args.phd,
+                           add_pub_manually=config["add_pub_manually"],
+                           output_dir=args.output_dir,
+                           compile_pdf=not args.no_pdf,
+                           show_metrics=args.metrics,
+                           metrics_source=args.metrics_source)
+
+
+def run_batch(args):
+    """Publication lists of all the researchers of the 'batch_researchers' key of the config file"""
+    from create_publist import setup_ads, build_publication_list
+    from bibliometrics import write_metrics_csv
+
+    config = load_config(args.config)
+    setup_ads(config)
+    metrics_per_researcher = dict()
+    for researcher in config["batch_researchers"]:
+        _, metrics = build_publication_list(researcher["name"],
+                                            years=years_tuple(researcher.get("years")),
+                                            french=researcher.get("french", False),
+                                            languages=researcher.get("languages"),
+                                            export_formats=args.export or researcher.get("export_formats"),
+                                            write_html=args.html or researcher.get("html", False),
+                                            Number_authors_displayed=researcher.get("Number_authors_displayed", 3),
+                                            phd_sec=researcher.get("phd_sec", False),
+                                            add_pub_manually=researcher.get("add_pub_manually",
+                                                                            config["add_pub_manually"]),
+                                            output_dir=args.output_dir,
+                                            compile_pdf=not args.no_pdf,
+                                            show_metrics=args.metrics,
+                                            metrics_source=args.metrics_source)
+        metrics_per_researcher[researcher["name"]] = metrics
+    write_metrics_csv(os.path.join(args.output_dir, 'publication_metrics_batch.csv'), metrics_per_researcher)
+
+
+def run_watch(args):
+    """Keep the lists of the 'batch_researchers' up to date, refreshed incrementally from ADS (publist_watch.py)"""
+    from create_publist import setup_ads
+    from publist_watch import watch
+
+    config = load_config(args.config)
+    setup_ads(config)
+    options = {
+        key: value
+        for key, value in [('interval_hours', args.interval_hours), ('jitter', args.jitter),
+                           ('cycle_budget', args.cycle_budget)] if value is not None
+    }
+    watch(config,
+          args.output_dir,
+          cycles=args.cycles,
+          list_options={
+              'compile_pdf': not args.no_pdf,
+              'show_metrics': args.metrics,
+              'metrics_source': args.metrics_source,
+              'export_formats': args.export,
+              'write_html': args.html
+          },
+          **options)
+
+
+def run_serve(args):
+    """Serve the lists of the 'batch_researchers' over http, from the local corpus (publist_server.py)"""
+    from create_publist import setup_ads
+    from publist_server import serve
+
+    config = load_config(args.config)
+    setup_ads(config)
+    serve(config, host=args.host, port=args.port, max_age=args.max_age)
+
+
+def run_group(args):
+    """Statistics of a group of authors (several_authors_paper_list.py)"""
+    from several_authors_paper_list import main
+
+    main(config_file=args.config)
+
+
+def run_hindex(args):
+    """h-index of a researcher, from the local cache if it is recent enough"""
+    from publist_cache import load_json_cache, save_json_cache
+
+    # same papers as the publication list (see create_publist.publication_list_papers)
+    cache_key = '{0}|{1}|{2}|list|{3}'.format(args.researcher_name, years_tuple(args.years), args.metrics_source,
+                                              json.dumps(load_config(args.config).get('ads_exclusions'),
+                                                         sort_keys=True))
+    hindex_cache = load_json_cache('hindex_cache.json', default=dict())
+    cached = hindex_cache.get(cache_key)
+
+    if not args.refresh and cached is not None and time.time() - cached["time"] < args.max_age * 86400:
+        h_factor = cached["h_factor"]
+    else:
+        from create_publist import setup_ads, measure_h_factor
+
+        setup_ads(load_config(args.config))
+        h_factor = measure_h_factor(args.researcher_name,
+                                    years=years_tuple(args.years),
+                                    metrics_source=args.metrics_source)
+        hindex_cache[cache_key] = {"h_factor": h_factor, "time": time.time()}
+        save_json_cache('hindex_cache.json', hindex_cache)
+
+    print("The h-factor of " + args.researcher_name + " is:", h_factor)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Publication lists and statistics from ADS')
+    parser.add_argument('--config', default='config_pub_list.yaml', help='yaml config file (ADS token, ...)')
+    parser.add_argument('--profile',
+                        nargs='?',
+                        const='-',
+                        default=None,
+                        help='report time per stage and ADS calls, printed or saved in the given file (.json or .txt)')
+    parser.add_argument('--metrics-source',
+                        choices=['local', 'server'],
+                        default='local',
+                        help="'server': h-index and citations computed by the ADS metrics service, "
+                        "without downloading the citation lists")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    output_parser = argparse.ArgumentParser(add_help=False)
+    output_parser.add_argument('--output-dir', default=os.path.join(os.getcwd(), 'outputfiles'))
+    output_parser.add_argument('--no-pdf', action='store_true', help='do not compile the latex files')
+    output_parser.add_argument('--metrics', action='store_true', help='print h, g, i10 and m-index under the title')
+    output_parser.add_argument('--export',
+                               nargs='+',
+                               default=None,
+                               metavar='FORMAT',
+                               help='also export the papers with the ADS export service in one request, '
+                               'e.g. --export bibtex aastex (.bib file and a biblatex document)')
+    output_parser.add_argument('--html',
+                               action='store_true',
+                               help='also save the list as a html page, rewritten only if it changed')
+
+    parser_list = subparsers.add_parser('list', parents=[output_parser], help=run_list.__doc__)
+    parser_list.add_argument('researcher_name', help='"last name, first name"')
+    parser_list.add_argument('--years', nargs=2, type=int, default=None, metavar=('START', 'END'))
+    parser_list.add_argument('--french', action='store_true')
+    parser_list.add_argument('--languages',
+                             nargs='+',
+                             choices=['fr', 'en'],
+                             default=None,
+                             help='write one list per language from the same ADS queries, e.g. --languages fr en')
+    parser_list.add_argument('--authors-displayed', type=int, default=3)
+    parser_list.add_argument('--phd', action='store_true', help='add the thesis section')
+    parser_list.set_defaults(function=run_list)
+
+    parser_batch = subparsers.add_parser('batch', parents=[output_parser], help=run_batch.__doc__)
+    parser_batch.set_defaults(function=run_batch)
+
+    parser_watch = subparsers.add_parser('watch', parents=[output_parser], help=run_watch.__doc__)
+    parser_watch.add_argument('--interval-hours', type=float, default=None, help='time between two refreshes')
+    parser_watch.add_argument('--jitter', type=float, default=None, help='random variation of the interval (fraction)')
+    parser_watch.add_argument('--cycle-budget', type=int, default=None, help='maximum number of ADS requests per cycle')
+    parser_watch.add_argument('--cycles', type=int, default=None, help='stop after this number of cycles')
+    parser_watch.set_defaults(function=run_watch)
+
+    parser_serve = subparsers.add_parser('serve', help=run_serve.__doc__)
+    parser_serve.add_argument('--host', default='127.0.0.1')
+    parser_serve.add_argument('--port', type=int, default=8000)
+    parser_serve.add_argument('--max-age',
+                              type=float,
+                              default=None,
+                              help='seconds during which a rendered list is served from memory')
+    parser_serve.set_defaults(function=run_serve)
+
+    parser_group = subparsers.add_parser('group', help=run_group.__doc__)
+    parser_group.set_defaults(function=run_group)
+
+    parser_hindex = subparsers.add_parser('hindex', help=run_hindex.__doc__)
+    parser_hindex.add_argument('researcher_name', help='"last name, first name"')
+    parser_hindex.add_argument('--years', nargs=2, type=int, default=None, metavar=('START', 'END'))
+    parser_hindex.add_argument('--max-age', type=float, default=7., help='maximum age of the cached value, in days')
+    parser_hindex.add_argument('--refresh', action='store_true', help='ignore the cache')
+    parser_hindex.set_defaults(function=run_hindex)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.function(args)
+
+    # only report on ADS if the subcommand imported it
+    if 'ads_scheduler' in sys.modules:
+        from ads_scheduler import quota_report
+        print(quota_report())
+    if args.profile is not None:
+        from profiling import write_profile_report
+        write_profile_report(args.profile)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import unquote, urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from publist_cache import cache_dir
+from corpus_cache import configure_corpus_cache
+from create_publist import create_latex_files, query_papers, ADS_EXCLUSIONS_PAPERS, PAPER_FIELDS
+
+# Small http server for an intranet, serving the publication lists of the 'batch_researchers' of the yaml file:
+#   /researcher/<name>/publications.tex   latex list
+#   /researcher/<name>/publications.html  html page
+#   /researcher/<name>/publications.json  papers (ADS records) and bibliometric indices
+#   /researcher/<name>/h-index            h-index (json)
+# <name> is the name of the yaml file, url encoded (e.g. Mayor,%20Michel), ?lang=fr chooses the language.
+# The papers come from the local corpus (corpus_cache.py), refreshed incrementally when it is older than its
+# max_age_days. All the outputs of a researcher are rendered at once and kept in memory for max_age seconds:
+# a request is then answered from memory, with an ETag (If-None-Match gives a 304 Not Modified).
+
+SERVER = {
+    "max_age": 600.,  # seconds during which a rendered list is served from memory
+}
+
+CONTENT_TYPES = {
+    'tex': 'application/x-tex; charset=utf-8',
+    'html': 'text/html; charset=utf-8',
+    'json': 'application/json',
+}
+
+# researcher name -> {'time': rendering time, 'outputs': {(format, language): (content, etag)}}
+RENDERED = dict()
+_RENDER_LOCK = threading.Lock()
+
+
+def researcher_options(config, name):
+    """Options of a researcher in the 'batch_researchers' key of the yaml file, None if not listed
+    """
+    for researcher in config.get("batch_researchers", list()):
+        if researcher["name"] == name:
+            return researcher
+    return None
+
+
+def output_etag(content):
+    """ETag of a rendered output: hash of its content
+    """
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+
+def render_researcher(researcher, config):
+    """Render all the outputs of a researcher (latex, html, json and h-index in each language)
+
+    Parameters
+    ----------
+    researcher: dict, options of the researcher (see 'batch_researchers' in the yaml file)
+    config: dict, content of the yaml config file
+
+    Returns
+    ------------
+    outputs: dict, (format, language) -> (content as bytes, etag)
+    """
+    output_dir = os.path.join(cache_dir(), 'served')
+    os.makedirs(output_dir, exist_ok=True)
+    years = None if researcher.get("years") is None else tuple(researcher["years"])
+    name_files, metrics = create_latex_files(researcher["name"],
+                                             years=years,
+                                             french=researcher.get("french", False),
+                                             languages=researcher.get("languages"),
+                                             Number_authors_displayed=researcher.get("Number_authors_displayed", 3),
+                                             phd_sec=researcher.get("phd_sec", False),
+                                             add_pub_manually=researcher.get("add_pub_manually",
+                                                                             config["add_pub_manually"]),
+                                             output_dir=output_dir,
+                                             write_html=True)
+
+    # same queries as create_latex_files: read from the corpus, no ADS request
+    papers = {
+        key: [paper._raw for paper in query_papers(researcher["name"],
+                                                   refereed=refereed,
+                                                   years=years,
+                                                   fl=PAPER_FIELDS,
+                                                   exclusions=ADS_EXCLUSIONS_PAPERS)]
+        for key, refereed in [('refereed', True), ('non_refereed', False)]
+    }
+    json_content = json.dumps({'researcher': researcher["name"], 'metrics': metrics, 'papers': papers}).encode()
+    h_index_content = json.dumps({'researcher': researcher["name"], 'h_index': metrics['h_index']}).encode()
+
+    outputs = dict()
+    for lang, name_file in name_files.items():
+        with open(name_file, 'rb') as f:
+            outputs[('tex', lang)] = f.read()
+        with open(os.path.splitext(name_file)[0] + '.html', 'rb') as f:
+            outputs[('html', lang)] = f.read()
+        outputs[('json', lang)] = json_content
+        outputs[('h-index', lang)] = h_index_content
+    return {key: (content, output_etag(content)) for key, content in outputs.items()}
+
+
+def researcher_outputs(researcher, config):
+    """Outputs of a researcher, from memory if they were rendered less than SERVER["max_age"] seconds ago.
+        If the rendering fails (e.g. ADS is down), the previous outputs are served.
+
+    Returns
+    ------------
+    outputs: dict, see render_researcher
+    """
+    name = researcher["name"]
+    rendered = RENDERED.get(name)
+    if rendered is not None and time.time() - rendered['time'] < SERVER["max_age"]:
+        return rendered['outputs']
+
+    # one rendering at a time (ADS scheduler, profile, files), the requests waiting get the new outputs
+    with _RENDER_LOCK:
+        rendered = RENDERED.get(name)
+        if rendered is not None and time.time() - rendered['time'] < SERVER["max_age"]:
+            return rendered['outputs']
+        try:
+            outputs = render_researcher(researcher, config)
+        except Exception as error:
+            if rendered is None:
+                raise
+            print("Rendering of " + name + " failed, previous version served: " + str(error))
+            outputs = rendered['outputs']
+        RENDERED[name] = {'time': time.time(), 'outputs': outputs}
+        return outputs
+
+
+def make_handler(config):
+    """Request handler class of the server, for a given yaml config
+    """
+
+    class PublicationListHandler(BaseHTTPRequestHandler):
+        # the reasons of send_error (status line) are fixed ascii strings: what comes from the url (decoded, it
+        # can hold line breaks or non ascii characters) only goes in the body (explain, html escaped by send_error)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            parts = [unquote(part) for part in url.path.strip('/').split('/')]
+            if len(parts) != 3 or parts[0] != 'researcher':
+                return self.send_error(404, "Not found",
+                                       "Use /researcher/<name>/publications.{tex,html,json} or /h-index")
+            if parts[2] == 'h-index':
+                output_format = 'h-index'
+            elif parts[2].startswith('publications.') and parts[2].split('.', 1)[1] in CONTENT_TYPES:
+                output_format = parts[2].split('.', 1)[1]
+            else:
+                return self.send_error(404, "Unknown output", "Unknown output " + parts[2])
+
+            # only the researchers of the yaml file: an unknown name does not cost ADS requests
+            researcher = researcher_options(config, parts[1])
+            if researcher is None:
+                return self.send_error(404, "Unknown researcher", "Unknown researcher " + parts[1])
+
+            try:
+                outputs = researcher_outputs(researcher, config)
+            except Exception as error:
+                # the error can contain the ADS token or paths of the server: only in the log
+                self.log_error("Rendering of %r failed: %s", researcher["name"], error)
+                return self.send_error(502, "Publication list not available")
+
+            # default: the first language of the researcher
+            languages = list(dict.fromkeys(lang for _, lang in outputs))
+            lang = parse_qs(url.query).get('lang', languages)[0]
+            if (output_format, lang) not in outputs:
+                return self.send_error(404, "Language not available",
+                                       "Language " + lang + " not available, use one of " +
+                                       ', '.join(languages))
+            content, etag = outputs[(output_format, lang)]
+
+            if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPES.get(output_format, 'application/json'))
+            self.send_header('Content-Length', str(len(content)))
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'max-age={0:.0f}'.format(SERVER["max_age"]))
+            self.end_headers()
+            self.wfile.write(content)
+
+    return PublicationListHandler
+
+
+def serve(config, host='127.0.0.1', port=8000, max_age=None):
+    """Serve the publication lists of the 'batch_researchers' until interrupted.
+        ADS must be set up first (see create_publist.setup_ads).
+
+    Parameters
+    ----------
+    config: dict, content of the yaml config file
+    host: string, address of the server
+    port: int
+    max_age: float or `None`, seconds during which a rendered list is served from memory. Default SERVER["max_age"]
+    """
+    if max_age is not None:
+        SERVER["max_age"] = max_age
+    # the lists are always read from the local corpus (refreshed when older than its max_age_days)
+    configure_corpus_cache(enabled=True)
+
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    print("Serving the publication lists on http://{0}:{1}/researcher/<name>/publications.html".format(host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,110 @@
+import time
+import random
+from ads_scheduler import SCHEDULER_STATS, quota_wait_time
+from corpus_cache import configure_corpus_cache
+from create_publist import build_publication_list
+
+# Long running mode keeping the publication lists of the 'batch_researchers' of the yaml file up to date
+# (e.g. for a lab website). At each cycle the local corpus of each researcher is refreshed incrementally
+# (only the records entered in ADS since the last cycle, see corpus_cache.py), then the lists are written
+# again: a latex or html file is only replaced if its content changed, and a pdf is only compiled if its
+# latex file changed, so the published files are always fresh without anyone waiting on ADS.
+# Cycles are spaced by interval_hours with a random jitter (several instances do not hit ADS at the same
+# time), each cycle uses at most cycle_budget requests and we wait for the reset of the daily quota
+# when it is close to exhausted.
+
+WATCH = {
+    "interval_hours": 6.,  # time between two cycles
+    "jitter": 0.2,  # the interval varies randomly by +- this fraction
+    "cycle_budget": 200,  # maximum number of ADS requests per cycle, the researchers not refreshed go first next time
+    "quota_margin": 50,  # a cycle stops when only ads_scheduler reserve + quota_margin requests remain
+}
+
+
+def next_cycle_wait(interval_hours, jitter):
+    """Time before the next cycle, with a random jitter
+
+    Returns
+    ------------
+    wait: float, in seconds
+    """
+    return interval_hours * 3600 * (1 + random.uniform(-jitter, jitter))
+
+
+def refresh_researcher(researcher,
+                       config,
+                       output_dir,
+                       compile_pdf=True,
+                       show_metrics=False,
+                       metrics_source='local',
+                       export_formats=None,
+                       write_html=False):
+    """Write the publication lists of one researcher of the 'batch_researchers' key, see publist_cli.run_batch.
+        export_formats and write_html apply to all the researchers, in addition to their own options.
+    """
+    build_publication_list(researcher["name"],
+                           years=None if researcher.get("years") is None else tuple(researcher["years"]),
+                           french=researcher.get("french", False),
+                           languages=researcher.get("languages"),
+                           Number_authors_displayed=researcher.get("Number_authors_displayed", 3),
+                           phd_sec=researcher.get("phd_sec", False),
+                           add_pub_manually=researcher.get("add_pub_manually", config["add_pub_manually"]),
+                           output_dir=output_dir,
+                           compile_pdf=compile_pdf,
+                           show_metrics=show_metrics,
+                           metrics_source=metrics_source,
+                           export_formats=export_formats or researcher.get("export_formats"),
+                           write_html=write_html or researcher.get("html", False))
+
+
+def watch(config, output_dir, cycles=None, list_options=None, **options):
+    """Refresh the publication lists of all the researchers of the 'batch_researchers' key, forever.
+        ADS must be set up first (see create_publist.setup_ads).
+
+    Parameters
+    ----------
+    config: dict, content of the yaml config file
+    output_dir: string, directory of the lists
+    cycles: int or `None`, number of cycles, None to never stop
+    list_options: dict or `None`, options of the lists (compile_pdf, show_metrics, metrics_source, export_formats,
+        write_html), see refresh_researcher
+    options: see WATCH for the available keys, the default values are in the 'watch' key of the yaml file
+    """
+    watch_options = dict(WATCH)
+    watch_options.update(config.get("watch", dict()))
+    watch_options.update(options)
+
+    # every cycle refreshes the corpus, the full refresh keeps its own period
+    configure_corpus_cache(enabled=True, max_age_days=0)
+
+    pending = list(config["batch_researchers"])
+    cycle = 0
+    while cycles is None or cycle < cycles:
+        cycle += 1
+        requests_start = SCHEDULER_STATS["requests"]
+        wait = next_cycle_wait(watch_options["interval_hours"], watch_options["jitter"])
+
+        refreshed = list()
+        for researcher in pending:
+            if SCHEDULER_STATS["requests"] - requests_start >= watch_options["cycle_budget"]:
+                break
+            quota_wait = quota_wait_time(margin=watch_options["quota_margin"])
+            if quota_wait > 0:
+                wait = max(wait, quota_wait)
+                break
+            try:
+                refresh_researcher(researcher, config, output_dir, **(list_options or dict()))
+            except Exception as error:
+                # the other researchers are still refreshed, this one is retried at the next cycle
+                print("Refresh of " + researcher["name"] + " failed: " + str(error))
+                continue
+            refreshed.append(researcher)
+
+        # the researchers not refreshed (budget, quota, error) go first at the next cycle
+        pending = [researcher for researcher in pending if researcher not in refreshed] + refreshed
+        print("Cycle {0}: {1}/{2} researchers refreshed with {3} ADS requests".format(
+            cycle, len(refreshed), len(pending), SCHEDULER_STATS["requests"] - requests_start))
+
+        if cycles is None or cycle < cycles:
+            print("Next cycle at " + time.ctime(time.time() + wait))
+            time.sleep(wait)
@@ -1,21 +1,68 @@
 import os
-import numpy as np
+import time
 import ads
-from pylatexenc.latexencode import utf8tolatex
-from unidecode import unidecode
-from create_publist import clean_string, check_ads_token, is_name_in_first_authors
-import pandas as pd
-import matplotlib.pyplot as plt
+import requests
+from lab_affiliations import paper_labs, save_affiliation_cache, affiliation_cache_report
+from create_publist import clean_string, is_name_in_first_authors, ads_query_filters, setup_ads, utf8tolatex
+from ads_scheduler import scheduled, quota_report
+from bibliometrics import paper_citation_count
+from profiling import profile_stage, record_papers
+from lazy_loads import link_papers
+from abstract_index import index_papers, indexed_bibcodes, open_abstract_index
+from abstract_index import papers_on_topic as papers_on_topic_in_index
 import yaml
-import six
 import csv
 import random
-import pickle
+import itertools
+import json
+import tempfile
+
+# numpy, pandas, matplotlib, six and pickle are imported in the functions that use them
+# so that importing this module (e.g. from publist_cli.py) stays fast
 
 all_papers = list()
 
+# fields of the ADS records needed by each stage of the group analysis. The harvest of all the authors
+# only requests the 'harvest' fields, the other ones are fetched once per paper for the papers that
+# are kept (see fetch_paper_details)
+STAGE_FIELDS = {
+    'harvest': ['bibcode', 'year', 'author', 'citation_count'],  # doublons, author positions, metrics
+    'topic': ['title', 'abstract'],  # keywords selection
+    'affiliation': ['aff'],  # french first authors and labs statistics
+    'latex': ['title', 'author', 'year', 'volume', 'page', 'pub', 'identifier', 'doi'],  # create_paper_latex_line_bis
+}
+
+# keywords of the topic of the group analysis, looked for in the titles and abstracts (see is_paper_on_topic)
+KEYWORDS_EXOPLANETS = [
+    'exoplanet', 'extrasolar', 'rocky planets', 'jupiters', "planetary systems", "sub-neptune", "mini-Neptune",
+    "exo-earth", "super-earths", "exozodiacal", "exoearth", 'protoplanet', 'debris disk', 'debris disc', 'companion',
+    'exocomet', 'cheops', "spirou", "habitable planets"
+]
+
+
+def stage_fields(*stages):
+    """Fields needed by a set of stages, see STAGE_FIELDS
+
+    Parameters
+    ----------
+    stages: string, names of the stages
+
+    Returns
+    ------------
+    fields: list of string, each field once
+    """
+    fields = list()
+    for stage in stages:
+        for field in STAGE_FIELDS[stage]:
+            if field not in fields:
+                fields.append(field)
+    return fields
+
 
 def add_manually_publication(paper_list):
+    import numpy as np
+    import six
+
     ## Ajout manuel academie
 
     authors = ['Crida, A.']
@@ -379,12 +426,19 @@ def add_manually_publication(paper_list):
     return paper_list
 
 
+def iter_unique_papers(paper_list):
+    """Papers without doublons (same bibcode), keeping the first one. Works on a stream of papers
+    """
+    seen_bibcodes = set()
+    for paper in paper_list:
+        if paper.bibcode in seen_bibcodes:
+            continue
+        seen_bibcodes.add(paper.bibcode)
+        yield paper
+
+
 def remove_doublons_paper_list(paper_list):
-    ret_list = []
-    for paperi in paper_list:
-        if paperi not in ret_list:
-            ret_list.append(paperi)
-    return ret_list
+    return list(iter_unique_papers(paper_list))
 
 
 def create_paper_latex_line_bis(paper, Number_authors_displayed=3):
@@ -492,15 +546,16 @@ def create_paper_latex_line_bis(paper, Number_authors_displayed=3):
         out += ', ' + arxiv_link
 
     # add number of citations, if available
-    if paper.citation is not None and len(paper.citation) > 1:
-        out += ', ' + str(len(paper.citation)) + ' citations'
-    elif paper.citation is not None and len(paper.citation) == 1:
-        out += ', ' + str(len(paper.citation)) + ' citation'
+    number_citations = paper_citation_count(paper)
+    if number_citations > 1:
+        out += ', ' + str(number_citations) + ' citations'
+    elif number_citations == 1:
+        out += ', ' + str(number_citations) + ' citation'
 
     return out
 
 
-def query_papers_with_abstract(author, refereed=None, years=None, rows=1000, dico_keyz='title'):
+def query_papers_with_abstract(author, refereed=None, years=None, rows=1000, dico_keyz='title', keywords=None):
     """query papers from NASA ADS
 
     Parameters
@@ -512,564 +567,568 @@ def query_papers_with_abstract(author, refereed=None, years=None, rows=1000, dic
     years: tuple, list, or `None`, range of years to query or `None`,
                   default: `None`
     rows: int, maximum number of publications to extract
+    keywords: list of string or `None`, if given only the papers with one of these keywords in their
+                  title or abstract are returned by ADS, see create_publist.ads_topic_query
 
     Returns
     ------------
     list of ads publication objects
     """
     # set query payload
-    if refereed is None:
-        q = ''
-    elif refereed:
-        q = 'property:refereed'
-    elif not refereed:
-        q = 'property:notrefereed'
-    fq = 'database:(physics OR astronomy)'
-    if years is not None:
-        fq += " year:{0}-{1}".format(years[0], years[1])
+    q, fq = ads_query_filters(refereed=refereed, years=years, keywords=keywords)
 
     # perform query
     papers = ads.SearchQuery(author=author, fq=fq, q=q, sort='pubdate', rows=rows, fl=dico_keyz)
 
-    return list(papers)
+    return list(scheduled(papers))
 
-if __name__ == '__main__':
 
-    with open(os.path.join(os.getcwd(), 'config_pub_list_maz.yaml'), 'r') as file:
-        config = yaml.safe_load(file)
-    # first get a token https://ads.harvard.edu/handouts/ADS_API_handout.pdf
-    ads.config.token = config["ads_config_token"]  # replace by your ADS token
+def fetch_paper_details(papers, fields, chunk_size=200):
+    """Complete papers with more fields, in one ADS query per chunk of bibcodes instead
+        of one query per author (or per paper)
 
-    check_ads_token()
-    range_years = (2019, 2023
-                  )  # years to be queried: (start year, end year). If None, all years (careful with old homonyms)
-    french = False  # True French, False English. Default is false (English)
-    Number_authors_displayed = 5
-    keywords_exoplanets = [
-        'exoplanet', 'extrasolar', 'rocky planets', 'jupiters', "planetary systems", "sub-neptune", "mini-Neptune",
-        "exo-earth", "super-earths", "exozodiacal", "exoearth", 'protoplanet', 'debris dis', 'companion', 'exocomet',
-        'cheops', "spirou", "habitable planets"
-    ]
+    Parameters
+    ----------
+    papers: list of ads publication objects, with their bibcode
+    fields: list of string, fields to add, e.g. stage_fields('topic', 'affiliation')
+    chunk_size: int, number of bibcodes per query
 
-    list_authorscsv = pd.read_csv('/Users/jmazoyer/Desktop/papers_exoplanets/Liste_names_exoplanet4.csv', header=1)
+    Returns
+    ------------
+    list of ads publication objects, in the same order, with the new fields (None if ADS has no value)
+    """
+    details = dict()
+    bibcodes = [paper.bibcode for paper in papers]
+    with profile_stage('fetch_paper_details'):
+        for i in range(0, len(bibcodes), chunk_size):
+            chunk = bibcodes[i:i + chunk_size]
+            query = ads.SearchQuery(q='bibcode:({0})'.format(' OR '.join(['"{0}"'.format(bib) for bib in chunk])),
+                                    fl=['bibcode'] + fields,
+                                    rows=len(chunk))
+            for detail in scheduled(query):
+                details[detail.bibcode] = detail._raw
+
+    papers_with_details = list()
+    for paper in papers:
+        dico_publi = {field: None for field in fields}
+        dico_publi.update(paper._raw)
+        dico_publi.update(details.get(paper.bibcode, dict()))
+        papers_with_details.append(ads.search.Article(**dico_publi))
+    return link_papers(papers_with_details)
+
+
+def iter_paper_details(papers, fields, chunk_size=200):
+    """Stream version of fetch_paper_details: the papers are completed and yielded chunk by chunk,
+        so that only one chunk of abstracts is in memory
 
-    author_list = list()
-    for ind in list_authorscsv.index:
-        author_list.append(list_authorscsv["nom"][ind].strip().lower().capitalize() + ", " +
-                           list_authorscsv["prenom"][ind].strip().lower().capitalize())
+    Parameters
+    ----------
+    papers: iterable of ads publication objects, with their bibcode
+    fields: list of string, fields to add
+    chunk_size: int, number of bibcodes per query
 
-    author_list.sort()
+    Yields
+    ------------
+    ads publication object with the new fields
+    """
+    chunk = list()
+    for paper in papers:
+        chunk.append(paper)
+        if len(chunk) == chunk_size:
+            yield from fetch_paper_details(chunk, fields, chunk_size=chunk_size)
+            chunk = list()
+    if len(chunk) > 0:
+        yield from fetch_paper_details(chunk, fields, chunk_size=chunk_size)
 
-    # indices_here = random.sample(range(0, 175), 20)
-    # author_list = [author_list[i] for i in indices_here]
 
-    # author_list = ["Grießmeier, Jean-Mathias", "Fouqué, Pascal","mazoyer, johan", "lagrange, anne-marie"]
-    # author_list = ["mazoyer, johan"]
+def slim_paper(paper, fields):
+    """Copy of a paper with only some fields (None if the paper does not have it) and its id, to drop
+        what the next stages do not need, e.g. the abstract once the topic is checked
 
-    dico_keyz = [
-        'title', 'author', 'year', 'volume', 'page', 'pub', 'identifier', 'citation', 'doi', 'abstract', 'grant', 'aff',
-        "bibcode", "property"
-    ]
+    Parameters
+    ----------
+    paper: ads publication object
+    fields: list of string
 
-    # all_authors_paper = list()
-    # for author_name in author_list:
-    #     papers = query_papers_with_abstract(author_name, years=range_years, refereed=True, dico_keyz=dico_keyz)
-    #     all_authors_paper.extend(papers)
+    Returns
+    ------------
+    ads publication object
+    """
+    # the id is kept: a field that was not kept can still be loaded (see lazy_loads.py)
+    return ads.search.Article(**{field: paper._raw.get(field) for field in ['id'] + [f for f in fields if f != 'id']})
 
-    # all_authors_paper = remove_doublons_paper_list(all_authors_paper)
 
-    # with open('/Users/jmazoyer/Desktop/papers_exoplanets/paper_list_refered_dictionnary.pkl', 'wb') as f:
-    #     pickle.dump(all_authors_paper, f)
+def is_paper_on_topic(paper, keywords):
+    """True if one of the keywords is in the title or the abstract of the paper (case insensitive, as
+        the abstract index)
+    """
+    keywords = [keyword.lower() for keyword in keywords]
+    if any(keyword in paper.title[0].lower() for keyword in keywords):
+        return True
+    if paper.abstract is not None:
+        return any(keyword in paper.abstract.lower() for keyword in keywords)
+    return False
 
-    with open('/Users/jmazoyer/Desktop/papers_exoplanets/paper_list_refered_dictionnary.pkl', 'rb') as f:
-        all_authors_paper = pickle.load(f)
 
-    # all_authors_non_refered_paper = list()
-    # for author_name in author_list:
-    #     papers = query_papers_with_abstract(author_name, years=range_years, refereed=False, dico_keyz=dico_keyz)
-    #     all_authors_non_refered_paper.extend(papers)
+def is_french_affiliation(affiliation):
+    """True if an affiliation is in France
+    """
+    return 'france' in affiliation.lower()
 
-    # all_authors_non_refered_paper = remove_doublons_paper_list(all_authors_non_refered_paper)
 
-    # with open('/Users/jmazoyer/Desktop/papers_exoplanets/paper_list_non_refered_dictionnary.pkl', 'wb') as f:
-    #     pickle.dump(all_authors_non_refered_paper, f)
+def select_papers_on_topic(papers, keywords, kept_fields):
+    """Stage of the group pipeline: keep the papers on the topic, with only the fields used after
 
-    with open('/Users/jmazoyer/Desktop/papers_exoplanets/paper_list_non_refered_dictionnary.pkl', 'rb') as f:
-        all_authors_non_refered_paper = pickle.load(f)
+    Parameters
+    ----------
+    papers: iterable of ads publication objects, with title and abstract
+    keywords: list of string
+    kept_fields: list of string, fields of the papers passed to the next stages
 
-    # all_authors_conf_paper = list()
-    # for paper in all_authors_non_refered_paper:
+    Yields
+    ------------
+    ads publication object
+    """
+    for paper in papers:
+        if is_paper_on_topic(paper, keywords):
+            yield slim_paper(paper, kept_fields)
 
-    #     if not "ARTICLE" in paper.property:
-    #         continue
 
-    #     if 'SPIE' in paper.bibcode:
-    #         print(paper.author[0], paper.year, paper.pub)
-    #         all_authors_paper.append(paper)
+def index_paper_abstracts(connection, papers, chunk_size=200):
+    """Add to the abstract index the papers not indexed yet. Their titles and abstracts are queried by chunks of
+        bibcodes, the papers already indexed (previous runs) cost no ADS query.
 
-    suppr_manuel_bib = [
-        "2021NatAs...5..345S", "2021A&A...654A..83S", "2023A&A...671A..96M", "2019A&A...623A.117K",
-        "2019A&A...623A.116K", "2020A&A...643A.115B", "2022A&A...667A.111K", "2019A&A...622A.164G",
-        "2022A&A...665A..32D", "2023MNRAS.518.3211S", "2021AJ....161..284M", "2020AJ....160..112P", "2020AJ....160....8E"
-    ]
+    Parameters
+    ----------
+    connection: sqlite3.Connection, see abstract_index.open_abstract_index
+    papers: list of ads publication objects, with their bibcode
+    chunk_size: int, number of bibcodes per query
 
-    triage_papers_kw = list()
-    triage_papers_kw_firstauthors = list()
+    Returns
+    ------------
+    number_added: int
+    """
+    already_indexed = indexed_bibcodes(connection)
+    with profile_stage('abstract_index_update'):
+        return index_papers(
+            connection,
+            iter_paper_details((paper for paper in papers if paper.bibcode not in already_indexed),
+                               stage_fields('topic'),
+                               chunk_size=chunk_size))
 
-    for paper in all_authors_paper:
-        # print(paper.citation)
-        # asd
-        if paper.bibcode in suppr_manuel_bib:
-            continue
 
-        kw_bool = False
-        for keyword_in_abstract in keywords_exoplanets:
-            if keyword_in_abstract in paper.title[0].lower():
-                kw_bool = True
+def open_latex_spool():
+    """Latex lines of the group list, written on disk as the papers are streamed: one temporary file per year
 
-        if paper.abstract is not None:
-            for keyword_in_abstract in keywords_exoplanets:
-                if keyword_in_abstract in paper.abstract.lower():
-                    kw_bool = True
+    Returns
+    ------------
+    spool: dict, year -> temporary file, see spool_latex_line
+    """
+    return dict()
 
-        if not kw_bool:
-            continue
 
-        triage_papers_kw.append(paper)
+def spool_latex_line(spool, year, latex_line, bibcode=None):
+    """Add a latex line to the spool
 
-        afil_first_authors = ''
-        for afil in paper.aff[0:Number_authors_displayed]:
-            afil_first_authors += ' ' + afil.lower()
+    Parameters
+    ----------
+    spool: dict, see open_latex_spool
+    year: string
+    latex_line: string
+    bibcode: string or `None`, None for a paper not in ADS
+    """
+    if year not in spool:
+        spool[year] = tempfile.TemporaryFile('w+', encoding='utf-8')
+    spool[year].write(json.dumps([bibcode, latex_line]) + '\n')
 
-        if 'france' not in afil_first_authors:
-            continue
 
-        # author_bool = False
-        # for researcher_name in author_list:
-        #     if is_name_in_first_authors(researcher_name, paper.author, Number_authors_displayed):
-        #         author_bool = True
-        # if not author_bool:
-        #     continue
+def iter_spooled_lines(spool):
+    """Lines of the spool by year, sorted within a year (only the lines of one year are in memory)
 
-        triage_papers_kw_firstauthors.append(paper)
+    Yields
+    ------------
+    (year, bibcode or None, latex line)
+    """
+    for year in sorted(spool):
+        spool[year].seek(0)
+        lines = sorted((json.loads(line) for line in spool[year]), key=lambda line: line[1])
+        for bibcode, latex_line in lines:
+            yield year, bibcode, latex_line
 
-    # ajout manuel papers in ADS
 
-    ## ici, ajouter le bib pour AJOUTER des papiers
-    ajout_manuel_bib = [
-        "2019BAAS...51g.101M", '2020arXiv200305714B', "2022NatAs...6..537B", "2021CeMDA.133...39P", "2021ExA....51..845M"
-    ]
-    for bib in ajout_manuel_bib:
-        papers = list(ads.SearchQuery(bibcode=bib, fl=dico_keyz))
-        triage_papers_kw.extend(papers)
-        triage_papers_kw_firstauthors.extend(papers)
+def close_latex_spool(spool):
+    """Delete the temporary files of the spool
+    """
+    for year_file in spool.values():
+        year_file.close()
+    spool.clear()
 
-    # ajout manuel papers not in ADS
-    triage_papers_kw_firstauthors = add_manually_publication(triage_papers_kw_firstauthors)
 
-    triage_papers_kw = remove_doublons_paper_list(triage_papers_kw)
-    triage_papers_kw_firstauthors = remove_doublons_paper_list(triage_papers_kw_firstauthors)
+def aggregate_group_statistics(papers, forced_bibcodes=(), Number_authors_displayed=3):
+    """Last stage of the group pipeline: the papers on the topic are consumed one by one and
+        only the statistics are kept (no paper list). The latex lines go to temporary files and
+        the networks keep only the co-occurrence counts, so nothing kept here grows with each paper.
 
-    group_publication = list()
-    group_year_publication = list()
-    group_citation_publication = list()
+    Parameters
+    ----------
+    papers: iterable of ads publication objects, with the 'affiliation' and 'latex' fields (see STAGE_FIELDS)
+    forced_bibcodes: list of string, papers listed even without a french affiliation in the first authors
+    Number_authors_displayed: int, number of authors printed, also the first authors checked for a
+        french affiliation
 
-    for paper in triage_papers_kw_firstauthors:
-        group_publication.append(
-            clean_string(create_paper_latex_line_bis(paper, Number_authors_displayed=Number_authors_displayed)))
-        group_year_publication.append(paper.year)
+    Returns
+    ------------
+    dict with keys
+        'latex_lines': spool of the latex lines (and bibcodes) of the papers with a french affiliation in the
+            first authors, see open_latex_spool. Close it with close_latex_spool
+        'french_papers': number of papers with at least one french affiliation
+        'papers_per_year': Counter, year -> number of papers with a french affiliation
+        'labs': Counter, lab -> number of papers
+        'labs_per_year': dict, year -> Counter of the labs
+        'coauthor_network': co-authors of all the papers, see coauthor_network.network_accumulator
+        'lab_network': labs of the papers with a french affiliation, see coauthor_network.network_accumulator
+    """
+    from collections import Counter
+    from coauthor_network import normalise_authors, network_accumulator, add_network_paper
+
+    statistics = {
+        'latex_lines': open_latex_spool(),
+        'french_papers': 0,
+        'papers_per_year': Counter(),
+        'labs': Counter(),
+        'labs_per_year': dict(),
+        'coauthor_network': network_accumulator(),
+        'lab_network': network_accumulator(),
+    }
+    normalised_names = dict()
+
+    with profile_stage('group_pipeline'):
+        for paper in papers:
+            record_papers()
+            add_network_paper(statistics['coauthor_network'], normalise_authors(paper.author, normalised_names))
+
+            if paper.bibcode in forced_bibcodes or any(
+                    is_french_affiliation(afil) for afil in paper.aff[0:Number_authors_displayed]):
+                spool_latex_line(
+                    statistics['latex_lines'], paper.year,
+                    clean_string(create_paper_latex_line_bis(paper, Number_authors_displayed=Number_authors_displayed)),
+                    bibcode=paper.bibcode)
+
+            french_afil = [afil for afil in paper.aff if is_french_affiliation(afil)]
+            if len(french_afil) == 0:
+                continue
+
+            # labs of the french affiliations, see lab_affiliations.LAB_RULES (cached between runs)
+            labs = paper_labs(french_afil)
+            statistics['french_papers'] += 1
+            statistics['papers_per_year'][paper.year] += 1
+            statistics['labs'].update(labs)
+            statistics['labs_per_year'].setdefault(paper.year, Counter()).update(labs)
+            add_network_paper(statistics['lab_network'], labs)
+
+    save_affiliation_cache()
+    return statistics
+
+
+def save_harvest_checkpoint(checkpoint, checkpoint_file):
+    """Save the harvest checkpoint. We write in a temporary file first so that the checkpoint is never corrupted
+    """
+    import pickle
 
-        if paper.citation is not None:
-            group_citation_publication.append(len(paper.citation))
-        else:
-            group_citation_publication.append(0)
+    with open(checkpoint_file + '.tmp', 'wb') as f:
+        pickle.dump(checkpoint, f)
+    os.replace(checkpoint_file + '.tmp', checkpoint_file)
 
-    # group_publication_order = [x if numcit > 10 else "" for year, numcit , x in sorted(zip(group_year_publication,group_citation_publication, group_publication))]
-    # group_publication_order = [x for year, numcit , x in sorted(zip(group_year_publication,group_citation_publication, group_publication))]
-    group_publication_order = [x for _, x in sorted(zip(group_year_publication, group_publication))]
 
-    with open('/Users/jmazoyer/Desktop/papers_exoplanets/Liste_papiers_exoplanet.txt', 'w') as f:
-        for i in group_publication_order:
-            f.write(i + '\n')
-            f.write('\n')
+def load_harvest_checkpoint(checkpoint_file):
+    """Papers of each author saved in a harvest checkpoint (see harvest_authors)
 
-    # ############################################
-    # ## Extract affiliation
-    # ###########################################
+    Returns
+    ------------
+    dict, author name -> list of ads publication objects
+    """
+    import pickle
+
+    with open(checkpoint_file, 'rb') as f:
+        return pickle.load(f)['papers']
+
+
+def harvest_authors(author_list,
+                    checkpoint_file,
+                    refereed=None,
+                    years=None,
+                    dico_keyz='title',
+                    keywords=None,
+                    max_retries=5,
+                    backoff=2.,
+                    max_connections=1):
+    """Query the papers of all the authors of a list, with a checkpoint on disk after each author.
+        If the harvest stops (timeout, quota...), running it again with the same checkpoint_file
+        resumes after the last completed author. An author whose query keeps failing after max_retries
+        is skipped (and not checkpointed, so it is retried on the next run).
 
-    # print(len(all_papers), len(paper_uniq))
-    total_apper_with_french_Afil = 0
+    Parameters
+    ----------
+    author_list: list of string, authors names
+    checkpoint_file: string, pickle file where completed authors are saved
+    refereed: boolean or `None`, see query_papers_with_abstract
+    years: tuple, list, or `None`, range of years to query or `None`
+    dico_keyz: list of string, fields returned by ADS
+    keywords: list of string or `None`, if given only the papers on this topic are harvested,
+                see query_papers_with_abstract
+    max_retries: int, number of retries for transient failures of an author query
+    backoff: float, base of the exponential backoff between retries, in seconds
+    max_connections: int, if > 1, authors are queried concurrently (at most max_connections at once) with
+                one async client (ads_async) for the whole list, each author is checkpointed as soon as its
+                query completes. Authors that failed are then retried one by one.
 
-    french_afil_Acro_allpaper = list()
+    Returns
+    ------------
+    list of ads publication objects, without doublons
+    """
 
-    info_papers = dict()
-    info_papers["year"] = list()
-    info_papers["afil_acro"] = list()
-    info_papers["title"] = list()
-    info_papers["first_auth"] = list()
+    import pickle
 
-    # french_afil_Acro_allpaper_peryear = dict()
+    harvest_parameters = {'refereed': refereed, 'years': years, 'dico_keyz': dico_keyz}
+    if keywords is not None:
+        # not added otherwise, so that the checkpoints made without topic filter are still valid
+        harvest_parameters['keywords'] = list(keywords)
 
-    year_allpaper = list()
+    checkpoint = {'parameters': harvest_parameters, 'papers': dict()}
+    if os.path.exists(checkpoint_file):
+        with open(checkpoint_file, 'rb') as f:
+            previous_checkpoint = pickle.load(f)
+        if previous_checkpoint['parameters'] == harvest_parameters:
+            checkpoint = previous_checkpoint
+            print(f"Resuming harvest: {len(checkpoint['papers'])}/{len(author_list)} authors already done")
+        else:
+            print(f"Checkpoint {checkpoint_file} was made with other query parameters, starting again")
+
+    if max_connections > 1:
+        from ads_async import harvest_authors_concurrently
+
+        def checkpoint_author(author_name, papers):
+            if not isinstance(papers, Exception):
+                checkpoint['papers'][author_name] = papers
+                save_harvest_checkpoint(checkpoint, checkpoint_file)
+
+        harvest_authors_concurrently(
+            [author_name for author_name in author_list if author_name not in checkpoint['papers']],
+            refereed=refereed,
+            years=years,
+            dico_keyz=dico_keyz,
+            keywords=keywords,
+            max_connections=max_connections,
+            author_done=checkpoint_author)
+
+    failed_authors = list()
+    for author_name in author_list:
+        if author_name in checkpoint['papers']:
+            continue
 
-    for toto, paper in enumerate(triage_papers_kw):
+        for attempt in range(max_retries + 1):
+            try:
+                papers = query_papers_with_abstract(author_name,
+                                                    years=years,
+                                                    refereed=refereed,
+                                                    dico_keyz=dico_keyz,
+                                                    keywords=keywords)
+                break
+            except (requests.exceptions.RequestException, ads.exceptions.APIResponseError) as e:
+                if attempt == max_retries:
+                    papers = None
+                    break
+                wait = backoff**(attempt + 1)
+                print(f"Query for {author_name} failed ({e}), retrying in {wait:.0f} s")
+                time.sleep(wait)
+
+        if papers is None:
+            print(f"Query for {author_name} failed {max_retries + 1} times, skipping this author")
+            failed_authors.append(author_name)
+            continue
 
-        french_afil = list()
-        for afil in paper.aff:
-            if "france" in afil.lower():
-                french_afil.append(afil)
+        checkpoint['papers'][author_name] = papers
+        save_harvest_checkpoint(checkpoint, checkpoint_file)
 
-        if len(french_afil) > 0:
-            total_apper_with_french_Afil += 1
-            year_allpaper.append(paper.year)
-        else:
-            continue
+    if len(failed_authors) > 0:
+        print(f"{len(failed_authors)} authors could not be harvested, run again to retry: {failed_authors}")
 
-        french_afil_Acro_this_paper = list()
-
-        for afil_i in french_afil:
-
-            afil_i = afil_i.lower()
-            afil_i = unidecode(afil_i).replace("'", "").replace("-", " ").replace("`", "")
-            afil_i = afil_i.replace("d astrophysique", "dastrophysique")
-
-            not_found_any_afil = True
-            if any(laboname in afil_i for laboname in ["onera"]):
-                french_afil_Acro_this_paper.append("ONERA")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i
-                   for laboname in ["lesia", "laboratoire detudes spatiales et dinstrumentation en astrophysique"]):
-                french_afil_Acro_this_paper.append("LESIA")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i
-                   for laboname in ["laboratoire de physique et chimie de lenvironnement et de lespace", "lpc2e"]):
-                french_afil_Acro_this_paper.append("LPC2E")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["laboratoire de physique de lens"]):
-                french_afil_Acro_this_paper.append("Laboratoire de Physique de l'ENS")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in [
-                    "ipag", "institut de planetologie et dastrophysique de grenoble",
-                    "institute of planetology and astrophysics of grenoble", "laboratoire dastrophysique de grenoble",
-                    "institut de planetologie et astrophysique de grenoble"
-                    "institut de planetologie et dastrophysique, university of grenoble",
-                    "institut de planetologie et astrophysique, de grenoble"
-            ]):
-                french_afil_Acro_this_paper.append("IPAG")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in
-                   ["cral", "centre de recherche astrophysique de lyon", "centre de recherche astrophysique, de lyon"]):
-                french_afil_Acro_this_paper.append("CRAL")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["observatoire astronomique de strasbourg"]):
-                french_afil_Acro_this_paper.append("ObAS")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["lagrange"]):
-                french_afil_Acro_this_paper.append("Lagrange")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["institut fresnel"]):
-                french_afil_Acro_this_paper.append("Institut Fresnel")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in [
-                    "iap", "institut dastrophysique de paris", "institute dastrophysique de paris",
-                    "institut dastrophysique de pari s"
-            ]):
-                french_afil_Acro_this_paper.append("IAP")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["lam,", "laboratoire dastrophysique de marseille"]):
-                french_afil_Acro_this_paper.append("LAM")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i
-                   for laboname in ["lmd", "laboratoire de meteorologie dynamique", "lab. de meteorologie dynamique"]):
-                french_afil_Acro_this_paper.append("LMD")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["ias, ", "institut dastrophysique spatiale"]):
-                french_afil_Acro_this_paper.append("IAS")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["observatoire de haute provence"]):
-                french_afil_Acro_this_paper.append("OHP")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in
-                   ["lab,", "laboratoire dastrophysique de bordeaux", "laboratory of astrophysics at bordeaux"]):
-                french_afil_Acro_this_paper.append("LAB")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in
-                   ["lerma", "laboratoire detudes du rayonnement et de la matiere en astrophysique et atmospheres"]):
-                french_afil_Acro_this_paper.append("LERMA")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i
-                   for laboname in ["irap", "institut de recherche en astrophysique et planetologie"]):
-                french_afil_Acro_this_paper.append("IRAP")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i
-                   for laboname in ["laboratoire interuniversitaire des systemes atmospheriques", "lisa"]):
-                french_afil_Acro_this_paper.append("LISA")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["piim", "physique des interactions ioniques et moleculaires"]):
-                french_afil_Acro_this_paper.append("PIIM")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in [
-                    "ipgp", "institut de physique du globe de paris", "institut de physique du globe",
-                    "paris globe institute of physics"
-            ]):
-                french_afil_Acro_this_paper.append("IPGP")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i
-                   for laboname in ["imcce", "imcee", "institut de mecanique celeste et de calcul des ephemerides"]):
-                french_afil_Acro_this_paper.append("IMCCE")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["institut doptique graduate school"]):
-                french_afil_Acro_this_paper.append("IOGS")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["laboratoire univers et theories", "luth"]):
-                french_afil_Acro_this_paper.append("LUTH")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["institut de radioastronomie millimetrique", "iram"]):
-                french_afil_Acro_this_paper.append("IRAM")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["maison de la simulation", "house of simulation"]):
-                french_afil_Acro_this_paper.append("MdlS")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in
-                   ["irfu", "laboratoire aim", "aim,", "astrophysique, instrumentation et modelisation"]):
-                french_afil_Acro_this_paper.append("CEA / AIM")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["laboratoire dannecy le vieux de physique theorique", "lapth"]):
-                french_afil_Acro_this_paper.append("LAPTh")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in [
-                    "utinam",
-                    "univers, temps-frequence, interfaces, nanostructures, atmosphere et environnement, molecules"
-            ]):
-                french_afil_Acro_this_paper.append("UTINAM")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["laboratoire univers et particules de montpellier", "lupm"]):
-                french_afil_Acro_this_paper.append("LUPM")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in [
-                    "institut superieur de laeronautique et de lespace", "institut superieur en aeronautique et espace",
-                    "isae"
-            ]):
-                french_afil_Acro_this_paper.append("ISAE")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["canada-france-hawaii telescope", "cfht"]):
-                french_afil_Acro_this_paper.append("CFHT")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["laboratoire de planetologie de nantes"]):
-                french_afil_Acro_this_paper.append("Laboratoire de planétologie de Nantes")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["crpg", "centre de recherches petrographiques et geochimiques"]):
-                french_afil_Acro_this_paper.append("CRPG")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["gepi", "galaxies, etoiles, physique et instrumentation"]):
-                french_afil_Acro_this_paper.append("GEPI")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["lgl", "umr 5276"]):
-                french_afil_Acro_this_paper.append("Laboratoire de Géologie de Lyon")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["syrte", "systemes de reference temps espace"]):
-                french_afil_Acro_this_paper.append("SYRTE")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in [
-                    "latmos", "laboratoire atmospheres, observations spatiales",
-                    "laboratoire atmospheres, milieux, observations spatiales",
-                    "laboratoire atmospheres, milieux et observations spatiales"
-            ]):
-                french_afil_Acro_this_paper.append("LATMOS")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["institut lumiere matiere"]):
-                french_afil_Acro_this_paper.append("Institut Lumière Matière")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["canada france hawaii telescope", "cfht"]):
-                french_afil_Acro_this_paper.append("CFHT")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["laboratoire reactions et genie des procedes", "lrgp"]):
-                french_afil_Acro_this_paper.append("LRGP")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["laboratoire de planetologie et geosciences"]):
-                french_afil_Acro_this_paper.append("Laboratoire de planétologie et Géosciences")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["geops", "geosciences paris saclay"]):
-                french_afil_Acro_this_paper.append("GEOPS")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["institut des sciences moleculaires"]):
-                french_afil_Acro_this_paper.append("Institut des Sciences Moléculaires")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["lapp", "laboratoire dannecy de physique des particules"]):
-                french_afil_Acro_this_paper.append("LAPP")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in [
-                    "groupe de spectrometrie moleculaire et atmospherique",
-                    "groupe de spectroscopie moleculaire et atmospherique", "gsma"
-            ]):
-                french_afil_Acro_this_paper.append("GSMA")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["laboratoire de geologie de lyon"]):
-                french_afil_Acro_this_paper.append("GSMA")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["laboratoire de planetologie et geodynamique"]):
-                french_afil_Acro_this_paper.append("Laboratoire de Planetologie et Géodynamique")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["institut de chimie physique", "laboratoire de chimie physique"]):
-                french_afil_Acro_this_paper.append("Institut de Chimie Physique")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in [
-                    "institut de mineralogie, de physique des materiaux et de cosmochimie",
-                    "institut de mineralogie, physique des materiaux et cosmochimie", "impmc"
-            ]):
-                french_afil_Acro_this_paper.append("IMPMC")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["institut des sciences de la terre dorleans", "isto"]):
-                french_afil_Acro_this_paper.append("ISTO")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i for laboname in ["astroparticule et cosmologie"]):
-                french_afil_Acro_this_paper.append("APC")
-                not_found_any_afil = False
-
-            if any(laboname in afil_i
-                   for laboname in ["observatoire des baronnies provencales", "baronnies provencales observatory"]):
-                french_afil_Acro_this_paper.append("Observatoire des Baronnies Provencales")
-                not_found_any_afil = False
+    all_papers_authors = list()
+    for author_name in author_list:
+        all_papers_authors.extend(checkpoint['papers'].get(author_name, list()))
 
-            if any(laboname in afil_i for laboname in [
-                    "lab sticc", "agenium", "pixyl", "european space agency", "mesocentre de calcul de franche comte",
-                    "mesocentre de franche comte", "silios", "thales", "laboratoire de physique des deux infinis",
-                    "centre de biophysique moleculaire", "centre lasers intenses et applications",
-                    "institut de mecanique des fluides de toulouse", "amateur astronomer 101"
-            ]):
-                french_afil_Acro_this_paper.append("Irrelevant")
-                not_found_any_afil = False
+    return remove_doublons_paper_list(all_papers_authors)
 
-            french_afil_Acro_this_paper = list(set(french_afil_Acro_this_paper))
-
-            # if not_found_any_afil:
-            #     print(afil_i)
-        french_afil_Acro_allpaper += french_afil_Acro_this_paper
-
-        info_papers["year"].append(paper.year)
-        info_papers["afil_acro"].append(french_afil_Acro_this_paper)
-        info_papers["title"].append(paper.title)
-        info_papers["first_auth"].append(paper.author[0])
 
-        # french_afil_Acro_allpaper_peryear[str(paper.year)] += french_afil_Acro_this_paper
-
-        # print(toto, len(paper.aff), len(french_afil), len(french_afil_Acro_this_paper))
+def main(config_file='config_pub_list_maz.yaml'):
+    """Group analysis: harvest the papers of a list of authors, select the ones on a topic
+        and make statistics per french lab. Paths are hardcoded in this function, adapt them.
 
-    # first to identify all institution papers
-    keys, counts = np.unique(french_afil_Acro_allpaper, return_counts=True)
-
-    # print(french_afil_Acro_allpaper)
-    big_lab_keys = []
-    big_lab_counts = []
+    Parameters
+    ----------
+    config_file: string, yaml config file (ads token, scheduler options)
+    """
+    import pandas as pd
 
-    #sort by citation to identify biggest lab
-    sorted_keys = [y for _, y in sorted(zip(counts, keys))]
-    sorted_counts = [x for x, _ in sorted(zip(counts, keys))]
+    with open(os.path.join(os.getcwd(), config_file), 'r') as file:
+        config = yaml.safe_load(file)
+    # first get a token https://ads.harvard.edu/handouts/ADS_API_handout.pdf
+    setup_ads(config)
+    range_years = (2019, 2023
+                  )  # years to be queried: (start year, end year). If None, all years (careful with old homonyms)
+    french = False  # True French, False English. Default is false (English)
+    Number_authors_displayed = 5
+    keywords_exoplanets = KEYWORDS_EXOPLANETS
 
-    if 'Irrelevant' in sorted_keys:
-        index_irr = sorted_keys.index('Irrelevant')
-        sorted_keys.pop(index_irr)
-        sorted_counts.pop(index_irr)
+    list_authorscsv = pd.read_csv('/Users/jmazoyer/Desktop/papers_exoplanets/Liste_names_exoplanet4.csv', header=1)
 
-    N_biggest_lab = 12  # we plot only the N bigest labs
+    author_list = list()
+    for ind in list_authorscsv.index:
+        author_list.append(list_authorscsv["nom"][ind].strip().lower().capitalize() + ", " +
+                           list_authorscsv["prenom"][ind].strip().lower().capitalize())
 
-    if len(sorted_keys) < N_biggest_lab:
-        N_biggest_lab = len(sorted_keys)
+    author_list.sort()
 
-    big_lab_keys = sorted_keys[-N_biggest_lab:]
-    big_lab_counts = sorted_counts[-N_biggest_lab:]
+    # indices_here = random.sample(range(0, 175), 20)
+    # author_list = [author_list[i] for i in indices_here]
 
-    #sort by citation to alphabetical order
-    sorted_big_keys = [x for x, _ in sorted(zip(big_lab_keys, big_lab_counts))]
-    sorted_big_counts = [y for _, y in sorted(zip(big_lab_keys, big_lab_counts))]
+    # author_list = ["Grießmeier, Jean-Mathias", "Fouqué, Pascal","mazoyer, johan", "lagrange, anne-marie"]
+    # author_list = ["mazoyer, johan"]
 
-    plt.bar(sorted_big_keys, sorted_big_counts)
-    plt.ylim(0, 100 * (np.ceil(max(big_lab_counts) * 1.2 / 100)))
+    # fields downloaded for all the papers of all the authors: only what the harvest needs (see STAGE_FIELDS)
+    dico_keyz = stage_fields('harvest')
+
+    # if True, ADS only returns the papers with one of the keywords in their title or abstract,
+    # the keywords are still checked below on the downloaded papers
+    topic_filter_in_query = True
+    query_keywords = keywords_exoplanets if topic_filter_in_query else None
+
+    # queries are checkpointed after each author: if the harvest stops, just run again to resume
+    all_authors_paper = harvest_authors(
+        author_list,
+        '/Users/jmazoyer/Desktop/papers_exoplanets/paper_list_refered_checkpoint.pkl',
+        years=range_years,
+        refereed=True,
+        dico_keyz=dico_keyz,
+        keywords=query_keywords)
+
+    # bibliometric indices of all the authors at once, from the papers already harvested (refereed, range_years,
+    # only the papers on the topic if topic_filter_in_query)
+    from bibliometrics import cohort_metrics, write_metrics_csv
+    harvested_papers = load_harvest_checkpoint(
+        '/Users/jmazoyer/Desktop/papers_exoplanets/paper_list_refered_checkpoint.pkl')
+    write_metrics_csv('/Users/jmazoyer/Desktop/papers_exoplanets/metrics_authors.csv',
+                      cohort_metrics(harvested_papers, refereed_per_researcher=harvested_papers))
+
+    # conference papers: the non refereed harvest costs as many queries as the refereed one, only do it
+    # with the selection below ('property' must then be added to dico_keyz)
+    # all_authors_non_refered_paper = harvest_authors(
+    #     author_list,
+    #     '/Users/jmazoyer/Desktop/papers_exoplanets/paper_list_non_refered_checkpoint.pkl',
+    #     years=range_years,
+    #     refereed=False,
+    #     dico_keyz=dico_keyz + ['property'],
+    #     keywords=query_keywords)
+    # all_authors_conf_paper = list()
+    # for paper in all_authors_non_refered_paper:
 
-    plt.xticks(rotation=30, ha='right')
-    plt.title(f"Publications 'exoplanètes' françaises par laboratoire (2019-2023)")
-    plt.text(-0.5, max(sorted_big_counts) * 1.18, "Attention, une même publication est ici comptée plusieurs fois si")
-    plt.text(-0.5, max(sorted_big_counts) * 1.12, "elle inclue des auteurs dans différents laboratoires français.")
-    plt.text(-0.5,
-             max(sorted_big_counts) * 1.06, f"Le nombre de publications réel est de {total_apper_with_french_Afil}.")
+    #     if not "ARTICLE" in paper.property:
+    #         continue
 
-    plt.ylabel('Nombre de publications')
+    #     if 'SPIE' in paper.bibcode:
+    #         print(paper.author[0], paper.year, paper.pub)
+    #         all_authors_paper.append(paper)
 
-    plt.savefig("/Users/jmazoyer/Desktop/papers_exoplanets/publi_par_labo.pdf")
+    suppr_manuel_bib = [
+        "2021NatAs...5..345S", "2021A&A...654A..83S", "2023A&A...671A..96M", "2019A&A...623A.117K",
+        "2019A&A...623A.116K", "2020A&A...643A.115B", "2022A&A...667A.111K", "2019A&A...622A.164G",
+        "2022A&A...665A..32D", "2023MNRAS.518.3211S", "2021AJ....161..284M", "2020AJ....160..112P", "2020AJ....160....8E"
+    ]
 
-    ######## print in csv
+    # ajout manuel papers in ADS
 
-    # for i in range(len(info_papers["year"])):
-    #     afil_acro = info_papers["afil_acro"][i]
-    #     check_publilabo = "LESIA"
-    #     if check_publilabo in afil_acro:
-    #         print(f"{check_publilabo} {info_papers['year'][i]}: {info_papers['first_auth'][i]} , {info_papers['title'][i]}")
+    ## ici, ajouter le bib pour AJOUTER des papiers
+    ajout_manuel_bib = [
+        "2019BAAS...51g.101M", '2020arXiv200305714B', "2022NatAs...6..537B", "2021CeMDA.133...39P", "2021ExA....51..845M"
+    ]
 
-    french_afil_Acro_allpaper_peryear = dict()
-    french_afil_Acro_allpaper_peryear["2023"] = list()
-    french_afil_Acro_allpaper_peryear["2022"] = list()
-    french_afil_Acro_allpaper_peryear["2021"] = list()
-    french_afil_Acro_allpaper_peryear["2020"] = list()
-    french_afil_Acro_allpaper_peryear["2019"] = list()
+    # the papers go through the stages one by one (fetch -> keywords -> french affiliations -> labs -> statistics):
+    # titles, abstracts and affiliations are fetched by chunks and the abstracts are dropped once the topic
+    # is checked. The harvest itself (bibcode, year, authors and citations of all the papers) is a list, from
+    # the checkpoint; after it, the latex lines go to temporary files and only the statistics and the
+    # co-occurrence counts of the networks are kept in memory, not the papers.
+    kept_fields = stage_fields('harvest', 'affiliation', 'latex')
+    papers_kept = (paper for paper in all_authors_paper if paper.bibcode not in suppr_manuel_bib)
+
+    # if True, the keywords are checked in a local full text index of the titles and abstracts (abstract_index.py):
+    # the abstracts are downloaded once for all the runs and changing the keywords only queries the index
+    use_abstract_index = True
+    if use_abstract_index:
+        abstract_index = open_abstract_index()
+        index_paper_abstracts(abstract_index, all_authors_paper)
+        bibcodes_on_topic = papers_on_topic_in_index(abstract_index, keywords_exoplanets)
+        abstract_index.close()
+        papers_on_topic = iter_paper_details((paper for paper in papers_kept if paper.bibcode in bibcodes_on_topic),
+                                             [field for field in kept_fields if field not in dico_keyz])
+    else:
+        papers_on_topic = select_papers_on_topic(
+            iter_paper_details(papers_kept,
+                               [field for field in stage_fields('topic', 'affiliation', 'latex') if field not in dico_keyz]),
+            keywords_exoplanets,
+            kept_fields=kept_fields)
+    # papers added manually are kept whatever their keywords and affiliations
+    papers_added = (slim_paper(paper, kept_fields) for bib in ajout_manuel_bib for paper in scheduled(
+        ads.SearchQuery(bibcode=bib, fl=stage_fields('harvest', 'topic', 'affiliation', 'latex'))))
+
+    statistics = aggregate_group_statistics(iter_unique_papers(itertools.chain(papers_on_topic, papers_added)),
+                                            forced_bibcodes=ajout_manuel_bib,
+                                            Number_authors_displayed=Number_authors_displayed)
+    print(affiliation_cache_report())
 
-    for i, year in enumerate(info_papers["year"]):
-        french_afil_Acro_allpaper_peryear[str(year)] += info_papers['afil_acro'][i]
+    # ajout manuel papers not in ADS
+    for paper in add_manually_publication(list()):
+        spool_latex_line(
+            statistics['latex_lines'], paper.year,
+            clean_string(create_paper_latex_line_bis(paper, Number_authors_displayed=Number_authors_displayed)))
 
-    keys2023, counts2023 = np.unique(french_afil_Acro_allpaper_peryear['2023'], return_counts=True)
-    keys2022, counts2022 = np.unique(french_afil_Acro_allpaper_peryear['2022'], return_counts=True)
-    keys2021, counts2021 = np.unique(french_afil_Acro_allpaper_peryear['2021'], return_counts=True)
-    keys2020, counts2020 = np.unique(french_afil_Acro_allpaper_peryear['2020'], return_counts=True)
-    keys2019, counts2019 = np.unique(french_afil_Acro_allpaper_peryear['2019'], return_counts=True)
+    with open('/Users/jmazoyer/Desktop/papers_exoplanets/Liste_papiers_exoplanet.txt', 'w') as f:
+        for _, _, latex_line in iter_spooled_lines(statistics['latex_lines']):
+            f.write(latex_line + '\n')
+            f.write('\n')
+
+    # the same papers formatted by ADS, in one request (.bib file and biblatex document, see ads_export.py)
+    group_export_formats = ['bibtex']
+    if len(group_export_formats) > 0:
+        from create_publist import export_publication_list
+        export_publication_list('/Users/jmazoyer/Desktop/papers_exoplanets/Liste_papiers_exoplanet',
+                                (bib for _, bib, _ in iter_spooled_lines(statistics['latex_lines']) if bib is not None),
+                                group_export_formats,
+                                refereed_bibcodes=[
+                                    bib for _, bib, _ in iter_spooled_lines(statistics['latex_lines'])
+                                    if bib is not None and bib not in ajout_manuel_bib
+                                ],
+                                languages=['fr'],
+                                Number_authors_displayed=Number_authors_displayed)
+
+    close_latex_spool(statistics['latex_lines'])
+
+    # collaboration networks: co-authors of the topic papers and labs of the french papers (GraphML + csv)
+    from coauthor_network import accumulated_network, write_network
+    write_network('/Users/jmazoyer/Desktop/papers_exoplanets/network_coauthors',
+                  accumulated_network(statistics['coauthor_network']))
+    write_network('/Users/jmazoyer/Desktop/papers_exoplanets/network_labs',
+                  accumulated_network(statistics['lab_network']))
+
+    # figures drawn from the aggregates only, in parallel worker processes. They can be drawn again for other
+    # years or labs without running the analysis: python group_plots.py group_aggregates.json --years 2021 2023
+    from group_plots import save_group_aggregates, group_plot_jobs, render_plots
+    aggregates = save_group_aggregates('/Users/jmazoyer/Desktop/papers_exoplanets/group_aggregates.json', statistics,
+                                       range_years)
+    render_plots(group_plot_jobs(aggregates, '/Users/jmazoyer/Desktop/papers_exoplanets'))
+
+    keys = sorted(statistics['labs'].keys())
+
+    ######## print in csv
 
     f = open('/Users/jmazoyer/Desktop/papers_exoplanets/publi_par_labo.csv', 'w')
 
@@ -1079,56 +1138,22 @@ if __name__ == '__main__':
     # write a row to the csv file
     # writer.writerow(["labo", "2019", "2020", "2021", "2022", "2023"])
 
+    table_years = [str(year) for year in range(range_years[0], range_years[1] + 1)]
     for key in keys:
         if key == "Irrelevant":
             continue
 
-        if key in keys2023:
-            counthere2023 = counts2023[np.where(keys2023 == key)][0]
-        else:
-            counthere2023 = 0
-
-        if key in keys2022:
-            counthere2022 = counts2022[np.where(keys2022 == key)][0]
-        else:
-            counthere2022 = 0
-
-        if key in keys2021:
-            counthere2021 = counts2021[np.where(keys2021 == key)][0]
-        else:
-            counthere2021 = 0
-
-        if key in keys2020:
-            counthere2020 = counts2020[np.where(keys2020 == key)][0]
-        else:
-            counthere2020 = 0
-
-        if key in keys2019:
-            counthere2019 = counts2019[np.where(keys2019 == key)][0]
-        else:
-            counthere2019 = 0
-        # writer.writerow([key, counthere2019, counthere2020, counthere2021, counthere2022, counthere2023])
+        counts_per_year = [statistics['labs_per_year'].get(year, dict()).get(key, 0) for year in table_years]
+        # writer.writerow([key] + counts_per_year)
 
         # line to produce a latex array
         print('\hline')
-        print(key, ' & ', counthere2019, ' & ', counthere2020, ' & ', counthere2021, ' & ', counthere2022, ' & ',
-              counthere2023, ' \\\\ ')
+        print(key, *[element for count in counts_per_year for element in (' & ', count)], ' \\\\ ')
     # close the file
     # f.close()
 
-    ############################################
-    ############################################
-    ############################################
-    ############################################
-
-    listannee, countspubli_annee = np.unique(year_allpaper, return_counts=True)
+    print(quota_report())
 
-    fig, ax = plt.subplots()
-    rects1 = ax.bar(listannee, countspubli_annee)
 
-    # plt.hist(listannee,len(listannee), weights=publi_annee)
-    ax.set_xlabel('Année')
-    ax.set_ylabel('Nombres de publications')
-    ax.set_title(f"Publications 'exoplanètes' françaises (total = { total_apper_with_french_Afil })")
-
-    plt.savefig("/Users/jmazoyer/Desktop/papers_exoplanets/paper_per_year.pdf")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ads
+import lazy_loads
+from profiling import PROFILE, reset_profile
+
+
+def test_lazy_load_counted_in_allow_mode(monkeypatch):
+    # the original method would query ADS: it only returns a value here
+    monkeypatch.setitem(lazy_loads._ORIGINAL, "get_field", lambda paper, field: 'value of ' + field)
+    reset_profile()
+    lazy_loads.set_lazy_load_mode('allow')
+    try:
+        paper = ads.search.Article(bibcode='2023A&A...671A..96M', id='1')
+        assert paper.doi == 'value of doi'
+        assert PROFILE["lazy_loads"] == {'doi': 1}
+    finally:
+        monkeypatch.undo()
+        ads.search.Article._get_field = lazy_loads._ORIGINAL["get_field"]
+        ads.search.SearchQuery.execute = lazy_loads._ORIGINAL["execute"]